@@ -97,4 +97,10 @@ def show_config():
 def reset_config():
     config_reset()
 
+def benchmark(argv: Optional[list]=None):
+    from .apiBenchmark import main
+    return main(argv)
 
+def load_test(argv: Optional[list]=None):
+    from .apiLoad import main
+    return main(argv)
@@ -1,11 +1,20 @@
 import os
+import asyncio
+import inspect
 import threading
 import json
 import logging
 import atexit
 from datetime import datetime
-from typing import Optional, Union, Dict, Any, Callable
-from .apiCore import WebsocketManager
+from typing import Optional, Union, Dict, Any, List, Tuple, Callable
+from .apiCore import WebsocketManager, DIAGNOSTICS_KEY_WORD
+from .apiHistory import time_to_ns, MAX_TIMESTAMP_NS
+from .apiBulk import history_payloads, dataframe_columns
+from .apiValidate import Validator, VALIDATION_MODES
+from .apiCompress import Compression
+from .apiRecord import StreamRecorder
+from .apiClock import VirtualClock, get_clock, set_clock
+from .apiScheduler import Scheduler, Job
 
 __all__ = [
     'start_api',
@@ -24,12 +33,21 @@ __all__ = [
     'Surface',
     'Text',
     'Gauge',
+    'VirtualClock',
+    'set_clock',
+    'set_validation',
 ]
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 _manager: Union[WebsocketManager, None] = None
 
+_scheduler: Union[Scheduler, None] = None
+
+_background_tasks = set() # Keeps tasks started by execute() referenced until done
+
+_validation: Union[Tuple[str, int], None] = None # (mode, sample_every) given to streams created from now on
+
 def start_config_load():
     """
     start_config_load() is a function to load WebSocket connection parameters 
@@ -87,11 +105,210 @@ def start_config_check(host: Union[str, None], port: Union[str, None], route: Un
     
     return host, port, route
 
-def start_manager(host: str, port: str, route: str):
+def start_option_load(item: str, default: Any=None):
+    """
+    start_option_load() is a function to load an optional item of WEBSOCKET_CONFIG. 
+    Items missing from older configuration files fall back to the given default.
+
+    Parameters
+    ----------
+    item : str
+        The item key inside WEBSOCKET_CONFIG (e.g., 'RECORD_DIR').
+    default : Any, optional
+        The value returned when the item is not configured.
+
+    Returns
+    -------
+    Any
+        The configured value, or default.
+
+    """
+    from .configEdit import config_load
+    config = config_load()
+
+    return config['WEBSOCKET_CONFIG'].get(item, default)
+
+def start_recorder(record_dir: Optional[str]):
+    """
+    start_recorder() is a function to build the optional stream recorder. 
+    If record_dir is None, RECORD_DIR from the configuration file is used, an 
+    empty directory disables recording.
+
+    Parameters
+    ----------
+    record_dir : Optional[str]
+        Directory the recorder writes its segments to.
+
+    Returns
+    -------
+    Union[StreamRecorder, None]
+        The recorder, or None if recording is disabled.
+
+    """
+    if record_dir is None:
+        record_dir = start_option_load('RECORD_DIR', '')
+    if not record_dir:
+        return None
+    return StreamRecorder(
+        record_dir, 
+        max_segment_bytes=int(start_option_load('RECORD_SEGMENT_BYTES', 64 * 1024 * 1024)), 
+        max_segment_seconds=float(start_option_load('RECORD_SEGMENT_SECONDS', 3600))
+    )
+
+def start_compression():
+    """
+    start_compression() is a function to build the compression settings of the 
+    WebSocket server from the configuration file. COMPRESSION set to false disables 
+    compression, COMPRESSION_DICTIONARY is the path of a text file priming every 
+    connection, e.g. labels repeated across payloads.
+
+    Returns
+    -------
+    Union[Compression, bool]
+        The settings, or False if compression is disabled.
+
+    """
+    if not start_option_load('COMPRESSION', True):
+        return False
+    dictionary = None
+    dictionary_path = start_option_load('COMPRESSION_DICTIONARY', '')
+    if dictionary_path:
+        try:
+            with open(dictionary_path, 'r', encoding='utf-8') as f:
+                dictionary = f.read()
+        except OSError as e:
+            logging.error(f"Failed to read COMPRESSION_DICTIONARY '{dictionary_path}': {e}")
+    return Compression(
+        threshold=int(start_option_load('COMPRESSION_THRESHOLD', 1024)), 
+        level=int(start_option_load('COMPRESSION_LEVEL', 6)), 
+        window_bits=int(start_option_load('COMPRESSION_WINDOW_BITS', 12)), 
+        dictionary=dictionary
+    )
+
+def start_scheduler():
+    """
+    start_scheduler() is a function to get the shared scheduler running periodic 
+    producers, see `DataStream.every`. It is created on first use, sized by 
+    SCHEDULER_WORKERS and SCHEDULER_PROCESSES of the configuration file.
+
+    Returns
+    -------
+    Scheduler
+        The shared scheduler.
+
+    """
+    global _scheduler
+
+    if _scheduler is None:
+        _scheduler = Scheduler(
+            workers=int(start_option_load('SCHEDULER_WORKERS', 8)), 
+            processes=int(start_option_load('SCHEDULER_PROCESSES', 0)) or None
+        )
+        atexit.register(_scheduler.stop, False)
+    return _scheduler
+
+def start_validation() -> Tuple[str, int]:
+    """
+    start_validation() is a function to get the validation mode new streams start with, 
+    see `set_validation`. It is loaded on first use from VALIDATION_MODE and 
+    VALIDATION_SAMPLE of the configuration file.
+
+    Returns
+    -------
+    Tuple[str, int]
+        The validation mode and the sampling rate.
+
+    """
+    global _validation
+
+    if _validation is None:
+        mode = start_option_load('VALIDATION_MODE', 'full')
+        if mode not in VALIDATION_MODES:
+            logging.error(f"Unknown VALIDATION_MODE '{mode}', expected one of {VALIDATION_MODES}. Using 'full'.")
+            mode = 'full'
+        _validation = (mode, max(int(start_option_load('VALIDATION_SAMPLE', 10)), 1))
+    return _validation
+
+def set_validation(mode: str, sample_every: Optional[int]=None):
+    """
+    set_validation() is a function to choose how streams created from now on check 
+    the numbers inside their payloads, e.g. the z values of a Surface: 'full' checks 
+    every update, 'sampled' one update in `sample_every` (and always the first), 'off' 
+    none. The checks are vectorized, with NumPy when installed. The structure of every 
+    payload is checked in all modes. See `DataStreamValidate.set_validation` for one stream.
+
+    Parameters
+    ----------
+    mode : str
+        'off', 'sampled' or 'full'.
+    sample_every : Optional[int], optional
+        Check one update in this many in 'sampled' mode. None keeps the current rate.
+
+    """
+    global _validation
+
+    if mode not in VALIDATION_MODES:
+        raise ValueError(f"Unknown validation mode '{mode}', expected one of {VALIDATION_MODES}.")
+    if sample_every is not None and sample_every < 1:
+        raise ValueError(f"Sampling rate must be at least 1, got {sample_every}.")
+    _validation = (mode, sample_every or start_validation()[1])
+
+def create_manager(host: str, port: str, route: str, record_dir: Optional[str]=None, event_loop: Optional[str]=None):
+    """
+    create_manager() is a function to build a WebsocketManager from the given 
+    connection parameters and the optional settings of the configuration file. 
+    The manager is not started.
+
+    Parameters
+    ----------
+    host : str
+        The host address for the WebSocket server.
+    port : str
+        The port number for the WebSocket server.
+    route : str
+        The route path for the WebSocket service.
+    record_dir : Optional[str]
+        Optional directory to record every stream into. If None, RECORD_DIR from the config file is used.
+    event_loop : Optional[str]
+        Optional event loop implementation: 'asyncio', 'uvloop' or 'auto'. If None, EVENT_LOOP from the config file is used.
+
+    Returns
+    -------
+    WebsocketManager
+        The new, not yet started, WebSocket manager instance.
+
+    """
+    return WebsocketManager(
+        host=host, 
+        port=port, 
+        route=route, 
+        recorder=start_recorder(record_dir), 
+        history_size=int(start_option_load('HISTORY_SIZE', 1000)), 
+        snapshot_path=start_option_load('SNAPSHOT_PATH', '') or None, 
+        snapshot_interval=float(start_option_load('SNAPSHOT_INTERVAL', 60)), 
+        metrics_path=start_option_load('METRICS_PATH', '/metrics') or None, 
+        diagnostics_interval=float(start_option_load('DIAGNOSTICS_INTERVAL', 1)), 
+        trace_every=int(start_option_load('TRACE_EVERY', 0)), 
+        event_loop=event_loop or start_option_load('EVENT_LOOP', 'auto'), 
+        cache_budget=int(start_option_load('CACHE_BUDGET_BYTES', 0)), 
+        stream_ttl=float(start_option_load('STREAM_TTL', 0)), 
+        compression=start_compression(), 
+        ping_interval=float(start_option_load('PING_INTERVAL', 20)) or None, 
+        ping_timeout=float(start_option_load('PING_TIMEOUT', 20)) or None, 
+        stall_timeout=float(start_option_load('STALL_TIMEOUT', 10)), 
+        max_connections=int(start_option_load('MAX_CONNECTIONS', 0)), 
+        max_connections_per_ip=int(start_option_load('MAX_CONNECTIONS_PER_IP', 0)), 
+        max_subscriptions=int(start_option_load('MAX_SUBSCRIPTIONS', 0)), 
+        subscription_rate=float(start_option_load('SUBSCRIPTION_RATE', 0)), 
+        subscription_burst=int(start_option_load('SUBSCRIPTION_BURST', 20)), 
+        overload_lag=float(start_option_load('OVERLOAD_LAG', 0))
+    )
+
+def start_manager(host: str, port: str, route: str, record_dir: Optional[str]=None, loop: Optional[asyncio.AbstractEventLoop]=None, event_loop: Optional[str]=None):
     """
     start_manager() is a function to initialize and start the global WebsocketManager.
-    It creates the server instance, starts its thread, and registers a cleanup 
-    operation upon program exit.
+    It creates the server instance, starts its thread (or attaches it to the given 
+    running loop), and registers a cleanup operation upon program exit.
 
     Parameters
     ----------
@@ -101,6 +318,12 @@ def start_manager(host: str, port: str, route: str):
         The port number for the WebSocket server.
     route : str
         The route path for the WebSocket service.
+    record_dir : Optional[str]
+        Optional directory to record every stream into. If None, RECORD_DIR from the config file is used.
+    loop : Optional[asyncio.AbstractEventLoop]
+        Optional running event loop to run the manager on instead of a background thread.
+    event_loop : Optional[str]
+        Optional event loop implementation of the background thread. If None, EVENT_LOOP from the config file is used.
 
     Returns
     -------
@@ -111,14 +334,17 @@ def start_manager(host: str, port: str, route: str):
     global _manager
     
     logging.info("Initializing user API.")
-    _manager = WebsocketManager(host=host, port=port, route=route)
-    _manager.start_server_thread()
+    _manager = create_manager(host, port, route, record_dir=record_dir, event_loop=event_loop)
+    if loop is not None:
+        _manager.start_in_loop(loop)
+    else:
+        _manager.start_server_thread()
     atexit.register(_manager.stop_server_thread)
     logging.info("User API initialized.")
 
     return _manager
 
-def start_api(host: Optional[str]=None, port: Optional[str]=None, route: Optional[str]=None):
+def start_api(host: Optional[str]=None, port: Optional[str]=None, route: Optional[str]=None, record_dir: Optional[str]=None, loop: Optional[asyncio.AbstractEventLoop]=None, event_loop: Optional[str]=None):
     """
     start_api() is a function to start the real-time data service API.
     If the service is already running, it returns the current manager instance. 
@@ -132,6 +358,15 @@ def start_api(host: Optional[str]=None, port: Optional[str]=None, route: Optiona
         Optional port number. If None, the default value from the config file is used.
     route : Optional[str]
         Optional route path. If None, the default value from the config file is used.
+    record_dir : Optional[str]
+        Optional directory to record every stream into. If None, the default value from the config file is used.
+    loop : Optional[asyncio.AbstractEventLoop]
+        Optional running event loop, e.g. asyncio.get_running_loop() in an asyncio application 
+        or in Jupyter. The service then runs on it instead of a background thread, and 
+        `afresh` publishes without any thread handoff. If None, a background thread is started.
+    event_loop : Optional[str]
+        Optional event loop implementation of the background thread: 'asyncio', 'uvloop' or 
+        'auto' (uvloop when installed). If None, the default value from the config file is used.
 
     Returns
     -------
@@ -146,12 +381,17 @@ def start_api(host: Optional[str]=None, port: Optional[str]=None, route: Optiona
         return _manager
     else:
         host, port, route = start_config_check(host, port, route)
-        return start_manager(host, port, route)
+        return start_manager(host, port, route, record_dir=record_dir, loop=loop, event_loop=event_loop)
 
-def restart_api(host: Optional[str]=None, port: Optional[str]=None, route: Optional[str]=None):
+def restart_api(host: Optional[str]=None, port: Optional[str]=None, route: Optional[str]=None, record_dir: Optional[str]=None):
     """
     restart_api() is a function to restart the real-time data service API.
-    If the service is running, it stops the existing service and then restarts it.
+    If the service is running, it is replaced without downtime: registered streams, 
+    cache and history move into the new service, existing DataStream objects keep 
+    working, and connected panels announcing the 'resume' feature are asked to 
+    reconnect to the new address with a resume token. Older panels stay on the old 
+    service, which relays the updates of the new one to them, and it closes once 
+    they all disconnected.
 
     Parameters
     ----------
@@ -161,6 +401,8 @@ def restart_api(host: Optional[str]=None, port: Optional[str]=None, route: Optio
         Optional port number. If None, the default value from the config file is used.
     route : Optional[str]
         Optional route path. If None, the default value from the config file is used.
+    record_dir : Optional[str]
+        Optional directory to record every stream into. If None, the default value from the config file is used.
 
     Returns
     -------
@@ -170,12 +412,32 @@ def restart_api(host: Optional[str]=None, port: Optional[str]=None, route: Optio
     """
     global _manager
 
-    if _manager is not None:
-        logging.info("Data service is already running, restarting...")
-        _manager = None
-    else:
+    if _manager is None:
         logging.info("Data service is not running, starting...")
-    return start_api(host=host, port=port, route=route)
+        return start_api(host=host, port=port, route=route, record_dir=record_dir)
+
+    logging.info("Data service is already running, restarting...")
+    predecessor = _manager
+    host, port, route = start_config_check(host, port, route)
+    successor = create_manager(host, port, route, record_dir=record_dir)
+
+    # Redirect producers first, so no update reaches the predecessor after its state is exported
+    _manager = successor
+    successor.import_state(predecessor.export_state())
+
+    # The same address can only be bound once the predecessor stopped listening
+    if (str(host), int(port)) == (str(predecessor.host), int(predecessor.port)):
+        predecessor.stop_listening()
+    successor.start_server_thread()
+    atexit.register(successor.stop_server_thread)
+    if not successor.wait_until_ready():
+        logging.error(f"Restarted data service is not listening on {host}:{port}.")
+
+    # Move clients over in the background, the predecessor closes once every client left
+    drain_timeout = float(start_option_load('RESTART_DRAIN_TIMEOUT', 10))
+    threading.Thread(target=predecessor.handoff, args=(successor, drain_timeout), daemon=True).start()
+    logging.info("Data service restarted.")
+    return successor
 
 
 class DataStream:
@@ -200,15 +462,28 @@ class DataStream:
         self.key_word = key_word.strip().lower()
         self.chart_type = chart_type
         self.data_key = self._get_data_key()
+        self._closed = False
+        self._critical = True
+
+        if self.key_word.startswith(DIAGNOSTICS_KEY_WORD):
+            raise ValueError(f"Key word '{self.key_word}' is reserved, key words starting with '{DIAGNOSTICS_KEY_WORD}' are used by the built-in diagnostics streams.")
         
-        # Register itself with the backend Manager so it can be identified when the frontend subscribes
-        _manager.register_data_stream(self.data_key)
+        # Register itself with the backend Manager so it can be identified when the frontend subscribes, 
+        # updates are then pushed with the interned stream id of that manager
+        self._register()
         logging.info(f"Registered new DataStream: {self.chart_type} -> {self.key_word}")
 
     def _get_data_key(self) -> str:
         """Generates a unique key for the backend Manager to identify the data stream"""
         return f"{self.chart_type}<:>{self.key_word}"
 
+    def _register(self):
+        """Registers the data stream with the global manager, again after a restart, as stream ids and settings are per manager"""
+        self._manager = _manager
+        self.stream_id = _manager.register_data_stream(self.data_key)
+        if not self._critical:
+            _manager.set_stream_critical(self.data_key, False)
+
     def update(self, data_payload: Dict[str, Any]):
         """
         update() updates the data stream and triggers a push to connected clients.
@@ -221,7 +496,13 @@ class DataStream:
             The data payload dictionary containing 'id', 'timestamp', and 'value'.
 
         """
-        _manager.push_update_sync(self.data_key, data_payload)
+        if self._closed:
+            logging.error(f"{self.chart_type} -> {self.key_word} is closed, update dropped.")
+            return
+        if self._manager is not _manager:
+            # Service restarted, stream ids are only valid for the manager that assigned them
+            self._register()
+        _manager.push_update_sync(self.stream_id, data_payload)
         logging.debug(f"Pushed update for {self.chart_type} -> {self.key_word}")
 
     def get_cached_data(self) -> Union[Dict[str, Any], None]:
@@ -235,16 +516,200 @@ class DataStream:
 
         """
         return _manager.get_cached_data_sync(self.data_key)
+
+    def get_if_newer(self, version: int=0) -> Optional[Tuple[int, Dict[str, Any]]]:
+        """
+        get_if_newer() retrieves the latest cached data only if it changed since the 
+        version of a previous call, so producers polling the cache skip redundant work. 
+        The returned payload is shared with the cache and must not be modified.
+
+        Parameters
+        ----------
+        version : int, optional
+            The version returned by the previous call. Defaults to 0 (any cached data).
+
+        Returns
+        -------
+        Optional[Tuple[int, Dict[str, Any]]]
+            (version, data payload dictionary), or None if nothing newer is cached.
+
+        """
+        return _manager.get_if_newer_sync(self.data_key, version)
+
+    def close(self):
+        """
+        close() unregisters the data stream once the updates already pushed are delivered. 
+        Its cache and in-memory history are released, subscribed charts are told the 
+        stream was closed, and further updates are dropped.
+
+        """
+        if self._closed:
+            return
+        self._closed = True
+        _manager.unregister_data_stream(self.data_key)
+        logging.info(f"Closed DataStream: {self.chart_type} -> {self.key_word}")
+
+    def derive(self, key_word: str, stat: str, window: float=60.0, chart_type: str='line') -> "DataStream":
+        """
+        derive() defines a stream the service computes from every update of this one, so 
+        rolling statistics need no second producer, e.g. the 60 s mean as a Gauge:
+        price.derive('price.mean', 'mean', 60, chart_type='gauge'). Statistics are kept 
+        incrementally, each update costs the same whatever the window length.
+
+        Parameters
+        ----------
+        key_word : str
+            The key word of the derived stream.
+        stat : str
+            'mean', 'sum', 'count', 'min', 'max', 'rate' (change per second) or 'ewma'.
+        window : float, optional
+            The window in seconds, the time constant for 'ewma'. Defaults to 60.
+        chart_type : str, optional
+            'line', 'bar', 'sequence', 'gauge' (shown within the window min and max) or 'text'. Defaults to 'line'.
+
+        Returns
+        -------
+        DataStream
+            The derived stream, close() stops it.
+
+        """
+        derived = DataStream(key_word, chart_type)
+        try:
+            _manager.add_derived_stream(self.data_key, derived.data_key, stat, window)
+        except ValueError:
+            derived.close()
+            raise
+        logging.info(f"Derived {chart_type} -> {derived.key_word} as {stat} over {window:g}s of {self.chart_type} -> {self.key_word}")
+        return derived
+
+    def set_ttl(self, seconds: Optional[float]):
+        """
+        set_ttl() unregisters the data stream like close() once it went this long without 
+        updates, e.g. for dynamically created streams whose producer may stop. Unlike 
+        close(), the next update registers the stream again.
+
+        Parameters
+        ----------
+        seconds : Optional[float]
+            Idle seconds, 0 never expires the stream. None uses STREAM_TTL of the configuration file.
+
+        """
+        _manager.set_stream_ttl(self.data_key, seconds)
+
+    def set_critical(self, critical: bool=True):
+        """
+        set_critical() sets whether the data stream is still pushed to charts while the 
+        service is overloaded (OVERLOAD_LAG). Updates of non-critical streams, e.g. a 
+        decorative sparkline, are cached but not sent until the overload is over.
+
+        Parameters
+        ----------
+        critical : bool, optional
+            False sheds the data stream under overload. Defaults to True.
+
+        """
+        _manager.set_stream_critical(self.data_key, critical)
+        self._critical = critical
+
+    def load_history(self, timestamps: Any, values: Any, labels: Optional[List[str]]=None, unit: float=1e9) -> int:
+        """
+        load_history() back-fills the history of the data stream in one call, e.g. with the
+        morning's data at startup. Timestamps and values are validated as whole columns
+        (vectorized with NumPy when installed) instead of one update() per point, the points
+        go into the in-memory history directly and subscribed charts receive them as a single
+        batch message. Only charts appending updates can be back-filled: line, bar, sequence,
+        lines, bars, sequences and scatter.
+
+        Parameters
+        ----------
+        timestamps : Any
+            Datetimes (naive ones are local time), ISO strings or epoch numbers in `unit`,
+            as a list, NumPy array or pandas index/series.
+        values : Any
+            Numbers for line, bar and sequence, rows of one number per label for lines,
+            bars and sequences, [x, y] rows for scatter.
+        labels : Optional[List[str]], optional
+            The series labels of lines, bars and sequences.
+        unit : float, optional
+            Nanoseconds per unit of numeric timestamps. Defaults to 1e9 (epoch seconds).
+
+        Returns
+        -------
+        int
+            The number of points loaded.
+
+        """
+        if self._closed:
+            logging.error(f"{self.chart_type} -> {self.key_word} is closed, history dropped.")
+            return 0
+        timestamps_ns, data_payloads = history_payloads(self.chart_type, timestamps, values, labels, unit)
+        if self._manager is not _manager:
+            self._register()
+        _manager.load_history_sync(self.stream_id, timestamps_ns, data_payloads)
+        logging.info(f"Loading {len(data_payloads)} points into the history of {self.chart_type} -> {self.key_word}")
+        return len(data_payloads)
+
+    def from_dataframe(self, frame: Any, columns: Optional[List[Any]]=None, time_column: Optional[Any]=None) -> int:
+        """
+        from_dataframe() back-fills the history of the data stream from a pandas DataFrame,
+        like load_history(). For lines, bars and sequences every value column is a series
+        named after the column.
+
+        Parameters
+        ----------
+        frame : Any
+            The DataFrame.
+        columns : Optional[List[Any]], optional
+            The value columns: one for line, bar and sequence, one per series for lines, bars
+            and sequences, x and y for scatter. Defaults to every column but the time column.
+        time_column : Optional[Any], optional
+            The timestamp column. Defaults to None (the index).
+
+        Returns
+        -------
+        int
+            The number of points loaded.
+
+        """
+        timestamps, values, labels = dataframe_columns(self.chart_type, frame, columns, time_column)
+        return self.load_history(timestamps, values, labels)
+
+    def query(self, start: Union[datetime, str, float, None]=None, end: Union[datetime, str, float, None]=None, max_points: Optional[int]=None) -> List[Dict[str, Any]]:
+        """
+        query() retrieves the updates of the current data stream within a time range, 
+        from the in-memory history or the on-disk recording. Only chart types appending 
+        updates, e.g. Line, keep an in-memory history, the others need RECORD_DIR.
+
+        Parameters
+        ----------
+        start : Union[datetime, str, float, None], optional
+            Range start as datetime, ISO string or epoch seconds. None means from the beginning.
+        end : Union[datetime, str, float, None], optional
+            Range end as datetime, ISO string or epoch seconds. None means up to now.
+        max_points : Optional[int], optional
+            Downsample the result to at most this many points. None returns all points.
+
+        Returns
+        -------
+        List[Dict[str, Any]]
+            The data payload dictionaries in time order.
+
+        """
+        start_ns = time_to_ns(start, default=0)
+        end_ns = time_to_ns(end, default=MAX_TIMESTAMP_NS)
+        return _manager.query_history_sync(self.data_key, start_ns, end_ns, max_points)
     
     def execute(self, logic_func: Callable, *args, **kwargs):
         """
         execute() executes the specified logic function in a background thread.
         This is useful for running time-consuming tasks without blocking the main program.
+        A coroutine function runs as a task instead: on the manager's loop in embedded 
+        mode, else on the caller's running loop, else on its own loop in a background thread.
 
         Parameters
         ----------
         logic_func : Callable
-            The function to be executed in the background thread. The function 
+            The function or coroutine function to be executed in the background. The function 
             will receive the current DataStream instance as its first argument.
         *args :
             Positional arguments passed to the logic_func.
@@ -260,16 +725,77 @@ class DataStream:
             finally:
                 print(f"Thread finished.")
 
-        thread = threading.Thread(
+        if inspect.iscoroutinefunction(logic_func):
+            self._execute_coroutine(logic_func, *args, **kwargs)
+            return
+
+        # Started through the package clock, so producers follow a VirtualClock when one is set
+        thread = get_clock().start_thread(
             target=thread_target, 
             args=(self, logic_func) + args, 
             kwargs=kwargs,
             daemon=True
         )
-        
-        thread.start()
         logging.debug(f"{self.chart_type}('{self.data_key}') calls {logic_func.__name__} in background (daemon) thread.")
 
+    def _execute_coroutine(self, logic_func: Callable, *args, **kwargs):
+        """Runs a coroutine function for `execute`, see there."""
+        async def task_target():
+            try:
+                await logic_func(self, *args, **kwargs)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error in background task: {e}")
+            finally:
+                print(f"Task finished.")
+
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        manager_loop = _manager.loop if _manager._embedded else None
+
+        if manager_loop is not None and manager_loop is not running_loop:
+            asyncio.run_coroutine_threadsafe(task_target(), manager_loop)
+        elif running_loop is not None:
+            task = running_loop.create_task(task_target())
+            _background_tasks.add(task)
+            task.add_done_callback(_background_tasks.discard)
+        else:
+            get_clock().start_thread(target=asyncio.run, args=(task_target(),), daemon=True)
+        logging.debug(f"{self.chart_type}('{self.data_key}') calls {logic_func.__name__} as background task.")
+
+    def every(self, interval: float, func: Callable, *args, process: bool=False, times: Optional[int]=None, **kwargs) -> Job:
+        """
+        every() calls a producer function periodically on the shared scheduler 
+        and publishes each value it returns, like `fresh`. Unlike `execute`, no 
+        thread is started per stream.
+
+        Parameters
+        ----------
+        interval : float
+            Seconds between two calls.
+        func : Callable
+            The producer, called as func(*args, **kwargs). A return value of None publishes nothing.
+        process : bool, optional
+            Run func in the scheduler's process pool, for CPU-heavy producers. func and its 
+            arguments must be picklable. Defaults to False.
+        times : Optional[int], optional
+            Stop after this many calls. Defaults to None (until cancelled).
+        *args :
+            Positional arguments passed to func.
+        **kwargs :
+            Keyword arguments passed to func.
+
+        Returns
+        -------
+        Job
+            The job handle, `job.cancel()` stops it.
+
+        """
+        return start_scheduler().every(interval, func, *args, stream=self, process=process, times=times, **kwargs)
+
     def fresh(self, data_payload_value: Any):
         """
         fresh() is a convenience function that generates a new data payload 
@@ -283,13 +809,31 @@ class DataStream:
             of the data payload.
 
         """
+        now = get_clock().now()
         data_payload = {
-            "id": datetime.now().strftime("%Y%m%d%H%M%S%f"),
-            "timestamp": datetime.now().isoformat(),
+            "id": now.strftime("%Y%m%d%H%M%S%f"),
+            "timestamp": now.isoformat(),
             "value": data_payload_value
         }
         self.update(data_payload)
 
+    async def afresh(self, data_payload_value: Any):
+        """
+        afresh() is the asynchronous fresh for producers running on an event loop.
+        On the loop the service runs on (start_api(loop=...)), the update is queued 
+        without any cross-thread handoff. It then yields to the loop once, so a tight 
+        producer loop does not starve delivery.
+
+        Parameters
+        ----------
+        data_payload_value : Any
+            The actual data value to be pushed, which populates the 'value' field 
+            of the data payload.
+
+        """
+        self.fresh(data_payload_value)
+        await asyncio.sleep(0)
+
 
 class DataStreamValidate(DataStream):
 
@@ -495,11 +1039,12 @@ class DataStreamValidate(DataStream):
             metrics are consistent, otherwise False.
 
         """
+        from numbers import Number
         if DataStreamValidate._data_validated_list(data_payload):
             value = data_payload['value']
             if len(value) == 3:
                 axis, shape, num = value
-                if len(axis) == 3 and len(shape) == 2 and len(num) == shape[0] * shape[1]:
+                if len(axis) == 3 and len(shape) == 2 and all(isinstance(n, Number) for n in shape) and len(num) == shape[0] * shape[1]:
                     return True
                 else:
                     return False
@@ -542,10 +1087,28 @@ class DataStreamValidate(DataStream):
     def __init__(self, key_word: str, chart_type: str):
         super().__init__(key_word=key_word, chart_type=chart_type)
         self._data_validated_error_info = r'Invalid data form for ' + str(self.chart_type) + ' -> ' + str(self.key_word) + '. '
+        self._validator = Validator(chart_type, *start_validation())
+
+    def set_validation(self, mode: str, sample_every: Optional[int]=None):
+        """
+        set_validation() chooses how this stream checks the numbers inside its payloads, 
+        e.g. 'sampled' for a large Surface updated at a high rate. See `set_validation` 
+        of the module for the modes.
+
+        Parameters
+        ----------
+        mode : str
+            'off', 'sampled' or 'full'.
+        sample_every : Optional[int], optional
+            Check one update in this many in 'sampled' mode. None keeps the current rate.
+
+        """
+        self._validator.configure(mode, sample_every)
 
     def update(self, data_payload: Dict[str, Any], func: Callable):
         """
-        update() will validate the data before pushing it to app.
+        update() will validate the data before pushing it to app. The structure is 
+        checked by func, the numbers inside it by the stream's validator.
 
         Parameters
         ----------
@@ -555,7 +1118,7 @@ class DataStreamValidate(DataStream):
             The validate function which accepts data_payload and returns True if data is validated, otherwise returns False.
 
         """
-        super().update(data_payload) if func(data_payload) else logging.error(self._data_validated_error_info)
+        super().update(data_payload) if func(data_payload) and self._validator(data_payload['value']) else logging.error(self._data_validated_error_info)
 
 
 class Line(DataStreamValidate):
@@ -0,0 +1,56 @@
+import time
+from typing import Dict, List, Hashable
+
+# Buckets kept before full ones, whose clients went quiet, are pruned
+RATE_LIMITER_PRUNE_SIZE = 4096
+
+
+class RateLimiter:
+    """
+    Token buckets by key, e.g. client IP: each key may spend `burst` tokens at once,
+    refilled at `rate` tokens per second. Used on the event loop only, so no lock.
+    """
+
+    __slots__ = ('rate', 'burst', '_buckets')
+
+    def __init__(self, rate: float, burst: float):
+        """
+        Parameters
+        ----------
+        rate : float
+            Tokens refilled per second, 0 allows everything.
+        burst : float
+            Tokens a key starts with and may accumulate.
+        """
+        if rate < 0 or burst < 1:
+            raise ValueError(f"Rate must not be negative and burst at least 1, got {rate} and {burst}.")
+        self.rate = rate
+        self.burst = burst
+        self._buckets: Dict[Hashable, List[float]] = {} # key -> [tokens, monotonic time of the last refill]
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def allow(self, key: Hashable) -> bool:
+        """Spends a token of the key, returns False if its bucket is empty."""
+        if not self.rate:
+            return True
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= RATE_LIMITER_PRUNE_SIZE:
+                self.prune(now)
+            bucket = self._buckets[key] = [self.burst, now]
+        else:
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+        if bucket[0] < 1:
+            return False
+        bucket[0] -= 1
+        return True
+
+    def prune(self, now: float):
+        """Drops the buckets refilled by now, a new bucket would start full anyway."""
+        full = [key for key, (tokens, last) in self._buckets.items() if tokens + (now - last) * self.rate >= self.burst]
+        for key in full:
+            del self._buckets[key]
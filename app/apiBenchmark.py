@@ -0,0 +1,477 @@
+import os
+import gc
+import sys
+import json
+import math
+import time
+import asyncio
+import logging
+import argparse
+import platform
+import threading
+import statistics
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Any, List, Tuple, Callable, Optional
+from . import api
+from .api import DataStream, DataStreamValidate, Line
+from .apiCore import WebsocketManager, _make_payload
+from .apiTest import generate_data
+from .apiValidate import Validator, NUMERIC_SCHEMAS
+from .apiQuantize import Quantizer
+
+logger = logging.getLogger(__name__)
+
+RESULT_FORMAT_VERSION = 1
+
+CHART_TYPES = ['sequence', 'line', 'bar', 'sequences', 'lines', 'bars', 'scatter', 'area', 'areas', 'pie', 'radar', 'surface', 'text', 'gauge']
+
+# A valid payload shape for each validator, by the chart type feeding it
+VALIDATOR_CHART_TYPES = {
+    '_data_validated': 'line',
+    '_data_validated_number': 'line',
+    '_data_validated_string': 'text',
+    '_data_validated_list': 'scatter',
+    '_data_validated_coordinate': 'scatter',
+    '_data_validated_dimension': 'pie',
+    '_data_validated_dimensions': 'areas',
+    '_data_validated_surface': 'surface',
+    '_data_validated_gauge': 'gauge',
+}
+
+FANOUT_SIZES = (1, 10, 100, 1000)
+CONTENTION_THREADS = (1, 2, 4, 8)
+
+# Two-sided 95% Student t critical values by degrees of freedom, 1.96 beyond the table
+_T_CRITICAL_95 = {
+    1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571, 6: 2.447, 7: 2.365, 8: 2.306, 9: 2.262, 10: 2.228,
+    11: 2.201, 12: 2.179, 13: 2.160, 14: 2.145, 15: 2.131, 16: 2.120, 17: 2.110, 18: 2.101, 19: 2.093, 20: 2.086,
+    25: 2.060, 30: 2.042, 40: 2.021, 60: 2.000, 120: 1.980,
+}
+
+
+def _t_critical(df: int) -> float:
+    for bound in sorted(_T_CRITICAL_95):
+        if df <= bound:
+            return _T_CRITICAL_95[bound]
+    return 1.96
+
+
+def summarize(samples_ns: List[float]) -> Dict[str, float]:
+    """
+    Summarizes repeated per-operation timings.
+
+    Parameters
+    ----------
+    samples_ns : List[float]
+        Nanoseconds per operation, one value per repeat.
+
+    Returns
+    -------
+    Dict[str, float]
+        'min', 'median', 'mean', 'stdev', 'iqr', 'ci95' (half width of the 95% confidence
+        interval of the mean), all in nanoseconds, 'outliers' (repeats beyond 1.5 IQR)
+        and 'ops_per_sec' derived from the median.
+    """
+    values = sorted(samples_ns)
+    n = len(values)
+    mean = statistics.fmean(values)
+    stdev = statistics.stdev(values) if n > 1 else 0.0
+    if n >= 4:
+        q1, _, q3 = statistics.quantiles(values, n=4)
+    else:
+        q1, q3 = values[0], values[-1]
+    iqr = q3 - q1
+    median = statistics.median(values)
+    return {
+        'repeat': n,
+        'min': values[0],
+        'median': median,
+        'mean': mean,
+        'stdev': stdev,
+        'iqr': iqr,
+        'ci95': _t_critical(n - 1) * stdev / math.sqrt(n) if n > 1 else 0.0,
+        'outliers': sum(1 for value in values if value < q1 - 1.5 * iqr or value > q3 + 1.5 * iqr),
+        'ops_per_sec': 1e9 / median if median else 0.0,
+    }
+
+
+def measure(run: Callable[[int], float], repeat: int=20, min_time: float=0.05, warmup: int=1) -> Tuple[int, List[float]]:
+    """
+    Times a benchmark body. Like `timeit`, the number of operations per repeat is
+    doubled until one repeat lasts `min_time`, and the garbage collector is paused
+    while timing.
+
+    Parameters
+    ----------
+    run : Callable[[int], float]
+        Runs the given number of operations and returns the seconds they took,
+        so set-up and tear-down can be kept out of the timed section.
+    repeat : int, optional
+        The number of timed repeats. Defaults to 20.
+    min_time : float, optional
+        The minimal duration of one repeat in seconds. Defaults to 0.05s.
+    warmup : int, optional
+        Untimed repeats run before measuring. Defaults to 1.
+
+    Returns
+    -------
+    Tuple[int, List[float]]
+        The operations per repeat and the nanoseconds per operation of each repeat.
+    """
+    number = 1
+    while True:
+        if run(number) >= min_time or number >= 1 << 24:
+            break
+        number *= 2
+    for _ in range(warmup):
+        run(number)
+
+    gc_enabled = gc.isenabled()
+    gc.collect()
+    gc.disable()
+    try:
+        samples = [run(number) * 1e9 / number for _ in range(repeat)]
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return number, samples
+
+
+class _NullWebSocket:
+    """In-process stand-in for a client connection, sending only counts bytes."""
+
+    __slots__ = ('sent',)
+
+    def __init__(self):
+        self.sent = 0
+
+    async def send(self, message: str):
+        self.sent += len(message)
+
+
+@contextmanager
+def _benchmark_manager(start: bool, port: int=0, route: str='/benchmark', event_loop: str='asyncio'):
+    """
+    Provides a manager for the benchmarks, installed as the global manager of the
+    user API for the duration, so `DataStream` instances can be created.
+    """
+    manager = WebsocketManager('127.0.0.1', port, route, metrics_path=None, diagnostics_interval=0, event_loop=event_loop)
+    previous = api._manager
+    api._manager = manager
+    try:
+        if start:
+            manager.start_server_thread()
+            if not manager.wait_until_ready(5):
+                raise RuntimeError("Benchmark manager failed to start.")
+        yield manager
+    finally:
+        api._manager = previous
+        if start:
+            manager.stop_server_thread()
+
+
+def _drain(manager: WebsocketManager, timeout: float=10):
+    """Waits until the manager has consumed its update queue, so repeats start from the same state."""
+    deadline = time.perf_counter() + timeout
+    while manager._update_queue and time.perf_counter() < deadline:
+        time.sleep(0.001)
+
+
+# Benchmark bodies, each builds a `run(number) -> seconds` closure
+
+def _bench_fresh(stream: DataStream, manager: WebsocketManager, value: Any) -> Callable[[int], float]:
+    def run(number: int) -> float:
+        _drain(manager)
+        fresh = stream.fresh
+        start = time.perf_counter()
+        for _ in range(number):
+            fresh(value)
+        return time.perf_counter() - start
+    return run
+
+
+def _bench_validator(validator: Callable[[Any], bool], data_payload: Dict[str, Any]) -> Callable[[int], float]:
+    if not validator(data_payload):
+        raise ValueError(f"Benchmark payload is rejected by {validator.__name__}.")
+    def run(number: int) -> float:
+        start = time.perf_counter()
+        for _ in range(number):
+            validator(data_payload)
+        return time.perf_counter() - start
+    return run
+
+
+def _bench_encode(data_payload: Dict[str, Any], quantizer: Optional[Quantizer]=None) -> Callable[[int], float]:
+    dumps = json.dumps
+    def run(number: int) -> float:
+        start = time.perf_counter()
+        if quantizer is None:
+            for _ in range(number):
+                dumps(data_payload)
+        else:
+            for _ in range(number):
+                dumps(quantizer(data_payload))
+        return time.perf_counter() - start
+    return run
+
+
+def _bench_contention(manager: WebsocketManager, stream_id: int, threads: int) -> Callable[[int], float]:
+    data_payload = _make_payload(1.0)
+    def run(number: int) -> float:
+        # Each of the threads pushes `number` updates, reported per update overall
+        _drain(manager)
+        barrier = threading.Barrier(threads + 1)
+        def producer():
+            push = manager.push_update_sync
+            barrier.wait()
+            for _ in range(number):
+                push(stream_id, data_payload)
+        workers = [threading.Thread(target=producer, daemon=True) for _ in range(threads)]
+        for worker in workers:
+            worker.start()
+        barrier.wait()
+        start = time.perf_counter()
+        for worker in workers:
+            worker.join()
+        return (time.perf_counter() - start) / threads
+    return run
+
+
+def _bench_cache_read(stream: DataStream, method: str) -> Callable[[int], float]:
+    def run(number: int) -> float:
+        read = getattr(stream, method)
+        start = time.perf_counter()
+        for _ in range(number):
+            read()
+        return time.perf_counter() - start
+    return run
+
+
+def _bench_fanout(manager: WebsocketManager, loop: asyncio.AbstractEventLoop, data_key: str, subscribers: int) -> Callable[[int], float]:
+    stream_id = manager.register_data_stream(data_key)
+    sockets = manager._slots[stream_id].subscribers
+    sockets.update(_NullWebSocket() for _ in range(subscribers))
+    manager._subscriptions[data_key] = sockets
+    data_payload = _make_payload(1.0)
+    async def body(number: int) -> float:
+        update_and_push = manager._update_and_push_async
+        start = time.perf_counter()
+        for _ in range(number):
+            await update_and_push(stream_id, data_payload)
+        return time.perf_counter() - start
+    def run(number: int) -> float:
+        return loop.run_until_complete(body(number))
+    return run
+
+
+def _benchmarks(contention_threads: Tuple[int, ...], fanout_sizes: Tuple[int, ...]):
+    """Yields (name, description, kind, argument) of every benchmark."""
+    yield "fresh.stream", "DataStream.fresh without validation, producer side", 'fresh', DataStream
+    yield "fresh.line", "Line.fresh including validation, producer side", 'fresh', Line
+    for name, chart_type in VALIDATOR_CHART_TYPES.items():
+        suffix = name[len('_data_validated_'):] if name != '_data_validated' else 'payload'
+        yield f"validate.{suffix}", f"DataStreamValidate.{name} on a {chart_type} payload", 'validate', name
+    for chart_type in NUMERIC_SCHEMAS:
+        yield f"contents.{chart_type}", f"Full numeric contents check of a {chart_type} payload", 'contents', chart_type
+    for chart_type in CHART_TYPES:
+        yield f"encode.{chart_type}", f"json.dumps of a {chart_type} payload", 'encode', chart_type
+    for chart_type in ('surface', 'areas'):
+        yield f"encode.{chart_type}.scaled", f"json.dumps of a {chart_type} payload scaled to integers, 2 decimals", 'encode', (chart_type, 2)
+    yield "cache.get_cached_data", "DataStream.get_cached_data of a cached payload", 'cache', 'get_cached_data'
+    yield "cache.get_if_newer", "DataStream.get_if_newer of a cached payload", 'cache', 'get_if_newer'
+    for threads in contention_threads:
+        yield f"push.threads_{threads}", f"push_update_sync from {threads} concurrent threads, per update", 'contention', threads
+    for subscribers in fanout_sizes:
+        yield f"fanout.subscribers_{subscribers}", f"_update_and_push_async to {subscribers} in-process sockets", 'fanout', subscribers
+
+
+def run_benchmarks(name_filter: Optional[str]=None, repeat: int=20, min_time: float=0.05, contention_threads: Tuple[int, ...]=CONTENTION_THREADS, fanout_sizes: Tuple[int, ...]=FANOUT_SIZES) -> Dict[str, Any]:
+    """
+    Runs the publishing hot path microbenchmarks.
+
+    Parameters
+    ----------
+    name_filter : Optional[str], optional
+        Only run benchmarks whose name contains this text, e.g. 'encode'. Defaults to None (all).
+    repeat : int, optional
+        The number of timed repeats per benchmark. Defaults to 20.
+    min_time : float, optional
+        The minimal duration of one repeat in seconds. Defaults to 0.05s.
+    contention_threads : Tuple[int, ...], optional
+        Producer thread counts of the `push_update_sync` contention benchmark.
+    fanout_sizes : Tuple[int, ...], optional
+        Subscriber counts of the fan-out benchmark.
+
+    Returns
+    -------
+    Dict[str, Any]
+        'meta' describing the environment and 'results' by benchmark name, see `summarize`.
+    """
+    selected = [item for item in _benchmarks(contention_threads, fanout_sizes) if not name_filter or name_filter in item[0]]
+    results: Dict[str, Any] = {}
+
+    def record(name: str, description: str, run: Callable[[int], float]):
+        number, samples = measure(run, repeat=repeat, min_time=min_time)
+        results[name] = {'description': description, 'number': number, 'unit': 'ns/op', **summarize(samples)}
+        logger.info(f"{name}: {results[name]['median']:.0f} ns/op (±{results[name]['ci95']:.0f})")
+
+    # Producer side benchmarks need a running manager consuming the queue
+    if any(kind in ('fresh', 'cache', 'contention') for _, _, kind, _ in selected):
+        with _benchmark_manager(start=True) as manager:
+            for name, description, kind, argument in selected:
+                if kind == 'fresh':
+                    stream = Line('benchmark.fresh') if argument is Line else DataStream('benchmark.fresh', 'line')
+                    record(name, description, _bench_fresh(stream, manager, generate_data('line')))
+                elif kind == 'cache':
+                    stream = DataStream('benchmark.cache', 'line')
+                    stream.fresh(1.0)
+                    _drain(manager)
+                    record(name, description, _bench_cache_read(stream, argument))
+                elif kind == 'contention':
+                    stream_id = manager.register_data_stream('line<:>benchmark.contention')
+                    record(name, description, _bench_contention(manager, stream_id, argument))
+
+    for name, description, kind, argument in selected:
+        if kind == 'validate':
+            validator = getattr(DataStreamValidate, argument)
+            record(name, description, _bench_validator(validator, _make_payload(generate_data(VALIDATOR_CHART_TYPES[argument]))))
+        elif kind == 'contents':
+            validator = Validator(argument, 'full')
+            record(name, description, _bench_validator(lambda data_payload: validator(data_payload['value']), _make_payload(generate_data(argument))))
+        elif kind == 'encode' and isinstance(argument, tuple):
+            chart_type, decimals = argument
+            record(name, description, _bench_encode(_make_payload(generate_data(chart_type)), Quantizer(decimals)))
+        elif kind == 'encode':
+            record(name, description, _bench_encode(_make_payload(generate_data(argument))))
+
+    # Fan-out runs the manager coroutine on a private loop, the manager itself is never started
+    if any(kind == 'fanout' for _, _, kind, _ in selected):
+        with _benchmark_manager(start=False) as manager:
+            loop = asyncio.new_event_loop()
+            try:
+                for name, description, kind, argument in selected:
+                    if kind == 'fanout':
+                        data_key = f"line<:>benchmark.fanout_{argument}"
+                        record(name, description, _bench_fanout(manager, loop, data_key, argument))
+            finally:
+                loop.close()
+
+    ordered = {name: results[name] for name, _, _, _ in selected if name in results}
+    return {'meta': _environment(repeat, min_time), 'results': ordered}
+
+
+def _environment(repeat: int, min_time: float) -> Dict[str, Any]:
+    try:
+        from importlib.metadata import version
+        package_version = version('StreamDataPanel')
+    except Exception:
+        package_version = None
+    return {
+        'format': RESULT_FORMAT_VERSION,
+        'created': datetime.now().isoformat(),
+        'version': package_version,
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'repeat': repeat,
+        'min_time': min_time,
+    }
+
+
+def save_results(results: Dict[str, Any], path: str):
+    """Writes benchmark results as JSON, see `run_benchmarks`."""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=4)
+
+
+def load_results(path: str) -> Dict[str, Any]:
+    """Reads benchmark results written by `save_results`."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def compare_results(baseline: Dict[str, Any], current: Dict[str, Any], tolerance: float=0.05) -> List[Dict[str, Any]]:
+    """
+    Compares two benchmark runs. A benchmark regressed when its median got slower by
+    more than `tolerance` and the 95% confidence intervals of both means do not overlap,
+    so run-to-run noise is not reported.
+
+    Parameters
+    ----------
+    baseline : Dict[str, Any]
+        Results of the reference version.
+    current : Dict[str, Any]
+        Results of the version under test.
+    tolerance : float, optional
+        The relative change ignored, 0.05 is 5%. Defaults to 0.05.
+
+    Returns
+    -------
+    List[Dict[str, Any]]
+        'name', 'baseline' and 'current' medians in ns/op, relative 'change' and 'status'
+        ('regressed', 'improved' or 'unchanged') of every benchmark found in both runs.
+    """
+    comparison = []
+    for name, now in current['results'].items():
+        before = baseline['results'].get(name)
+        if before is None:
+            continue
+        change = now['median'] / before['median'] - 1 if before['median'] else 0.0
+        separated = abs(now['mean'] - before['mean']) > now['ci95'] + before['ci95']
+        if change > tolerance and separated:
+            status = 'regressed'
+        elif change < -tolerance and separated:
+            status = 'improved'
+        else:
+            status = 'unchanged'
+        comparison.append({'name': name, 'baseline': before['median'], 'current': now['median'], 'change': change, 'status': status})
+    return comparison
+
+
+def _print_results(results: Dict[str, Any]):
+    print(f"{'benchmark':<32}{'median ns/op':>14}{'± ci95':>10}{'iqr':>10}{'ops/s':>14}")
+    for name, result in results['results'].items():
+        print(f"{name:<32}{result['median']:>14.1f}{result['ci95']:>10.1f}{result['iqr']:>10.1f}{result['ops_per_sec']:>14.0f}")
+
+
+def _print_comparison(comparison: List[Dict[str, Any]]):
+    print(f"{'benchmark':<32}{'baseline':>12}{'current':>12}{'change':>10}  status")
+    for item in comparison:
+        print(f"{item['name']:<32}{item['baseline']:>12.1f}{item['current']:>12.1f}{item['change']:>+10.1%}  {item['status']}")
+
+
+def main(argv: Optional[List[str]]=None) -> int:
+    """
+    Command line entry of the microbenchmarks.
+
+    Returns
+    -------
+    int
+        1 if a comparison found a regression, otherwise 0.
+    """
+    parser = argparse.ArgumentParser(description="Microbenchmarks of the StreamDataPanel publishing hot path.", prog="python -m StreamDataPanel.apiBenchmark")
+    parser.add_argument('-k', '--filter', default=None, help='only run benchmarks whose name contains this text')
+    parser.add_argument('-r', '--repeat', type=int, default=20, help='timed repeats per benchmark')
+    parser.add_argument('-t', '--min-time', type=float, default=0.05, help='minimal seconds per repeat')
+    parser.add_argument('-o', '--output', default=None, help='write the results as JSON to this file')
+    parser.add_argument('-c', '--compare', default=None, help='compare with the JSON results of an earlier run')
+    parser.add_argument('--tolerance', type=float, default=0.05, help='relative change ignored by the comparison')
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(name_filter=args.filter, repeat=args.repeat, min_time=args.min_time)
+    _print_results(results)
+    if args.output:
+        save_results(results, args.output)
+    if args.compare:
+        comparison = compare_results(load_results(args.compare), results, tolerance=args.tolerance)
+        _print_comparison(comparison)
+        if any(item['status'] == 'regressed' for item in comparison):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,191 @@
+import time
+from array import array
+from numbers import Number
+from datetime import datetime
+from typing import Union, Dict, Any, List, Tuple, Optional, Sequence
+from .apiHistory import time_to_ns, HISTORY_CHART_TYPES
+
+try:
+    import numpy as np
+except ImportError: # Columns are converted element by element without NumPy
+    np = None
+
+# Chart types whose history can be back-filled, the ones appending every update to the chart
+BULK_CHART_TYPES = HISTORY_CHART_TYPES
+
+# Chart types whose value is [[labels], [numbers]], a 2-D column with one entry per label
+_SERIES_CHART_TYPES = ('lines', 'bars', 'sequences')
+
+# Characters of 'YYYY-MM-DDTHH:MM:SS.ffffff' forming the 'YYYYMMDDHHMMSSffffff' payload id, like `DataStream.fresh`
+_ID_CHARACTERS = [0, 1, 2, 3, 5, 6, 8, 9, 11, 12, 14, 15, 17, 18, 20, 21, 22, 23, 24, 25]
+
+
+def _local_offset_ns(first_ns: int, last_ns: int) -> Union[int, None]:
+    """Returns the local UTC offset shared by two points in time, None if it changes in between (daylight saving)."""
+    first = time.localtime(first_ns // 1_000_000_000).tm_gmtoff
+    last = time.localtime(last_ns // 1_000_000_000).tm_gmtoff
+    return first * 1_000_000_000 if first == last else None
+
+
+def _timestamps_to_ns(timestamps: Any, unit: float) -> Any:
+    """
+    Converts a timestamp column to epoch nanoseconds, an int64 array with NumPy, else a list.
+    Naive datetimes are local time, like everywhere in the package.
+    """
+    if np is None:
+        return [time_to_ns(value, unit) for value in timestamps]
+
+    asi8 = getattr(timestamps, 'asi8', None) # pandas DatetimeIndex, already UTC when timezone-aware
+    if asi8 is not None and getattr(timestamps, 'tz', None) is not None:
+        return np.asarray(asi8, dtype='int64')
+    column = np.asarray(timestamps)
+    if column.dtype.kind == 'M':
+        naive_ns = column.astype('datetime64[ns]').astype('int64')
+        offset_ns = _local_offset_ns(int(naive_ns.min()), int(naive_ns.max())) if len(naive_ns) else 0
+        if offset_ns is not None:
+            return naive_ns - offset_ns
+        column = column.astype('datetime64[us]').astype(object) # Across a daylight saving change, convert one by one
+    elif column.dtype.kind in 'iu':
+        return column.astype('int64') * int(unit) if unit == int(unit) else (column * unit).astype('int64')
+    elif column.dtype.kind == 'f':
+        return (column * unit).astype('int64')
+    return np.fromiter((time_to_ns(value, unit) for value in column.tolist()), dtype='int64', count=len(column))
+
+
+def _format_timestamps(timestamps_ns: Any) -> Tuple[List[str], List[str]]:
+    """Formats epoch nanoseconds as payload ids and local ISO timestamps, like `DataStream.fresh`."""
+    if np is None or not len(timestamps_ns):
+        moments = [datetime.fromtimestamp(timestamp_ns / 1e9) for timestamp_ns in timestamps_ns]
+        return [moment.strftime("%Y%m%d%H%M%S%f") for moment in moments], [moment.isoformat() for moment in moments]
+
+    offset_ns = _local_offset_ns(int(timestamps_ns[0]), int(timestamps_ns[-1]))
+    if offset_ns is None:
+        moments = [datetime.fromtimestamp(timestamp_ns / 1e9) for timestamp_ns in timestamps_ns.tolist()]
+        return [moment.strftime("%Y%m%d%H%M%S%f") for moment in moments], [moment.isoformat() for moment in moments]
+    local = (timestamps_ns + offset_ns).astype('datetime64[ns]').astype('datetime64[us]')
+    isoformat = np.datetime_as_string(local, unit='us')
+    # Picks the id characters out of the fixed-width UCS-4 strings, no per-string Python work
+    ids = isoformat.view('uint32').reshape(len(isoformat), -1)[:, _ID_CHARACTERS].copy().view('U20').ravel()
+    return ids.tolist(), isoformat.tolist()
+
+
+def _number_column(values: Any, columns: int) -> List[Any]:
+    """
+    Checks that a value column holds finite numbers only and returns it as rows of Python
+    numbers, one number per row for `columns` 0, else lists of `columns` numbers.
+    """
+    if np is not None:
+        column = np.asarray(values)
+        if column.dtype.kind == 'O':
+            # Mixed Python objects, numbers only if they convert without parsing strings
+            if not all(isinstance(value, Number) and not isinstance(value, bool) for value in column.ravel().tolist()):
+                raise ValueError("Values must be numbers.")
+            try:
+                column = column.astype('float64')
+            except TypeError:
+                raise ValueError("Values must be real numbers.") from None
+        if column.dtype.kind not in 'iuf':
+            raise ValueError(f"Values must be numbers, got {column.dtype}.")
+        if column.ndim != (2 if columns else 1) or (columns and column.shape[1] != columns):
+            raise ValueError(f"Values must be {'a 1-D column' if not columns else f'rows of {columns} numbers'}, got shape {column.shape}.")
+        if column.dtype.kind == 'f' and not np.isfinite(column).all():
+            raise ValueError("Values must be finite numbers, NaN and infinity can not be sent to the browser.")
+        return column.tolist()
+
+    rows = [list(row) for row in values] if columns else list(values)
+    if columns and any(len(row) != columns for row in rows):
+        raise ValueError(f"Values must be rows of {columns} numbers.")
+    try:
+        flat = array('d', [value for row in rows for value in row] if columns else rows)
+    except TypeError:
+        raise ValueError("Values must be numbers.") from None
+    if any(value != value or value in (float('inf'), float('-inf')) for value in flat):
+        raise ValueError("Values must be finite numbers, NaN and infinity can not be sent to the browser.")
+    return rows
+
+
+def history_payloads(chart_type: str, timestamps: Any, values: Any, labels: Optional[Sequence[str]]=None, unit: float=1e9) -> Tuple[List[int], List[Dict[str, Any]]]:
+    """
+    Converts columns of timestamps and values into time-ordered data payloads, validating
+    each column as a whole instead of every payload on its own.
+
+    Parameters
+    ----------
+    chart_type : str
+        One of BULK_CHART_TYPES.
+    timestamps : Any
+        Datetimes, ISO strings or epoch numbers in `unit`, as a list, NumPy array or pandas index/series.
+    values : Any
+        Numbers for line, bar and sequence, rows of one number per label for lines, bars and
+        sequences, [x, y] rows for scatter.
+    labels : Optional[Sequence[str]], optional
+        The series labels of lines, bars and sequences.
+    unit : float, optional
+        Nanoseconds per unit of numeric timestamps. Defaults to 1e9 (epoch seconds).
+
+    Returns
+    -------
+    Tuple[List[int], List[Dict[str, Any]]]
+        The record times in epoch nanoseconds and the data payloads, sorted by time.
+    """
+    if chart_type not in BULK_CHART_TYPES:
+        raise ValueError(f"History can not be loaded into '{chart_type}' charts, expected one of {BULK_CHART_TYPES}.")
+    if chart_type in _SERIES_CHART_TYPES:
+        if labels is None:
+            raise ValueError(f"Loading the history of '{chart_type}' charts requires the series labels.")
+        labels = [str(label) for label in labels]
+        rows = _number_column(values, len(labels))
+        rows = [[labels, row] for row in rows]
+    else:
+        rows = _number_column(values, 2 if chart_type == 'scatter' else 0)
+
+    timestamps_ns = _timestamps_to_ns(timestamps, unit)
+    if len(timestamps_ns) != len(rows):
+        raise ValueError(f"Got {len(timestamps_ns)} timestamps for {len(rows)} values.")
+    if np is not None:
+        if len(timestamps_ns) > 1 and (timestamps_ns[1:] < timestamps_ns[:-1]).any():
+            order = np.argsort(timestamps_ns, kind='stable')
+            timestamps_ns = timestamps_ns[order]
+            rows = [rows[i] for i in order.tolist()]
+    elif any(later < earlier for earlier, later in zip(timestamps_ns, timestamps_ns[1:])):
+        order = sorted(range(len(rows)), key=timestamps_ns.__getitem__)
+        timestamps_ns = [timestamps_ns[i] for i in order]
+        rows = [rows[i] for i in order]
+
+    ids, isoformats = _format_timestamps(timestamps_ns)
+    payloads = [{"id": id, "timestamp": isoformat, "value": value} for id, isoformat, value in zip(ids, isoformats, rows)]
+    return list(timestamps_ns) if np is None else timestamps_ns.tolist(), payloads
+
+
+def dataframe_columns(chart_type: str, frame: Any, columns: Optional[Sequence[Any]]=None, time_column: Optional[Any]=None) -> Tuple[Any, Any, Optional[List[str]]]:
+    """
+    Picks the timestamp and value columns of a pandas DataFrame for `history_payloads`.
+
+    Parameters
+    ----------
+    chart_type : str
+        One of BULK_CHART_TYPES.
+    frame : Any
+        The DataFrame.
+    columns : Optional[Sequence[Any]], optional
+        The value columns: one for line, bar and sequence, one per series for lines, bars
+        and sequences (the column names become the labels), x and y for scatter. Defaults
+        to every column but the time column.
+    time_column : Optional[Any], optional
+        The timestamp column. Defaults to None (the index).
+
+    Returns
+    -------
+    Tuple[Any, Any, Optional[List[str]]]
+        Timestamps, values and series labels.
+    """
+    if columns is None:
+        columns = [column for column in frame.columns if time_column is None or column != time_column]
+    columns = list(columns)
+    timestamps = frame.index if time_column is None else frame[time_column]
+    if chart_type in _SERIES_CHART_TYPES:
+        return timestamps, frame[columns].to_numpy(), [str(column) for column in columns]
+    expected = 2 if chart_type == 'scatter' else 1
+    if len(columns) != expected:
+        raise ValueError(f"'{chart_type}' charts take {expected} value column{'s' if expected > 1 else ''}, got {columns}.")
+    return timestamps, frame[columns[0]].to_numpy() if expected == 1 else frame[columns].to_numpy(), None
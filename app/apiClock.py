@@ -0,0 +1,266 @@
+import time
+import heapq
+import itertools
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Union, Dict, Any, List, Tuple, Callable, Optional
+from .apiHistory import time_to_ns
+
+# Start of a virtual clock unless given, 2000-01-01T00:00:00Z, so runs are reproducible
+VIRTUAL_EPOCH_NS = 946684800 * 10 ** 9
+
+
+class Clock:
+    """
+    Wall clock. Every producer-side time read and wait of the package goes through
+    the current clock (see `get_clock`), so a `VirtualClock` can replace it.
+    """
+
+    def time_ns(self) -> int:
+        """Returns epoch nanoseconds."""
+        return time.time_ns()
+
+    def monotonic(self) -> float:
+        """Returns seconds of a clock that never goes backwards, for measuring intervals."""
+        return time.perf_counter()
+
+    def now(self) -> datetime:
+        """Returns the current local datetime, as `datetime.now()`."""
+        return datetime.now()
+
+    def sleep(self, seconds: float):
+        """Suspends the calling thread."""
+        time.sleep(seconds)
+
+    @contextmanager
+    def hold(self):
+        """
+        Keeps time from moving while producers are set up, so they all start at the
+        same instant. Only matters for a `VirtualClock`.
+        """
+        yield
+
+    def detach(self):
+        """
+        Called by a producer thread before it blocks on something other than the clock, 
+        see `attach`. Only matters for a `VirtualClock`.
+        """
+
+    def attach(self):
+        """Called by a producer thread after `detach` once it runs again."""
+
+    def start_thread(self, target: Callable, args: tuple=(), kwargs: Optional[Dict[str, Any]]=None, daemon: bool=True) -> threading.Thread:
+        """
+        Starts a producer thread. Threads started here take part in the clock's
+        schedule, which only matters for a `VirtualClock`.
+
+        Returns
+        -------
+        threading.Thread
+            The started thread.
+        """
+        thread = threading.Thread(target=target, args=args, kwargs=kwargs or {}, daemon=daemon)
+        thread.start()
+        return thread
+
+
+class VirtualClock(Clock):
+    """
+    Simulated clock for fast, deterministic runs. Time only moves when every producer
+    thread started through `start_thread` is waiting in `sleep`: the clock then jumps to
+    the earliest wake-up and releases that single sleeper. Producers therefore run one
+    at a time, in virtual time order (ties in the order they went to sleep), and an hour
+    of traffic takes as long as producing it does.
+
+    With `auto_advance=False` time only moves through `advance`, for tests stepping
+    through a scenario.
+    """
+
+    def __init__(self, start: Union[datetime, str, float, None]=None, auto_advance: bool=True):
+        """
+        Parameters
+        ----------
+        start : Union[datetime, str, float, None], optional
+            The initial time as datetime, ISO string or epoch seconds. Defaults to 2000-01-01 UTC.
+        auto_advance : bool, optional
+            Jump to the next wake-up as soon as all producers sleep. Defaults to True.
+        """
+        self.auto_advance = auto_advance
+        self._now_ns = time_to_ns(start, default=VIRTUAL_EPOCH_NS)
+        self._condition = threading.Condition()
+        self._sleepers: List[Tuple[int, int, bool]] = [] # Heap of (wake_ns, seq, participant)
+        self._released = set() # Seqs of sleepers allowed to return
+        self._seq = itertools.count()
+        self._participants = 0 # Producer threads started through start_thread and still alive
+        self._running = 0 # Participants not waiting in sleep (at most one) plus open holds
+        self._local = threading.local()
+
+    # Reading
+
+    def time_ns(self) -> int:
+        return self._now_ns
+
+    def monotonic(self) -> float:
+        return self._now_ns / 1e9
+
+    def now(self) -> datetime:
+        return datetime.fromtimestamp(self._now_ns / 1e9)
+
+    # Waiting
+
+    def sleep(self, seconds: float):
+        participant = getattr(self._local, 'participant', False)
+        with self._condition:
+            seq = self._schedule(self._now_ns + max(int(seconds * 1e9), 0), participant)
+            if participant:
+                self._running -= 1
+                self._condition.notify_all()
+            self._wait_released(seq)
+
+    def _schedule(self, wake_ns: int, participant: bool) -> int:
+        seq = next(self._seq)
+        heapq.heappush(self._sleepers, (wake_ns, seq, participant))
+        return seq
+
+    def _wait_released(self, seq: int):
+        """Waits, holding the condition, until the sleeper `seq` is released."""
+        if self.auto_advance:
+            self._step()
+        while seq not in self._released:
+            self._condition.wait()
+        self._released.discard(seq)
+
+    def _release_next(self, until_ns: Union[int, None]=None) -> bool:
+        """Moves time to the earliest wake-up and releases it, unless it is past `until_ns`."""
+        if not self._sleepers or (until_ns is not None and self._sleepers[0][0] > until_ns):
+            return False
+        wake_ns, seq, participant = heapq.heappop(self._sleepers)
+        self._now_ns = max(self._now_ns, wake_ns)
+        self._released.add(seq)
+        if participant:
+            self._running += 1
+        self._condition.notify_all()
+        return True
+
+    def _step(self, until_ns: Union[int, None]=None):
+        """Releases sleepers in time order until a producer runs again."""
+        while self._running == 0 and self._release_next(until_ns):
+            pass
+
+    def advance(self, seconds: float):
+        """
+        Moves time forward, releasing every sleeper due on the way in time order and
+        waiting for each released producer to sleep again or finish.
+
+        Parameters
+        ----------
+        seconds : float
+            The virtual seconds to move forward.
+        """
+        with self._condition:
+            target_ns = self._now_ns + int(seconds * 1e9)
+            while True:
+                self._condition.wait_for(lambda: self._running == 0)
+                if not self._release_next(target_ns):
+                    break
+            self._now_ns = max(self._now_ns, target_ns)
+
+    # Producers
+
+    @contextmanager
+    def hold(self):
+        with self._condition:
+            self._running += 1 # Counts as a running producer, time waits for it
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._running -= 1
+                if self.auto_advance:
+                    self._step()
+                self._condition.notify_all()
+
+    def detach(self):
+        # Time no longer waits for this thread
+        if not getattr(self._local, 'participant', False):
+            return
+        self._local.participant = False
+        self._local.detached = True
+        with self._condition:
+            self._participants -= 1
+            self._running -= 1
+            if self.auto_advance:
+                self._step()
+            self._condition.notify_all()
+
+    def attach(self):
+        # Rejoins at the current virtual time, once it is this thread's turn
+        if not getattr(self._local, 'detached', False):
+            return
+        self._local.detached = False
+        self._local.participant = True
+        with self._condition:
+            self._participants += 1
+            self._wait_released(self._schedule(self._now_ns, True))
+
+    def start_thread(self, target: Callable, args: tuple=(), kwargs: Optional[Dict[str, Any]]=None, daemon: bool=True) -> threading.Thread:
+        """
+        Starts a producer thread taking part in the schedule. It first waits for its
+        turn at the current virtual time, so producers started together begin in the
+        order they were started.
+        """
+        with self._condition:
+            self._participants += 1
+            seq = self._schedule(self._now_ns, True)
+
+        def run():
+            self._local.participant = True
+            try:
+                with self._condition:
+                    self._wait_released(seq)
+                target(*args, **(kwargs or {}))
+            finally:
+                with self._condition:
+                    self._participants -= 1
+                    self._running -= 1
+                    if self.auto_advance:
+                        self._step()
+                    self._condition.notify_all()
+
+        thread = threading.Thread(target=run, daemon=daemon)
+        thread.start()
+        return thread
+
+    def idle(self) -> bool:
+        """Returns True when no producer is left."""
+        return self._participants == 0
+
+
+_clock: Clock = Clock()
+
+
+def get_clock() -> Clock:
+    """Returns the clock currently used by the package."""
+    return _clock
+
+
+def set_clock(clock: Optional[Clock]=None) -> Clock:
+    """
+    Replaces the clock used by the package, e.g. with a `VirtualClock`. It should be set
+    before producers start, since a running producer keeps waiting on the clock it slept on.
+
+    Parameters
+    ----------
+    clock : Optional[Clock], optional
+        The new clock. None restores the wall clock.
+
+    Returns
+    -------
+    Clock
+        The previous clock.
+    """
+    global _clock
+    previous = _clock
+    _clock = clock if clock is not None else Clock()
+    return previous
@@ -0,0 +1,169 @@
+import json
+import logging
+from typing import Union, Any, List, Tuple, Sequence
+from websockets.extensions.permessage_deflate import PerMessageDeflate, ServerPerMessageDeflateFactory
+from websockets.frames import CTRL_OPCODES, Opcode, Frame
+from .apiMetrics import Counter
+
+logger = logging.getLogger(__name__)
+
+# Messages below this many encoded bytes are sent uncompressed, e.g. Gauge or Text updates
+DEFAULT_THRESHOLD = 1024
+
+# Start of the message priming the window with the dictionary, compressed whatever its size
+PRIMER_PREFIX = b'{"status": "dictionary"'
+
+
+class AdaptiveDeflate(PerMessageDeflate):
+    """
+    permessage-deflate deciding per message: frames below the size threshold are sent
+    as is, with the RSV1 bit unset as RFC 7692 allows, so small updates cost no CPU.
+    Both ends only run compressed messages through their LZ77 window, which keeps the
+    window shared when the context is taken over from message to message.
+    """
+
+    def __init__(self, *args: Any, threshold: int=DEFAULT_THRESHOLD, counters: Union[Tuple[Counter, Counter, Counter, Counter], None]=None, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.threshold = threshold
+        self.counters = counters # (compressed, skipped, bytes in, bytes out)
+        self._skipping = False # The first frame of the current fragmented message was sent uncompressed
+
+    def encode(self, frame: Frame) -> Frame:
+        """Compresses the frame unless it is a control frame or its message is below the threshold."""
+        if frame.opcode in CTRL_OPCODES:
+            return frame
+        if frame.opcode is Opcode.CONT:
+            if self._skipping:
+                self._skipping = not frame.fin
+                return frame
+            return super().encode(frame)
+        counters = self.counters
+        if len(frame.data) < self.threshold and not frame.data.startswith(PRIMER_PREFIX):
+            self._skipping = not frame.fin
+            if counters is not None:
+                counters[1].inc()
+            return frame
+        encoded = super().encode(frame)
+        if counters is not None:
+            counters[0].inc()
+            counters[2].inc(len(frame.data))
+            counters[3].inc(len(encoded.data))
+        return encoded
+
+
+class Compression:
+    """
+    Compression settings of the WebSocket server: messages of at least `threshold` bytes
+    are deflated with the given zlib level, window and memory level, smaller ones are
+    sent as is. Surface and Areas snapshots shrink several times, Gauge and Text frames
+    are not worth the CPU.
+
+    permessage-deflate has no way to announce a preset dictionary to browsers, so a
+    `dictionary` primes the shared window instead: it is sent once, compressed, right
+    after the handshake (see `primer`), and the following messages refer back to it
+    while it is still within the window. This needs context takeover and a window at
+    least as large as the dictionary.
+    """
+
+    __slots__ = ('threshold', 'level', 'window_bits', 'mem_level', 'dictionary', 'context_takeover')
+
+    def __init__(self, threshold: int=DEFAULT_THRESHOLD, level: int=6, window_bits: int=12, mem_level: int=5, dictionary: Union[str, None]=None, context_takeover: bool=True):
+        """
+        Parameters
+        ----------
+        threshold : int, optional
+            Encoded bytes from which a message is compressed, 0 compresses every message.
+            Defaults to 1024.
+        level : int, optional
+            zlib compression level, 1 (fastest) to 9 (smallest). Defaults to 6.
+        window_bits : int, optional
+            Base two logarithm of the server's LZ77 window, 9 to 15. Together with the
+            memory level it sets the zlib state held per connection, about 64 KiB with
+            the defaults against 256 KiB with 15 and 8. Defaults to 12 (4 KiB window).
+        mem_level : int, optional
+            zlib memory level, 1 to 9. Defaults to 5.
+        dictionary : Union[str, None], optional
+            Text repeated across payloads, e.g. labels and key words, primed into the
+            window of every connection. Defaults to None.
+        context_takeover : bool, optional
+            Keep the window from message to message, better ratios for one window of
+            memory per connection. Defaults to True.
+        """
+        if threshold < 0:
+            raise ValueError(f"Compression threshold must not be negative, got {threshold}.")
+        if not 1 <= level <= 9:
+            raise ValueError(f"Compression level must be between 1 and 9, got {level}.")
+        if not 9 <= window_bits <= 15:
+            raise ValueError(f"Compression window bits must be between 9 and 15, got {window_bits}.")
+        if not 1 <= mem_level <= 9:
+            raise ValueError(f"Compression memory level must be between 1 and 9, got {mem_level}.")
+        self.threshold = int(threshold)
+        self.level = int(level)
+        self.window_bits = int(window_bits)
+        self.mem_level = int(mem_level)
+        self.context_takeover = context_takeover
+        self.dictionary = dictionary or None
+        if self.dictionary is not None:
+            if not context_takeover:
+                logger.warning("The compression dictionary needs context takeover, it is ignored.")
+                self.dictionary = None
+            elif len(self.dictionary.encode()) > 2 ** self.window_bits:
+                logger.warning(f"The compression dictionary is larger than the {2 ** self.window_bits} bytes window, only its end is used.")
+
+    def factories(self, counters: Union[Tuple[Counter, Counter, Counter, Counter], None]=None) -> List['AdaptiveDeflateFactory']:
+        """
+        Returns the server extension factories to pass to `serve`.
+
+        Parameters
+        ----------
+        counters : Union[Tuple[Counter, Counter, Counter, Counter], None], optional
+            Counters of compressed and skipped messages, and of bytes before and after
+            compression. Defaults to None.
+        """
+        return [AdaptiveDeflateFactory(
+            server_no_context_takeover=not self.context_takeover,
+            server_max_window_bits=self.window_bits,
+            compress_settings={'level': self.level, 'memLevel': self.mem_level},
+            threshold=self.threshold,
+            counters=counters,
+        )]
+
+    def primer(self, extensions: Sequence[Any]) -> Union[str, None]:
+        """
+        Returns the message priming a connection's window with the dictionary, None without
+        a dictionary or when the connection negotiated no compression or no context takeover.
+        The primer is recognized by its PRIMER_PREFIX and compressed whatever the threshold,
+        clients ignore its 'dictionary' status.
+
+        Parameters
+        ----------
+        extensions : Sequence[Any]
+            The extensions negotiated by the connection.
+        """
+        if self.dictionary is None:
+            return None
+        for extension in extensions:
+            if isinstance(extension, AdaptiveDeflate) and not extension.local_no_context_takeover:
+                return json.dumps({"status": "dictionary", "data": self.dictionary})
+        return None
+
+
+class AdaptiveDeflateFactory(ServerPerMessageDeflateFactory):
+    """Negotiates permessage-deflate like the websockets factory, building `AdaptiveDeflate` extensions."""
+
+    def __init__(self, *args: Any, threshold: int=DEFAULT_THRESHOLD, counters: Union[Tuple[Counter, Counter, Counter, Counter], None]=None, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.threshold = threshold
+        self.counters = counters
+
+    def process_request_params(self, params: Sequence[Tuple[str, Union[str, None]]], accepted_extensions: Sequence[Any]) -> Tuple[List[Tuple[str, Union[str, None]]], AdaptiveDeflate]:
+        response_params, extension = super().process_request_params(params, accepted_extensions)
+        return response_params, AdaptiveDeflate(
+            extension.remote_no_context_takeover,
+            extension.local_no_context_takeover,
+            extension.remote_max_window_bits,
+            extension.local_max_window_bits,
+            extension.compress_settings,
+            threshold=self.threshold,
+            counters=self.counters,
+        )
@@ -1,18 +1,110 @@
-import sys,os
+import time
+import secrets
+import itertools
 import asyncio
 import threading
 import json
 import logging
-from typing import Union, Dict, Any, Set, Deque, Callable, Awaitable
-from collections import deque
+from typing import Union, Dict, Any, Set, FrozenSet, Deque, List, Tuple, Callable
+from collections import deque, OrderedDict
+from http import HTTPStatus
 from websockets.server import serve, WebSocketServerProtocol
 from websockets.exceptions import ConnectionClosedOK, ConnectionClosedError, ConnectionClosed
+from websockets.protocol import State
+from .apiRecord import StreamRecorder, read_stream_range
+from .apiHistory import StreamHistory, downsample, time_to_ns, MAX_TIMESTAMP_NS, HISTORY_CHART_TYPES
+from .apiSnapshot import SnapshotReader, write_snapshot, open_snapshot
+from .apiMetrics import MetricsRegistry
+from .apiClock import get_clock
+from .apiIndex import KeyIndex, PatternTable
+from .apiDerive import Derivation, source_number, DERIVED_SOURCE_CHART_TYPES
+from .apiQuantize import Quantizer
+from .apiCompress import Compression
+from .apiAdmission import RateLimiter
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Key words starting with this prefix are reserved for the built-in diagnostics streams
+DIAGNOSTICS_KEY_WORD = '_sdp'
+
+# Hot path events profiling hooks can be attached to, see `WebsocketManager.add_hook`
+HOOK_EVENTS = ('pre_enqueue', 'post_dequeue', 'pre_encode', 'post_encode', 'pre_send', 'post_send', 'on_subscribe')
+
+def _run_hooks(hooks: Tuple[Callable, ...], *args):
+    """Calls every hook of an event, a failing hook is logged and never breaks delivery."""
+    for hook in hooks:
+        try:
+            hook(*args)
+        except Exception as e:
+            logger.error(f"Hook {getattr(hook, '__name__', hook)} failed: {e}")
+
+# Event loop implementations of the server thread, see `new_event_loop`
+EVENT_LOOPS = ('auto', 'asyncio', 'uvloop')
+
+def new_event_loop(kind: str='auto') -> Tuple[asyncio.AbstractEventLoop, str]:
+    """
+    Creates an event loop of the requested implementation. 'auto' uses uvloop when it 
+    is installed, 'uvloop' falls back to the stdlib loop with a warning when it is not.
+
+    Returns
+    -------
+    Tuple[asyncio.AbstractEventLoop, str]
+        The new loop and the implementation actually used, 'asyncio' or 'uvloop'.
+    """
+    if kind not in EVENT_LOOPS:
+        raise ValueError(f"Unknown event loop '{kind}', expected one of {EVENT_LOOPS}.")
+    if kind != 'asyncio':
+        try:
+            import uvloop
+            return uvloop.new_event_loop(), 'uvloop'
+        except ImportError:
+            if kind == 'uvloop':
+                logger.warning("uvloop is not installed, falling back to the asyncio event loop.")
+    return asyncio.new_event_loop(), 'asyncio'
+
+class _StreamClose:
+    """
+    Queued in place of a payload by `unregister_data_stream`, so updates queued before it are still
+    delivered. Carries the registration count of the stream when closed, a stream registered again
+    meanwhile is not closed.
+    """
+    __slots__ = ('registrations',)
+
+    def __init__(self, registrations: int):
+        self.registrations = registrations
+
+# Queued in place of a payload by `register_data_stream` when pattern subscriptions may match the new stream
+_STREAM_REGISTERED = object()
+
+class _HistoryBatch:
+    """Queued in place of a payload by `load_history_sync`, points back-filled into the history in one go."""
+    __slots__ = ('timestamps_ns', 'payloads')
+
+    def __init__(self, timestamps_ns: List[int], payloads: List[Dict[str, Any]]):
+        self.timestamps_ns = timestamps_ns
+        self.payloads = payloads
+
+# Key words ending with this character subscribe to every stream of the chart type starting with the rest
+PATTERN_WILDCARD = '*'
+
+def _tag_message(message: str, stream_id: int) -> str:
+    """Adds the stream id to an encoded payload for pattern subscribers, without encoding it again."""
+    if message == '{}':
+        return f'{{"stream_id": {stream_id}}}'
+    return f'{{"stream_id": {stream_id}, {message[1:]}'
+
+def _make_payload(value: Any) -> Dict[str, Any]:
+    """Builds a data payload stamped with the current time, like `DataStream.fresh`."""
+    now = get_clock().now()
+    return {
+        "id": now.strftime("%Y%m%d%H%M%S%f"),
+        "timestamp": now.isoformat(),
+        "value": value
+    }
+
 # Asynchronous wrapper to handle synchronous data retrieval in user code, returning initial/cached data on frontend subscription
-async def _simulate_initial_data_fetch(data_key: str, cache_data: Dict[str, Any], all_valid_keys: Set[str]):
+async def _simulate_initial_data_fetch(data_key: str, cache_data: Dict[str, Tuple[int, Dict[str, Any]]], all_valid_keys: Set[str]):
     """
     Simulates data check and retrieval upon frontend subscription.
 
@@ -23,8 +115,8 @@ async def _simulate_initial_data_fetch(data_key: str, cache_data: Dict[str, Any]
     ----------
     data_key : str
         The unique identifier for the data stream (e.g., 'line<:>test_stream').
-    cache_data : Dict[str, Any]
-        A dictionary holding the latest data payload for all streams.
+    cache_data : Dict[str, Tuple[int, Dict[str, Any]]]
+        A dictionary holding the latest (version, data payload) for all streams.
     all_valid_keys : Set[str]
         A set of all data keys registered by the user's synchronous code.
 
@@ -39,10 +131,9 @@ async def _simulate_initial_data_fetch(data_key: str, cache_data: Dict[str, Any]
         
     if data_key in cache_data:
         # If cached, return the cache directly
-        return cache_data[data_key]
+        return cache_data[data_key][1]
     else:
         # Simulate generating an empty or default initial data structure
-        chart_type, key_word = data_key.split('<:>', 1)
         return {
             "id": "INIT",
             "timestamp": "N/A",
@@ -50,9 +141,27 @@ async def _simulate_initial_data_fetch(data_key: str, cache_data: Dict[str, Any]
         }
 
 
+class _StreamSlot:
+    """Per-stream state the update hot path reaches by stream id, without string-keyed lookups."""
+    __slots__ = ('data_key', 'subscribers', 'pattern_subscribers', 'history', 'updates', 'last_update_ns', 'derived', 'quantizer', 'critical', 'keeps_history', 'registrations')
+
+    def __init__(self, data_key: str):
+        self.data_key = data_key
+        self.subscribers: Set[WebSocketServerProtocol] = set() # Held by _subscriptions under the key while not empty
+        self.pattern_subscribers: Set[WebSocketServerProtocol] = set() # Attached through a pattern, receive tagged messages
+        self.history: Union[StreamHistory, None] = None # Same object as in _history, attached on the first update
+        self.updates = None # Child of the updates_total metric, attached on the first update
+        self.last_update_ns: Union[int, None] = None # Clock time of the latest update
+        self.derived: Tuple[Tuple[int, Derivation], ...] = () # (stream id, derivation) of the streams derived from this one, replaced never mutated
+        self.quantizer: Union[Quantizer, None] = None # Lossy encoding of the payloads sent, see `set_stream_precision`
+        self.critical = True # Still pushed in overload mode, see `set_stream_critical`
+        self.keeps_history = data_key.partition('<:>')[0] in HISTORY_CHART_TYPES # Appending chart types only
+        self.registrations = 0 # Calls of `register_data_stream`, changed under _lock
+
+
 class WebsocketManager:
     """Backend manager that runs the WebSocket server and asyncio event loop in a separate thread. It acts as a bridge between synchronous and asynchronous code."""
-    def __init__(self, host: str, port: int, route: str):
+    def __init__(self, host: str, port: int, route: str, recorder: Union[StreamRecorder, None]=None, history_size: int=1000, snapshot_path: Union[str, None]=None, snapshot_interval: float=60.0, metrics_path: Union[str, None]='/metrics', diagnostics_interval: float=1.0, trace_every: int=0, event_loop: str='asyncio', cache_budget: int=0, stream_ttl: float=0, compression: Union[Compression, bool]=True, ping_interval: Union[float, None]=20.0, ping_timeout: Union[float, None]=20.0, stall_timeout: float=10.0, max_connections: int=0, max_connections_per_ip: int=0, max_subscriptions: int=0, subscription_rate: float=0, subscription_burst: int=20, overload_lag: float=0):
         """
         Initializes the WebSocket Manager.
 
@@ -64,35 +173,238 @@ class WebsocketManager:
             The port number for the WebSocket server.
         route : str
             The route path for the WebSocket service (e.g., '/data').
+        recorder : Union[StreamRecorder, None], optional
+            Optional recorder persisting every update to disk. Defaults to None (no recording).
+        history_size : int, optional
+            The number of latest updates kept in memory per stream for history queries, 
+            for the chart types appending updates (HISTORY_CHART_TYPES) only: Surface, Areas 
+            and other whole-chart payloads are not kept. 0 disables the in-memory history. 
+            Defaults to 1000.
+        snapshot_path : Union[str, None], optional
+            File the cache is checkpointed to and warm-started from. Defaults to None (no snapshot).
+        snapshot_interval : float, optional
+            Seconds between periodic checkpoints, 0 only checkpoints at shutdown. Defaults to 60s.
+        metrics_path : Union[str, None], optional
+            HTTP path serving the metrics in Prometheus text format on the WebSocket port. 
+            None disables it. Defaults to '/metrics'.
+        diagnostics_interval : float, optional
+            Seconds between updates of the built-in diagnostics streams (key words starting 
+            with '_sdp'), 0 disables them. Defaults to 1s.
+        trace_every : int, optional
+            Trace every N-th update end to end, from `push_update_sync` to the browser 
+            render, 0 disables tracing. Defaults to 0.
+        event_loop : str, optional
+            Event loop implementation of the server thread: 'asyncio', 'uvloop' or 'auto' 
+            (uvloop when installed). Ignored in embedded mode. Defaults to 'asyncio'.
+        cache_budget : int, optional
+            Bytes of encoded payloads the cache may hold, the payloads of the least recently 
+            updated or subscribed streams are evicted beyond it. 0 means unbounded. Defaults to 0.
+        stream_ttl : float, optional
+            Seconds without updates after which a stream is unregistered, see 
+            `set_stream_ttl` for single streams. 0 keeps idle streams. Defaults to 0.
+        compression : Union[Compression, bool], optional
+            permessage-deflate settings: size threshold, zlib level and window, preset 
+            dictionary. True uses the `Compression` defaults, False disables compression. 
+            Defaults to True.
+        ping_interval : Union[float, None], optional
+            Seconds between keepalive pings to every client, None disables them. Defaults to 20s.
+        ping_timeout : Union[float, None], optional
+            Seconds to wait for the pong, a client not answering in time is reaped. None 
+            waits forever. Defaults to 20s.
+        stall_timeout : float, optional
+            Seconds a client's send buffer may stay non-empty without draining before the 
+            client is reaped, e.g. a sleeping laptop. 0 disables the check. Defaults to 10s.
+        max_connections : int, optional
+            Open connections accepted in total, 0 means unlimited. Defaults to 0.
+        max_connections_per_ip : int, optional
+            Open connections accepted per client IP, 0 means unlimited. Defaults to 0.
+        max_subscriptions : int, optional
+            Streams one connection may subscribe to, i.e. a pattern may attach, 0 means 
+            unlimited. Defaults to 0.
+        subscription_rate : float, optional
+            Subscriptions per second accepted per client IP, 0 means unlimited. Defaults to 0.
+        subscription_burst : int, optional
+            Subscriptions per client IP accepted at once before the rate applies. Defaults to 20.
+        overload_lag : float, optional
+            Event loop lag in seconds entering overload mode, which sheds history replays 
+            and the updates of non-critical streams, and rejects new subscriptions, until 
+            the lag has stayed below half of it for a second. 0 disables it. Defaults to 0.
         """
         # Connection info
         self.host = host
         self.port = port
         self.route = route
+        self.compression = Compression() if compression is True else compression or None
 
         # Asynchronous core components
+        if event_loop not in EVENT_LOOPS:
+            raise ValueError(f"Unknown event loop '{event_loop}', expected one of {EVENT_LOOPS}.")
+        self.event_loop = event_loop # Requested implementation, replaced by the one in use once started
         self.loop: asyncio.AbstractEventLoop = None
+        self._server = None
         self._server_task: asyncio.Task = None
+        self._ready = threading.Event() # Set once the server is listening
         
         # Thread components
         self._server_thread: threading.Thread = None
         self._is_running = False
+        self._embedded = False # Runs on a loop owned by the caller, see start_in_loop
+        self._tasks: Set[asyncio.Task] = set() # Tasks this manager created on its loop
         
         # Data and connection management, accessed in the async thread, requires protection 
-        self._cache: Dict[str, Dict[str, Any]] = {} 
+        # Cache entries are (version, payload) tuples that are replaced, never mutated, so any 
+        # thread reads a consistent entry without a lock. Versions grow with every update of any stream.
+        self._cache: Dict[str, Tuple[int, Dict[str, Any]]] = {} 
+        self._cache_versions = itertools.count(1)
         self._subscriptions: Dict[str, Set[WebSocketServerProtocol]] = {}
         self._valid_data_keys: Set[str] = set() # Records all valid keys registered by the user via Line('test')
+
+        # Interned stream ids: every data key gets a small integer the hot path indexes slots with
+        self._stream_ids: Dict[str, int] = {}
+        self._slots: List[_StreamSlot] = [] # By stream id, ids are never reused
+
+        # Pattern subscriptions such as 'desk1.*', the key index and pattern table are guarded by _lock like _valid_data_keys
+        self._key_index = KeyIndex()
+        self._patterns = PatternTable()
+        self._pattern_subscriptions: Dict[WebSocketServerProtocol, Tuple[str, str, Set[int]]] = {} # websocket -> (chart_type, prefix, attached stream ids)
+
+        # Stream lifecycle: cache memory budget and idle expiry, accessed in the async thread only
+        self.cache_budget = cache_budget
+        self._cache_sizes: OrderedDict[str, int] = OrderedDict() # Encoded payload bytes by stream, least recently used first
+        self._cache_bytes = 0
+        self.stream_ttl = stream_ttl
+        self._stream_ttls: Dict[str, float] = {} # Per-stream overrides of stream_ttl
+        self._expired: Set[int] = set() # Ids of streams unregistered for being idle, registered again by their next update
+        self.expiry_interval = 1.0
+
+        # Dead subscriber reaping: keepalive pings, and send buffers that stopped draining
+        self.ping_interval = ping_interval
+        self.ping_timeout = ping_timeout
+        self.stall_timeout = stall_timeout
+        self._write_stalls: Dict[WebSocketServerProtocol, Tuple[int, Union[float, None]]] = {} # websocket -> (buffered bytes, monotonic time since which they did not drain)
+        self.reap_interval = 1.0
+
+        # Admission control and overload mode, accessed in the async thread only
+        self.max_connections = max_connections
+        self.max_connections_per_ip = max_connections_per_ip
+        self.max_subscriptions = max_subscriptions
+        self._subscription_limiter = RateLimiter(subscription_rate, subscription_burst)
+        self._connection_count = 0
+        self._connections_by_ip: Dict[str, int] = {}
+        self.overload_lag = overload_lag
+        self.lag_interval = 0.1
+        self._loop_lag = 0.0
+        self._overloaded = False
         
         # Sync/Async communication queue, used to bridge synchronous calls to the asynchronous loop
-        self._update_queue: Deque[tuple[str, Dict[str, Any]]] = deque()
+        self._update_queue: Deque[tuple[int, Dict[str, Any], int]] = deque() # (stream id, payload, trace stamp or 0)
         self._update_event: asyncio.Event = None # Notifies the async loop that new data is available
 
+        # Optional persistence of every update, written off the event loop
+        self._recorder = recorder
+
+        # Latest updates per stream for time-range queries, accessed in the async thread only
+        self._history_size = history_size
+        self._history: Dict[str, StreamHistory] = {}
+
+        # Warm-start snapshot of the cache, payloads are restored lazily on first access
+        self._snapshot_path = snapshot_path
+        self._snapshot_interval = snapshot_interval
+        self._snapshot: Union[SnapshotReader, None] = None
+        self._snapshot_dirty = False
+
+        # Hot-restart handoff: resume tokens issued to clients of a predecessor manager
+        self._resume_from: Dict[str, int] = {} # Latest update time each stream had reached when handed over
+        self._resume_tokens: Dict[str, Tuple[str, Union[int, None], float]] = {} # token -> (data_key, since_ns, expiry)
+        self.resume_token_ttl = 60.0
+
+        # Metrics, updated on the event loop
+        self.metrics = MetricsRegistry()
+        self.metrics_path = metrics_path
+        self.diagnostics_interval = diagnostics_interval
+        self._metric_updates = self.metrics.counter('updates_total', 'Updates processed, by stream.', ('stream',))
+        self._metric_messages = self.metrics.counter('messages_sent_total', 'Messages sent to clients.')
+        self._metric_dropped = self.metrics.counter('dropped_clients_total', 'Clients dropped because a send to them failed.')
+        self._metric_admission = self.metrics.counter('admission_rejections_total', 'Connections and subscriptions refused, by reason: connections, connections_per_ip, subscriptions, rate or overload.', ('reason',))
+        self._metric_shed = self.metrics.counter('shed_total', 'Work skipped in overload mode, by kind: history (queries and replays) or stream (updates of non-critical streams).', ('kind',))
+        self.metrics.gauge('loop_lag_seconds', 'Event loop lag at the latest check, measured while overload_lag is set.', lambda: self._loop_lag)
+        self.metrics.gauge('overloaded', '1 while in overload mode.', lambda: int(self._overloaded))
+        self._metric_reaped = self.metrics.counter('reaped_clients_total', 'Dead clients reaped, by reason: ping_timeout or stalled (send buffer not draining).', ('reason',))
+        self._metric_rejected = self.metrics.counter('rejected_subscriptions_total', 'Subscriptions rejected as invalid.')
+        self._metric_encode = self.metrics.histogram('encode_seconds', 'Time to encode one update.')
+        self._metric_send = self.metrics.histogram('send_seconds', 'Time to send one message to one client.')
+        self._connection_bytes: Dict[WebSocketServerProtocol, int] = {} # Bytes sent, by live connection
+        self._client_features: Dict[WebSocketServerProtocol, FrozenSet[str]] = {} # Features announced in the subscription, e.g. "trace" and "batch"
+        self.metrics.gauge('queue_depth', 'Updates waiting in the update queue.', lambda: len(self._update_queue))
+        self.metrics.gauge('streams', 'Registered data streams.', lambda: len(self._valid_data_keys))
+        self.metrics.gauge('connections', 'Open client connections.', lambda: len(self._connection_bytes))
+        self.metrics.gauge('subscribers', 'Subscribed clients, by stream.', lambda: [((data_key,), len(subscribers)) for data_key, subscribers in list(self._subscriptions.items())], ('stream',))
+        self.metrics.gauge('pattern_subscriptions', 'Open pattern subscriptions.', lambda: len(self._pattern_subscriptions))
+        self.metrics.gauge('cache_bytes', 'Encoded size of the cached payload, by stream. Only accounted with a cache budget.', lambda: [((data_key,), size) for data_key, size in list(self._cache_sizes.items())], ('stream',))
+        self._metric_evicted = self.metrics.counter('cache_evictions_total', 'Cached payloads evicted to stay within the cache budget.')
+        self._metric_closed = self.metrics.counter('closed_streams_total', 'Streams unregistered, by reason: closed or expired.', ('reason',))
+        self._metric_compressed = self.metrics.counter('compression_messages_total', 'Messages sent, by outcome: compressed or skipped (below the threshold).', ('outcome',))
+        self._metric_compressed_bytes = self.metrics.counter('compression_bytes_total', 'Bytes of compressed messages, by stage: in (before) or out (after compression).', ('stage',))
+        # End-to-end tracing of sampled updates, stamped with time.monotonic_ns()
+        self.trace_every = trace_every
+        self._trace_counter = itertools.count()
+        self._trace_ids = itertools.count(1)
+        self._trace_pending: OrderedDict[Tuple[int, WebSocketServerProtocol], Tuple[str, int]] = OrderedDict() # Sent, waiting for the browser echo
+        self._trace_pending_limit = 10000
+        self._metric_trace = self.metrics.histogram('trace_stage_seconds', 'Latency of traced updates by stream and stage: queue, encode, send, network (round trip) and render (browser).', ('stream', 'stage'))
+        self.metrics.gauge('connection_bytes_sent', 'Bytes sent, by open connection.', lambda: [((f"{websocket.remote_address[0]}:{websocket.remote_address[1]}",), sent) for websocket, sent in list(self._connection_bytes.items())], ('client',))
+
+        # Profiling hooks by event, empty tuples keep the hot path free of any call when unused
+        self._hooks: Dict[str, Tuple[Callable, ...]] = {event: () for event in HOOK_EVENTS}
+
         # Thread Lock
         self._lock = threading.Lock()
 
+    # Profiling hooks
+
+    def add_hook(self, event: str, callback: Callable):
+        """
+        Attaches a callback to a hot path event. Callbacks run inline, so they should 
+        be cheap; exceptions are logged and ignored.
+
+        Events and callback arguments:
+            pre_enqueue(data_key, payload)                          in the producer thread
+            post_dequeue(data_key, payload)                         on the event loop, from here on
+            pre_encode(data_key, payload)
+            post_encode(data_key, payload, message)
+            pre_send(data_key, message, subscribers)
+            post_send(data_key, message, subscribers, disconnected)
+            on_subscribe(data_key, websocket)
+
+        Parameters
+        ----------
+        event : str
+            One of HOOK_EVENTS.
+        callback : Callable
+            The callback.
+        """
+        if event not in HOOK_EVENTS:
+            raise ValueError(f"Unknown hook event '{event}', expected one of {HOOK_EVENTS}.")
+        with self._lock:
+            self._hooks[event] = self._hooks[event] + (callback,)
+
+    def remove_hook(self, event: str, callback: Callable):
+        """
+        Detaches a callback added by `add_hook`. Unknown callbacks are ignored.
+
+        Parameters
+        ----------
+        event : str
+            One of HOOK_EVENTS.
+        callback : Callable
+            The callback.
+        """
+        with self._lock:
+            self._hooks[event] = tuple(hook for hook in self._hooks.get(event, ()) if hook is not callback)
+
     # Synchronous call bridge functions for the user-facing API
 
-    def register_data_stream(self, data_key: str):
+    def register_data_stream(self, data_key: str) -> int:
         """
         Registers a new data stream key, confirming it's available for subscription.
         Called synchronously by the user's `DataStream` object during initialization.
@@ -101,11 +413,206 @@ class WebsocketManager:
         ----------
         data_key : str
             The unique identifier for the data stream.
+
+        Returns
+        -------
+        int
+            The stream id, see `stream_id`.
+        """
+        stream_id = self.stream_id(data_key)
+        with self._lock:
+            attach = data_key not in self._valid_data_keys and bool(self._patterns)
+            self._add_valid_key(data_key)
+            self._slots[stream_id].registrations += 1
+        if attach:
+            # Attached on the loop, before any update queued after the registration
+            self._update_queue.append((stream_id, _STREAM_REGISTERED, 0))
+            self._wake_update_loop()
+        return stream_id
+
+    def _add_valid_key(self, data_key: str):
+        """Marks a key valid for subscription and indexes it for pattern subscriptions, called holding _lock."""
+        self._valid_data_keys.add(data_key)
+        chart_type, _, key_word = data_key.partition('<:>')
+        self._key_index.add(chart_type, key_word)
+
+    def _discard_valid_key(self, data_key: str):
+        """Reverts `_add_valid_key`, called holding _lock."""
+        self._valid_data_keys.discard(data_key)
+        chart_type, _, key_word = data_key.partition('<:>')
+        self._key_index.discard(chart_type, key_word)
+
+    def stream_id(self, data_key: str) -> int:
+        """
+        Returns the interned id of a data key, assigning the next one on first use. 
+        Pushing with the id skips every string-keyed lookup on the hot path. Ids are 
+        never reused, so a stale id can not reach another stream, and they are only 
+        valid for this manager.
+
+        Parameters
+        ----------
+        data_key : str
+            The unique identifier for the data stream.
+
+        Returns
+        -------
+        int
+            The stream id.
+        """
+        stream_id = self._stream_ids.get(data_key)
+        if stream_id is None:
+            with self._lock:
+                stream_id = self._stream_ids.get(data_key)
+                if stream_id is None:
+                    # The slot exists before its id is published to other threads
+                    self._slots.append(_StreamSlot(data_key))
+                    stream_id = self._stream_ids[data_key] = len(self._slots) - 1
+        return stream_id
+
+    def unregister_data_stream(self, data_key: Union[str, int]):
+        """
+        Unregisters a data stream. Updates already queued are still delivered, then 
+        its cache and history are released and its subscribers are told the stream 
+        was closed and disconnected. Recorded history stays on disk. A stream 
+        registered again before the loop got to the close is kept as it is.
+
+        Parameters
+        ----------
+        data_key : Union[str, int]
+            The unique identifier for the data stream, or its stream id.
+        """
+        stream_id = data_key if type(data_key) is int else self.stream_id(data_key)
+        slot = self._slots[stream_id]
+        with self._lock:
+            self._discard_valid_key(slot.data_key)
+            registrations = slot.registrations
+        self._update_queue.append((stream_id, _StreamClose(registrations), 0))
+        self._wake_update_loop()
+
+    def set_stream_ttl(self, data_key: str, ttl: Union[float, None]):
+        """
+        Sets how long a stream may go without updates before it is unregistered like 
+        by `unregister_data_stream`. An expired stream is registered again by its next 
+        update, so a producer that merely paused comes back on its own.
+
+        Parameters
+        ----------
+        data_key : str
+            The unique identifier for the data stream.
+        ttl : Union[float, None]
+            Idle seconds, 0 never expires the stream, None falls back to `stream_ttl`.
         """
         with self._lock:
-            self._valid_data_keys.add(data_key)
+            if ttl is None:
+                self._stream_ttls.pop(data_key, None)
+            else:
+                self._stream_ttls[data_key] = ttl
+
+    def set_stream_precision(self, data_key: str, decimals: Union[int, None]):
+        """
+        Sets the precision the numbers of a stream are sent with: integers multiplied by 
+        10 ** decimals, with the factor in the "scale" field of the payload. Only for clients 
+        dividing by it, the bundled panel does not yet. Payloads are quantized while encoded 
+        on the event loop, the cache, history and recording keep them as pushed.
+
+        Parameters
+        ----------
+        data_key : str
+            The unique identifier for the data stream.
+        decimals : Union[int, None]
+            The decimals kept, None sends numbers as pushed.
+        """
+        quantizer = Quantizer(decimals) if decimals is not None else None
+        self._slots[self.stream_id(data_key)].quantizer = quantizer
+
+    def set_stream_critical(self, data_key: str, critical: bool):
+        """
+        Sets whether a stream is still pushed in overload mode, see `overload_lag`. Updates 
+        of non-critical streams are cached but not sent while overloaded, subscribers get 
+        the latest one with the first update after the overload.
+
+        Parameters
+        ----------
+        data_key : str
+            The unique identifier for the data stream.
+        critical : bool
+            False sheds the stream under overload. Streams are critical by default.
+        """
+        self._slots[self.stream_id(data_key)].critical = critical
+
+    def _encode(self, slot: _StreamSlot, data_payload: Dict[str, Any]) -> str:
+        """Encodes a payload for the clients of a stream, quantized if the stream has a precision."""
+        quantizer = slot.quantizer
+        return json.dumps(data_payload if quantizer is None else quantizer(data_payload))
+
+    def add_derived_stream(self, source_key: str, data_key: str, stat: str, window: float=60.0) -> int:
+        """
+        Registers a stream the manager computes from every update of a source stream, 
+        e.g. the rolling 60 s mean of a Line published as a Gauge. Statistics are kept 
+        incrementally on the event loop, so producers push the source only.
+
+        Parameters
+        ----------
+        source_key : str
+            The data key of the source stream, a line, bar, sequence or gauge.
+        data_key : str
+            The data key of the derived stream, a line, bar, sequence, gauge or text.
+        stat : str
+            'mean', 'sum', 'count', 'min', 'max', 'rate' (change per second) or 'ewma'.
+        window : float, optional
+            The window in seconds, the time constant for 'ewma'. Defaults to 60.
+
+        Returns
+        -------
+        int
+            The stream id of the derived stream.
+        """
+        source_type = source_key.partition('<:>')[0]
+        if source_type not in DERIVED_SOURCE_CHART_TYPES:
+            raise ValueError(f"Can not derive from '{source_type}' charts, expected one of {DERIVED_SOURCE_CHART_TYPES}.")
+        chart_type, _, key_word = data_key.partition('<:>')
+        return self._add_derivation(source_key, data_key, Derivation(stat, window, chart_type, key_word))
+
+    def _add_derivation(self, source_key: str, data_key: str, derivation: Derivation) -> int:
+        """Registers a derived stream and computes it from the source updates, replacing a previous derivation."""
+        stream_id = self.register_data_stream(data_key)
+        slot = self._slots[self.stream_id(source_key)]
+        with self._lock:
+            # The loop only ever reads the whole tuple
+            slot.derived = tuple(item for item in slot.derived if item[0] != stream_id) + ((stream_id, derivation),)
+        return stream_id
+
+    def _remove_derived_stream(self, stream_id: int):
+        """Stops computing a derived stream, called when it is closed."""
+        with self._lock:
+            for slot in self._slots:
+                if slot.derived and any(item[0] == stream_id for item in slot.derived):
+                    slot.derived = tuple(item for item in slot.derived if item[0] != stream_id)
+
+    def _push_derived(self, slot: _StreamSlot, timestamp_ns: int, new_data: Dict[str, Any]):
+        """Queues the updates of the streams derived from an update, after the ones already queued."""
+        value = source_number(slot.data_key.partition('<:>')[0], new_data.get("value"))
+        if value is None:
+            logger.debug(f"Update of {slot.data_key} carries no number, derived streams skip it.")
+            return
+        for stream_id, derivation in slot.derived:
+            derived_data = {"id": new_data.get("id"), "timestamp": new_data.get("timestamp"), "value": derivation.update(timestamp_ns, value)}
+            self._update_queue.append((stream_id, derived_data, 0))
+        self._wake_update_loop()
 
-    def push_update_sync(self, data_key: str, data_payload: Dict[str, Any]):
+    def cache_sizes(self) -> Dict[str, int]:
+        """
+        Returns the encoded size of every cached payload, least recently used first. 
+        Sizes are only accounted when a cache budget is set.
+
+        Returns
+        -------
+        Dict[str, int]
+            Bytes by data key.
+        """
+        return dict(self._cache_sizes)
+
+    def push_update_sync(self, data_key: Union[str, int], data_payload: Dict[str, Any]):
         """
         Synchronous call to queue a data update.
 
@@ -114,19 +621,57 @@ class WebsocketManager:
 
         Parameters
         ----------
-        data_key : str
-            The unique identifier for the data stream.
+        data_key : Union[str, int]
+            The unique identifier for the data stream, or its stream id (faster).
         data_payload : Dict[str, Any]
             The new data payload to be pushed.
         """
-        self._update_queue.append((data_key, data_payload))
-        if self.loop and self.loop.is_running():
+        stream_id = data_key if type(data_key) is int else self.stream_id(data_key)
+        hooks = self._hooks['pre_enqueue']
+        if hooks:
+            _run_hooks(hooks, self._slots[stream_id].data_key, data_payload)
+        trace_stamp = time.monotonic_ns() if self.trace_every and next(self._trace_counter) % self.trace_every == 0 else 0
+        self._update_queue.append((stream_id, data_payload, trace_stamp))
+        self._wake_update_loop()
+
+    def load_history_sync(self, data_key: Union[str, int], timestamps_ns: List[int], data_payloads: List[Dict[str, Any]]):
+        """
+        Synchronous call to queue a bulk back-fill of a stream's history, e.g. at startup.
+        The points go into the in-memory history directly, the latest one becomes the cached 
+        data if it is newer than what the stream holds, and subscribers receive the points 
+        kept in memory as one 'batch' message. Back-filled points are not recorded to disk 
+        and do not feed derived streams.
+
+        Parameters
+        ----------
+        data_key : Union[str, int]
+            The unique identifier for the data stream, or its stream id.
+        timestamps_ns : List[int]
+            Record times in epoch nanoseconds, sorted.
+        data_payloads : List[Dict[str, Any]]
+            The data payloads, one per record time.
+        """
+        if not data_payloads:
+            return
+        stream_id = data_key if type(data_key) is int else self.stream_id(data_key)
+        self._update_queue.append((stream_id, _HistoryBatch(timestamps_ns, data_payloads), 0))
+        self._wake_update_loop()
+
+    def _wake_update_loop(self):
+        """Notifies the event loop that the update queue is not empty, from any thread."""
+        if self.loop is None:
+            return
+        if self._in_loop_thread():
+            # Producer on the manager's own loop (embedded mode), no cross-thread wake-up needed
+            self._update_event.set()
+        elif self.loop.is_running():
              # Wakes up the background thread to process data
             self.loop.call_soon_threadsafe(self._update_event.set)
     
     def get_cached_data_sync(self, data_key: str) -> Union[Dict[str, Any], None]:
         """
-        Synchronously reads the latest cached data for a specific stream key.
+        Synchronously reads the latest cached data for a specific stream key. 
+        Lock-free, the payload is shared with the cache and must not be mutated.
 
         Parameters
         ----------
@@ -138,9 +683,432 @@ class WebsocketManager:
         Union[Dict[str, Any], None]
             The latest cached data payload, or None if not found.
         """
+        self._restore_cached(data_key)
+        entry = self._cache.get(data_key)
+        return entry[1] if entry is not None else None
+
+    def get_if_newer_sync(self, data_key: str, version: int=0) -> Union[Tuple[int, Dict[str, Any]], None]:
+        """
+        Synchronously reads the cached entry of a stream only if it changed since the 
+        given version, so producers polling the cache skip work on data they have seen. 
+        Lock-free, the payload is shared with the cache and must not be mutated.
+
+        Parameters
+        ----------
+        data_key : str
+            The unique identifier for the data stream.
+        version : int, optional
+            The version returned by the previous read. Defaults to 0 (any cached entry).
+
+        Returns
+        -------
+        Union[Tuple[int, Dict[str, Any]], None]
+            (version, payload) of a newer entry, or None if nothing newer is cached.
+        """
+        self._restore_cached(data_key)
+        entry = self._cache.get(data_key)
+        return entry if entry is not None and entry[0] > version else None
+
+    def query_history_sync(self, data_key: str, start_ns: int, end_ns: int, max_points: Union[int, None]=None, timeout: float=10) -> List[Dict[str, Any]]:
+        """
+        Synchronously queries the updates of a stream within a time range. 
+        The query runs on the event loop, so it is consistent with live updates.
+
+        Parameters
+        ----------
+        data_key : str
+            The unique identifier for the data stream.
+        start_ns : int
+            Range start in epoch nanoseconds (inclusive).
+        end_ns : int
+            Range end in epoch nanoseconds (inclusive).
+        max_points : Union[int, None], optional
+            Downsample the result to at most this many points. Defaults to None (all points).
+        timeout : float, optional
+            Seconds to wait for the result. Defaults to 10.
+
+        Returns
+        -------
+        List[Dict[str, Any]]
+            The data payloads in time order.
+        """
+        if not (self.loop and self.loop.is_running()):
+            return []
+        if self._in_loop_thread():
+            raise RuntimeError("query_history_sync() would block the event loop it waits for, await query_history_async() instead.")
+        future = asyncio.run_coroutine_threadsafe(self.query_history_async(data_key, start_ns, end_ns, max_points), self.loop)
+        return future.result(timeout=timeout)
+        
+    # Snapshot management
+
+    def _load_snapshot(self):
+        """
+        Opens the snapshot file, if any, and registers its keys so dashboards can 
+        subscribe before producers come back. Payloads stay on disk until requested.
+        """
+        if not self._snapshot_path:
+            return
+        self._snapshot = open_snapshot(self._snapshot_path)
+        if self._snapshot is not None:
+            keys = self._snapshot.keys()
+            with self._lock:
+                for data_key in keys:
+                    self._add_valid_key(data_key)
+            logger.info(f"Warm-started {len(keys)} data streams from snapshot {self._snapshot_path}.")
+
+    def _restore_cached(self, data_key: str):
+        """
+        Moves the snapshot payload of a key into the cache on first access, from any 
+        thread. A live update already in the cache always wins, and the snapshot entry 
+        is dropped once restored, so an evicted payload is never restored again.
+
+        Parameters
+        ----------
+        data_key : str
+            The unique identifier for the data stream.
+        """
+        snapshot = self._snapshot
+        if snapshot is None or data_key in self._cache:
+            return
         with self._lock:
-            return self._cache.get(data_key)
+            if data_key in self._cache or data_key not in self._valid_data_keys:
+                return # Restored by another thread, or the stream was unregistered meanwhile
+            try:
+                data_payload = snapshot.get(data_key)
+            except ValueError:
+                return # Snapshot closed meanwhile, its content is already in the cache
+            snapshot.discard(data_key)
+            if data_payload is not None:
+                # The loop caches live updates without the lock, then drops the snapshot entry under it
+                self._cache.setdefault(data_key, (next(self._cache_versions), data_payload))
+
+    def _forget_snapshot(self, data_key: str):
+        """Drops the snapshot entry of a key cached live or closed, see `_restore_cached`."""
+        snapshot = self._snapshot
+        if snapshot is not None:
+            with self._lock:
+                snapshot.discard(data_key)
+
+    def save_snapshot(self):
+        """
+        Checkpoints the cache and all registered keys into the snapshot file. 
+        Called periodically in the background and once when the server stops.
+        """
+        if not self._snapshot_path:
+            return
+        # Restore whatever is still only in the old snapshot, then release it so the file can be replaced
+        snapshot = self._snapshot
+        if snapshot is not None:
+            for data_key in snapshot.keys():
+                self._restore_cached(data_key)
+            self._snapshot = None
+            snapshot.close()
+        
+        self._snapshot_dirty = False
+        with self._lock:
+            valid_keys = set(self._valid_data_keys)
+        count = write_snapshot(self._snapshot_path, {data_key: entry[1] for data_key, entry in list(self._cache.items())}, valid_keys)
+        logger.debug(f"Checkpointed {count} data streams to {self._snapshot_path}.")
+
+    async def _checkpoint_loop(self):
+        """Periodically checkpoints the cache from a worker thread, skipping rounds without updates."""
+        while self._is_running:
+            await asyncio.sleep(self._snapshot_interval)
+            if not self._snapshot_dirty:
+                continue
+            try:
+                await self.loop.run_in_executor(None, self.save_snapshot)
+            except Exception as e:
+                logger.error(f"Failed to checkpoint snapshot: {e}")
+
+    # Hot-restart handoff
+
+    def export_state(self, timeout: float=5) -> Dict[str, Any]:
+        """
+        Hands the streams of this manager over to a successor. Pending updates are 
+        processed first, then registered keys, stream TTLs, derived streams, cache 
+        and history are returned and this manager stops recording and checkpointing, as the successor owns 
+        persistence from now on. Producers must already push to the successor.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            Seconds to wait for pending updates to be processed. Defaults to 5.
+
+        Returns
+        -------
+        Dict[str, Any]
+            The state to pass to `import_state` of the successor.
+        """
+        if self.loop and self.loop.is_running():
+            future = asyncio.run_coroutine_threadsafe(self._export_state_async(), self.loop)
+            state = future.result(timeout=timeout)
+        else:
+            state = self._export_state()
+
+        if self._recorder is not None:
+            self._recorder.stop()
+            self._recorder = None
+        return state
+
+    async def _export_state_async(self) -> Dict[str, Any]:
+        """Processes the updates still queued for this manager, then exports its state on the loop."""
+        while self._update_queue:
+            stream_id, new_data, trace_stamp = self._update_queue.popleft()
+            if type(new_data) is _StreamClose:
+                await self._close_stream_async(stream_id, 'closed', new_data.registrations)
+            elif new_data is _STREAM_REGISTERED:
+                await self._attach_patterns(stream_id)
+            elif type(new_data) is _HistoryBatch:
+                await self._load_history_async(stream_id, new_data)
+            else:
+                await self._update_and_push_async(stream_id, new_data)
+        return self._export_state()
+
+    def _export_state(self) -> Dict[str, Any]:
+        """Collects the state handed over to a successor and disables persistence of this manager."""
+        snapshot = self._snapshot
+        if snapshot is not None:
+            for data_key in snapshot.keys():
+                self._restore_cached(data_key)
+            self._snapshot = None
+            snapshot.close()
+        self._snapshot_path = None
+
+        with self._lock:
+            valid_data_keys = set(self._valid_data_keys)
+            stream_ttls = dict(self._stream_ttls)
+            # The successor computes the derived streams from now on, their windows move with them
+            derived = {}
+            for slot in self._slots:
+                if slot.derived:
+                    derived[slot.data_key] = [(self._slots[stream_id].data_key, derivation) for stream_id, derivation in slot.derived]
+                    slot.derived = ()
+        return {
+            "valid_data_keys": valid_data_keys,
+            "stream_ttls": stream_ttls,
+            "derived": derived,
+            "cache": {data_key: entry[1] for data_key, entry in self._cache.items()},
+            "history": dict(self._history),
+            "resume_from": {data_key: history.newest() for data_key, history in self._history.items()},
+        }
+
+    def import_state(self, state: Dict[str, Any]):
+        """
+        Takes over the state exported by a predecessor. Must be called before 
+        `start_server_thread`, updates already queued to this manager are newer 
+        and therefore replace the imported cache.
+
+        Parameters
+        ----------
+        state : Dict[str, Any]
+            The state returned by `export_state` of the predecessor.
+        """
+        with self._lock:
+            for data_key in state["valid_data_keys"]:
+                self._add_valid_key(data_key)
+            for data_key, ttl in state["stream_ttls"].items():
+                self._stream_ttls.setdefault(data_key, ttl)
+        for source_key, derived in state["derived"].items():
+            for data_key, derivation in derived:
+                self._add_derivation(source_key, data_key, derivation)
+        for data_key, data_payload in state["cache"].items():
+            self._cache.setdefault(data_key, (next(self._cache_versions), data_payload))
+        if self._history_size:
+            for data_key, history in state["history"].items():
+                if data_key.partition('<:>')[0] not in HISTORY_CHART_TYPES:
+                    continue
+                history.maxlen = self._history_size
+                self._history.setdefault(data_key, history)
+        self._resume_from.update(state["resume_from"])
+
+    def issue_resume_token(self, data_key: str) -> str:
+        """
+        Issues a one-time token a client of the predecessor presents when it 
+        reconnects, so it receives exactly the updates it missed during the handoff.
+
+        Parameters
+        ----------
+        data_key : str
+            The data key the client is subscribed to.
+
+        Returns
+        -------
+        str
+            The resume token.
+        """
+        token = secrets.token_urlsafe(16)
+        with self._lock:
+            self._resume_tokens[token] = (data_key, self._resume_from.get(data_key), time.monotonic() + self.resume_token_ttl)
+        return token
+
+    def _resume_token_valid(self, token: Union[str, None], data_key: str) -> bool:
+        """Returns True if the resume token is issued for `data_key` and not expired, without redeeming it."""
+        if not token:
+            return False
+        with self._lock:
+            data_key_issued, _, expiry = self._resume_tokens.get(token, ("", None, 0.0))
+        return data_key_issued == data_key and expiry >= time.monotonic()
+
+    def _redeem_resume_token(self, token: Union[str, None], data_key: str) -> Union[List[Dict[str, Any]], None]:
+        """
+        Validates a resume token and returns the updates missed since the handoff.
+
+        Returns
+        -------
+        Union[List[Dict[str, Any]], None]
+            The missed data payloads, or None if the token is missing, expired, or 
+            issued for another stream, in which case a normal subscription follows.
+        """
+        if not token:
+            return None
+        with self._lock:
+            data_key_issued, since_ns, expiry = self._resume_tokens.pop(token, ("", None, 0.0))
+            now = time.monotonic()
+            for expired in [t for t, entry in self._resume_tokens.items() if entry[2] < now]:
+                del self._resume_tokens[expired]
+        if data_key_issued != data_key or expiry < now:
+            logger.warning(f"Invalid or expired resume token for {data_key}, subscribing normally.")
+            return None
+        history = self._history.get(data_key)
+        if since_ns is None or history is None:
+            return None
+        return [data_payload for _, data_payload in history.range(since_ns + 1, MAX_TIMESTAMP_NS)]
+
+    def client_url(self, request_host: Union[str, None]=None) -> str:
+        """
+        Returns the URL clients use to reach this manager. A wildcard bind address 
+        is replaced with the host name the client used for its current connection.
+
+        Parameters
+        ----------
+        request_host : Union[str, None], optional
+            The Host header of the client request.
+
+        Returns
+        -------
+        str
+            URL such as 'ws://localhost:9005/ws'.
+        """
+        host = self.host
+        if host in ("", "0.0.0.0", "::") and request_host:
+            host = request_host.rsplit(":", 1)[0] if not request_host.endswith("]") else request_host
+        return f"ws://{host}:{self.port}{self.route}"
+
+    def wait_until_ready(self, timeout: float=5) -> bool:
+        """
+        Blocks until the server is listening.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            Seconds to wait. Defaults to 5.
+
+        Returns
+        -------
+        bool
+            True if the server is listening.
+        """
+        return self._ready.wait(timeout)
+
+    def stop_listening(self, timeout: float=5):
+        """
+        Stops accepting new connections, established connections stay open. 
+        Frees the port for a successor bound to the same address.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            Seconds to wait. Defaults to 5.
+        """
+        if self.loop and self.loop.is_running():
+            asyncio.run_coroutine_threadsafe(self._stop_listening_async(), self.loop).result(timeout=timeout)
+
+    async def _stop_listening_async(self):
+        if self._server is not None and self._server.server is not None:
+            self._server.server.close()
+
+    def handoff(self, successor: "WebsocketManager", drain_timeout: float=10):
+        """
+        Moves the connected clients to a successor and stops this manager. Clients 
+        announcing the "resume" feature are told to reconnect to the successor with 
+        a resume token, this manager keeps their connection until they left or 
+        `drain_timeout` expired. Clients that did not announce it, e.g. panels built 
+        before it, can not move: they keep being served by this manager, with the 
+        updates the successor relays to it, until they disconnect.
+
+        Parameters
+        ----------
+        successor : WebsocketManager
+            The running manager taking over, its state must already be imported.
+        drain_timeout : float, optional
+            Seconds to wait for clients to move. Defaults to 10.
+        """
+        if self.loop and self.loop.is_running():
+            future = asyncio.run_coroutine_threadsafe(self._handoff_async(successor, drain_timeout), self.loop)
+            try:
+                future.result()
+            except Exception as e:
+                logger.error(f"Handoff to successor failed: {e}")
+        self.stop_server_thread()
+
+    async def _handoff_async(self, successor: "WebsocketManager", drain_timeout: float):
+        """Announces the successor to the clients able to move, then serves the others until they leave."""
+        await self._stop_listening_async()
         
+        client_features = self._client_features
+        moving = []
+        tasks = []
+        for data_key, subscribers in self._subscriptions.items():
+            for websocket in [websocket for websocket in subscribers if "resume" in client_features.get(websocket, ())]:
+                # No longer pushed to, the resume token replays everything since the export exactly once
+                subscribers.discard(websocket)
+                moving.append(websocket)
+                message = json.dumps({
+                    "status": "reconnect", 
+                    "message": "Server restarting, please reconnect.",
+                    "url": successor.client_url(websocket.request_headers.get("Host")),
+                    "resume_token": successor.issue_resume_token(data_key)
+                })
+                tasks.append(self._safe_send(websocket, message, set()))
+        for websocket in [websocket for websocket in self._pattern_subscriptions if "resume" in client_features.get(websocket, ())]:
+            # Pattern subscriptions resubscribe from scratch, their streams are attached again with the cached data
+            self._unsubscribe_pattern(websocket)
+            moving.append(websocket)
+            message = json.dumps({
+                "status": "reconnect", 
+                "message": "Server restarting, please reconnect.",
+                "url": successor.client_url(websocket.request_headers.get("Host")),
+            })
+            tasks.append(self._safe_send(websocket, message, set()))
+
+        # Relayed from before the first client is told to move, the others miss no update of the successor
+        relay = self._relay_update
+        successor.add_hook('post_dequeue', relay)
+        try:
+            await asyncio.gather(*tasks)
+            logger.info(f"Asked {len(tasks)} clients to reconnect to {successor.client_url()}.")
+
+            # Drain, clients asked to move are disconnected once the timeout expired
+            deadline = self.loop.time() + drain_timeout
+            while any(not websocket.closed for websocket in moving) and self.loop.time() < deadline:
+                await asyncio.sleep(0.1)
+            await asyncio.gather(*[websocket.close(code=1012, reason="Server restarted") for websocket in moving if not websocket.closed])
+
+            remaining = sum(map(len, self._subscriptions.values())) + len(self._pattern_subscriptions)
+            if remaining:
+                logger.info(f"Serving {remaining} clients without the 'resume' feature until they disconnect.")
+            while any(self._subscriptions.values()) or self._pattern_subscriptions:
+                await asyncio.sleep(1.0)
+        finally:
+            successor.remove_hook('post_dequeue', relay)
+
+    def _relay_update(self, data_key: str, data_payload: Dict[str, Any]):
+        """Pushes an update of the successor to the clients this manager still serves, see `handoff`."""
+        stream_id = self._stream_ids.get(data_key)
+        if stream_id is not None:
+            self.push_update_sync(stream_id, data_payload)
+
     # Thread management
 
     def start_server_thread(self):
@@ -151,10 +1119,55 @@ class WebsocketManager:
         if self._is_running:
             return
         self._is_running = True
+        self._load_snapshot()
+        if self._recorder is not None:
+            self._recorder.start()
         self._server_thread = threading.Thread(target=self._run_in_thread, daemon=True)
         self._server_thread.start()
         logger.info("WebsocketManager started in background thread.")
 
+    def start_in_loop(self, loop: Union[asyncio.AbstractEventLoop, None]=None):
+        """
+        Starts the WebSocket server on a running event loop owned by the caller instead 
+        of a private thread (embedded mode), e.g. the loop of an asyncio application or 
+        of Jupyter. Async producers on that loop then publish without any thread handoff.
+
+        Parameters
+        ----------
+        loop : Union[asyncio.AbstractEventLoop, None], optional
+            The running loop. Defaults to the loop running in the calling thread.
+        """
+        if self._is_running:
+            return
+        loop = loop or asyncio.get_running_loop()
+        if not loop.is_running():
+            raise RuntimeError("start_in_loop() needs a running event loop.")
+        self._is_running = True
+        self._embedded = True
+        self._load_snapshot()
+        if self._recorder is not None:
+            self._recorder.start()
+        self.loop = loop
+        self._update_event = asyncio.Event()
+
+        def start():
+            self._tasks.add(self.loop.create_task(self._start_server_and_loop()))
+
+        if self._in_loop_thread():
+            start()
+        else:
+            self.loop.call_soon_threadsafe(start)
+        logger.info("WebsocketManager started on the caller's event loop.")
+
+    def _in_loop_thread(self) -> bool:
+        """Returns True when called from the thread running the manager's loop."""
+        if self.loop is None:
+            return False
+        try:
+            return asyncio.get_running_loop() is self.loop
+        except RuntimeError:
+            return False
+
     def _run_in_thread(self):
         """
         The entry function for the background thread. 
@@ -162,8 +1175,9 @@ class WebsocketManager:
         runs the loop indefinitely.
         """
         try:
-            self.loop = asyncio.new_event_loop()
+            self.loop, self.event_loop = new_event_loop(self.event_loop)
             asyncio.set_event_loop(self.loop)
+            logger.info(f"Server thread runs on the {self.event_loop} event loop.")
             self._update_event = asyncio.Event()
 
             # Start the WebSocket server and data processing task
@@ -185,6 +1199,19 @@ class WebsocketManager:
         if not self._is_running:
             return
 
+        if self._embedded:
+            if self._in_loop_thread():
+                self._tasks.add(self.loop.create_task(self.stop_async())) # Cannot block the loop it runs on
+            elif self.loop.is_running():
+                try:
+                    asyncio.run_coroutine_threadsafe(self.stop_async(), self.loop).result(timeout=5)
+                except:
+                    logger.error("Asynchronous shutdown timed out or failed.")
+            else:
+                self._is_running = False
+                self._stop_persistence()
+            return
+
         self._is_running = False
         if self._update_event:
             self.loop.call_soon_threadsafe(self._update_event.set)
@@ -201,6 +1228,30 @@ class WebsocketManager:
             if self._server_thread.is_alive():
                  logger.warning("Background thread did not terminate gracefully.")
 
+        self._stop_persistence()
+
+    async def stop_async(self):
+        """
+        Gracefully stops a manager started with `start_in_loop`, from its loop. 
+        The loop itself keeps running.
+        """
+        if not self._is_running:
+            return
+        self._is_running = False
+        self._update_event.set()
+        await self._shutdown_async()
+        await self.loop.run_in_executor(None, self._stop_persistence)
+
+    def _stop_persistence(self):
+        """Flushes the recorder and writes the final snapshot."""
+        if self._recorder is not None:
+            self._recorder.stop()
+
+        try:
+            self.save_snapshot()
+        except Exception as e:
+            logger.error(f"Failed to write snapshot at shutdown: {e}")
+
     async def _shutdown_async(self):
         """
         Asynchronously handles the shutdown process: closes all active WebSockets, 
@@ -208,7 +1259,7 @@ class WebsocketManager:
         """
         close_tasks = []
         # Collect all alive websocket
-        active_websockets = set()
+        active_websockets = set(self._pattern_subscriptions)
         for subscriptions in self._subscriptions.values():
             active_websockets.update(subscriptions)
 
@@ -224,6 +1275,15 @@ class WebsocketManager:
         # Cancell server
         if self._server_task:
             self._server_task.cancel()
+
+        if self._embedded:
+            # The loop belongs to the caller, only cancel what this manager started
+            if self._server is not None:
+                self._server.close()
+            for task in self._tasks:
+                if task is not asyncio.current_task():
+                    task.cancel()
+            return
             
         # Cancel tasks
         tasks = [t for t in asyncio.all_tasks(self.loop) if t is not self._server_task and t is not asyncio.current_task()]
@@ -241,23 +1301,82 @@ class WebsocketManager:
             # Start the WebSocket server
             try:
                 # serve() returns an awaitable, convert this awaitable into a task
+                if self.compression is None:
+                    extensions = None
+                else:
+                    extensions = self.compression.factories((
+                        self._metric_compressed.labels('compressed'), self._metric_compressed.labels('skipped'),
+                        self._metric_compressed_bytes.labels('in'), self._metric_compressed_bytes.labels('out')
+                    ))
                 server = await serve(
                     self._websocket_handler, 
                     self.host, 
                     self.port, 
-                    subprotocols=["json"]
+                    subprotocols=["json"],
+                    process_request=self._process_http_request,
+                    ping_interval=self.ping_interval,
+                    ping_timeout=self.ping_timeout,
+                    extensions=extensions,
+                    compression=None # Negotiated by the extensions above
                 )
                 server_coroutine = server.serve_forever() # Get a coroutine task that runs indefinitely
+                self._server = server
                 self._server_task = self.loop.create_task(server_coroutine)
+                self._ready.set()
                 logger.info(f"WebSocket Server running on ws://{self.host}:{self.port}")
             except Exception as e:
                 logger.error(f"Failed to start WebSocket server: {e}")
                 return # Exit if startup fails
             # Start the synchronous data queue processing coroutine
-            self.loop.create_task(self._process_update_queue())
+            self._tasks.add(self.loop.create_task(self._process_update_queue()))
+            if self._snapshot_path and self._snapshot_interval > 0:
+                self._tasks.add(self.loop.create_task(self._checkpoint_loop()))
+            if self.diagnostics_interval > 0:
+                self._tasks.add(self.loop.create_task(self._diagnostics_loop()))
+            self._tasks.add(self.loop.create_task(self._expiry_loop()))
+            if self.ping_timeout or self.stall_timeout > 0:
+                self._tasks.add(self.loop.create_task(self._reaper_loop()))
+            if self.overload_lag > 0:
+                self._tasks.add(self.loop.create_task(self._lag_loop()))
 
     # --- Asynchronous Core Logic ---
 
+    async def query_history_async(self, data_key: str, start_ns: int, end_ns: int, max_points: Union[int, None]=None) -> List[Dict[str, Any]]:
+        """
+        Queries the updates of a stream within a time range. Recent updates are served 
+        from the in-memory history, older ones from the on-disk recording if available.
+
+        Parameters
+        ----------
+        data_key : str
+            The unique identifier for the data stream.
+        start_ns : int
+            Range start in epoch nanoseconds (inclusive).
+        end_ns : int
+            Range end in epoch nanoseconds (inclusive).
+        max_points : Union[int, None], optional
+            Downsample the result to at most this many points. Defaults to None (all points).
+
+        Returns
+        -------
+        List[Dict[str, Any]]
+            The data payloads in time order.
+        """
+        history = self._history.get(data_key)
+        points = history.range(start_ns, end_ns) if history is not None else []
+        oldest_ns = history.oldest() if history is not None else None
+
+        # Only touch the disk for the part of the range the memory no longer holds
+        if self._recorder is not None and (oldest_ns is None or start_ns < oldest_ns):
+            disk_end_ns = end_ns if oldest_ns is None else min(end_ns, oldest_ns - 1)
+            disk_points = await self.loop.run_in_executor(
+                None, 
+                lambda: list(read_stream_range(self._recorder.root, data_key, start_ns, disk_end_ns))
+            )
+            points = disk_points + points
+
+        return [data_payload for _, data_payload in downsample(points, max_points)]
+
     async def _process_update_queue(self):
         """
         The main asynchronous coroutine for processing data updates from the 
@@ -265,60 +1384,698 @@ class WebsocketManager:
         It waits for an event signal and then processes all pending updates.
         """
         while self._is_running:
-            # Use wait_for to wait for event or timeout
-            await self._update_event.wait()
-            self._update_event.clear()
-            
-            # Check for new data
+            # Check for new data, updates queued before the loop started are processed first
             while self._update_queue:
                 try:
-                    data_key, new_data = self._update_queue.popleft()
+                    stream_id, new_data, trace_stamp = self._update_queue.popleft()
+                    if type(new_data) is _StreamClose:
+                        await self._close_stream_async(stream_id, 'closed', new_data.registrations)
+                        continue
+                    if new_data is _STREAM_REGISTERED:
+                        await self._attach_patterns(stream_id)
+                        continue
+                    if type(new_data) is _HistoryBatch:
+                        await self._load_history_async(stream_id, new_data)
+                        continue
+                    hooks = self._hooks['post_dequeue']
+                    if hooks:
+                        _run_hooks(hooks, self._slots[stream_id].data_key, new_data)
                     # Execute update and push in the asynchronous loop
-                    await self._update_and_push_async(data_key, new_data)
+                    if trace_stamp:
+                        await self._update_and_push_async(stream_id, new_data, (trace_stamp, time.monotonic_ns()))
+                    else:
+                        await self._update_and_push_async(stream_id, new_data)
                 except Exception as e:
                     logger.error(f"Error processing update queue: {e}")
 
+            # Wait for the next event signal
+            await self._update_event.wait()
+            self._update_event.clear()
+
 
-    async def _update_and_push_async(self, data_key: str, new_data: Dict[str, Any]):
+    async def _update_and_push_async(self, stream_id: int, new_data: Dict[str, Any], trace: Union[Tuple[int, int], None]=None):
         """
         Asynchronously updates the internal cache and pushes the new data 
         payload to all currently subscribed clients for the given `data_key`.
 
         Parameters
         ----------
-        data_key : str
-            The unique identifier for the data stream.
+        stream_id : int
+            The interned id of the data stream, see `stream_id`.
         new_data : Dict[str, Any]
             The new data payload.
+        trace : Union[Tuple[int, int], None], optional
+            Enqueue and dequeue stamps of a traced update. Defaults to None (not traced).
         """
+        slot = self._slots[stream_id]
+        data_key = slot.data_key
         
-        # Update cache
-        self._cache[data_key] = new_data
+        # Update cache, replacing the entry publishes the new version to readers on every thread
+        self._cache[data_key] = (next(self._cache_versions), new_data)
+        if self._snapshot is not None:
+            self._forget_snapshot(data_key)
+        self._snapshot_dirty = True
+        updates = slot.updates
+        if updates is None:
+            updates = slot.updates = self._metric_updates.labels(data_key)
+        updates.inc()
+        timestamp_ns = slot.last_update_ns = get_clock().time_ns()
+        if self._expired and stream_id in self._expired:
+            await self._revive_stream(stream_id)
+        if self.cache_budget:
+            await self._account_cache(data_key, new_data)
+
+        # Keep in-memory history for time-range queries
+        if self._history_size and slot.keeps_history:
+            history = slot.history
+            if history is None:
+                history = self._history.get(data_key)
+                if history is None:
+                    history = self._history[data_key] = StreamHistory(self._history_size)
+                slot.history = history
+            history.append(timestamp_ns, new_data)
+
+        # Queue for recording, the disk write happens in the recorder thread
+        if self._recorder is not None:
+            self._recorder.record(data_key, new_data, timestamp_ns)
+
+        # Derived streams are computed here and published right after this update
+        if slot.derived:
+            self._push_derived(slot, timestamp_ns, new_data)
         
         # Get the set of subscribers
-        subscribers = self._subscriptions.get(data_key, set())
+        subscribers = slot.subscribers
+        pattern_subscribers = slot.pattern_subscribers
+
+        if self._overloaded and not slot.critical:
+            self._metric_shed.labels('stream').inc()
+            return
+
+        if trace is not None:
+            self._metric_trace.labels(data_key, 'queue').observe((trace[1] - trace[0]) / 1e9)
+            if subscribers or pattern_subscribers:
+                await self._trace_and_push_async(stream_id, new_data, trace)
+                return
         
-        if not subscribers:
+        if not subscribers and not pattern_subscribers:
             logger.debug(f"Data updated for {data_key}, but no active subscribers.")
             return
 
         # Asynchronous parallel push
-        message = json.dumps(new_data)
+        hooks = self._hooks
+        if hooks['pre_encode']:
+            _run_hooks(hooks['pre_encode'], data_key, new_data)
+        encode_start = time.perf_counter()
+        quantizer = slot.quantizer
+        message = json.dumps(new_data if quantizer is None else quantizer(new_data))
+        self._metric_encode.observe(time.perf_counter() - encode_start)
+        if hooks['post_encode']:
+            _run_hooks(hooks['post_encode'], data_key, new_data, message)
         tasks = []
         disconnected_websockets = set()
         
         for websocket in subscribers:
             tasks.append(self._safe_send(websocket, message, disconnected_websockets))
+        if pattern_subscribers:
+            tagged = _tag_message(message, stream_id)
+            for websocket in pattern_subscribers:
+                tasks.append(self._safe_send(websocket, tagged, disconnected_websockets))
         
+        if hooks['pre_send']:
+            _run_hooks(hooks['pre_send'], data_key, message, subscribers)
         await asyncio.gather(*tasks)
+        if hooks['post_send']:
+            _run_hooks(hooks['post_send'], data_key, message, subscribers, disconnected_websockets)
 
         # Clean up disconnected connections
         if disconnected_websockets:
-            self._subscriptions[data_key] -= disconnected_websockets
+            self._drop_subscribers(slot, disconnected_websockets)
             logger.info(f"Cleaned up {len(disconnected_websockets)} disconnected clients for {data_key}.")
-            if not self._subscriptions[data_key]:
-                del self._subscriptions[data_key]
-                logger.info(f"No subscribers left for {data_key}. Cleaning up subscription entry.")
+
+    async def _load_history_async(self, stream_id: int, batch: _HistoryBatch):
+        """
+        Back-fills the history of a stream and pushes the points kept as one batch message to 
+        clients announcing the "batch" feature, the latest point to the others, see `load_history_sync`.
+        """
+        slot = self._slots[stream_id]
+        data_key = slot.data_key
+        timestamps_ns, payloads = batch.timestamps_ns, batch.payloads
+        if self._expired and stream_id in self._expired:
+            await self._revive_stream(stream_id)
+
+        newest_ns = None
+        latest = True # The batch reaches up to the live data, not only into the past
+        if self._history_size and slot.keeps_history:
+            history = slot.history
+            if history is None:
+                history = self._history.get(data_key)
+                if history is None:
+                    history = self._history[data_key] = StreamHistory(self._history_size)
+                slot.history = history
+            newest_ns = history.newest()
+            history.extend(timestamps_ns, payloads)
+        latest = newest_ns is None or timestamps_ns[-1] >= newest_ns
+        if latest:
+            # A back-fill older than the live data only extends the history
+            self._cache[data_key] = (next(self._cache_versions), payloads[-1])
+            self._forget_snapshot(data_key)
+            if self.cache_budget:
+                await self._account_cache(data_key, payloads[-1])
+        self._snapshot_dirty = True
+        updates = slot.updates
+        if updates is None:
+            updates = slot.updates = self._metric_updates.labels(data_key)
+        updates.inc(len(payloads))
+        slot.last_update_ns = get_clock().time_ns()
+        logger.info(f"Loaded {len(payloads)} points into the history of {data_key}.")
+
+        subscribers = slot.subscribers
+        pattern_subscribers = slot.pattern_subscribers
+        if not subscribers and not pattern_subscribers:
+            return
+        kept = payloads[-self._history_size:] if self._history_size else payloads[-1:]
+        encode_start = time.perf_counter()
+        if slot.quantizer is not None:
+            kept = [slot.quantizer(data_payload) for data_payload in kept]
+        message = json.dumps({"status": "batch", "data": kept})
+        # Clients without the "batch" feature, e.g. older panels, get the latest point as a regular update
+        plain = json.dumps(kept[-1]) if latest else None
+        self._metric_encode.observe(time.perf_counter() - encode_start)
+        client_features = self._client_features
+        disconnected_websockets = set()
+        tasks = []
+        for websocket in subscribers:
+            if "batch" in client_features.get(websocket, ()):
+                tasks.append(self._safe_send(websocket, message, disconnected_websockets))
+            elif plain is not None:
+                tasks.append(self._safe_send(websocket, plain, disconnected_websockets))
+        if pattern_subscribers:
+            tagged = _tag_message(message, stream_id)
+            tagged_plain = _tag_message(plain, stream_id) if plain is not None else None
+            for websocket in pattern_subscribers:
+                if "batch" in client_features.get(websocket, ()):
+                    tasks.append(self._safe_send(websocket, tagged, disconnected_websockets))
+                elif tagged_plain is not None:
+                    tasks.append(self._safe_send(websocket, tagged_plain, disconnected_websockets))
+        await asyncio.gather(*tasks)
+        if disconnected_websockets:
+            self._drop_subscribers(slot, disconnected_websockets)
+
+    # --- Stream Lifecycle ---
+
+    async def _account_cache(self, data_key: str, new_data: Dict[str, Any]):
+        """
+        Accounts the encoded size of a cached payload and evicts the least recently
+        updated payloads while the cache exceeds its budget. The payload just cached
+        is never evicted, even when it alone exceeds the budget.
+        """
+        size = len(json.dumps(new_data))
+        self._cache_bytes += size - self._cache_sizes.pop(data_key, 0)
+        self._cache_sizes[data_key] = size
+
+        evicted = []
+        while self._cache_bytes > self.cache_budget and len(self._cache_sizes) > 1:
+            evicted_key, evicted_size = self._cache_sizes.popitem(last=False)
+            self._cache_bytes -= evicted_size
+            self._cache.pop(evicted_key, None)
+            evicted.append(evicted_key)
+        if not evicted:
+            return
+        self._metric_evicted.inc(len(evicted))
+        logger.info(f"Evicted the cached payload of {len(evicted)} streams to stay within the cache budget of {self.cache_budget} bytes.")
+
+        # Subscribers keep receiving updates, but a reload would show the initial value until the next one
+        tasks = []
+        for evicted_key in evicted:
+            message = json.dumps({"status": "evicted", "message": f"Cached data of '{evicted_key}' was evicted to bound server memory, it is sent again with the next update."})
+            tasks.extend(self._safe_send(websocket, message, set()) for websocket in self._subscriptions.get(evicted_key, ()))
+        if tasks:
+            await asyncio.gather(*tasks)
+
+    def _touch_cache(self, data_key: str):
+        """Marks a cached payload as recently used, accounting payloads cached without an update (snapshot, handoff)."""
+        if not self.cache_budget or data_key not in self._cache:
+            return
+        if data_key in self._cache_sizes:
+            self._cache_sizes.move_to_end(data_key)
+        else:
+            size = self._cache_sizes[data_key] = len(json.dumps(self._cache[data_key][1]))
+            self._cache_bytes += size
+
+    async def _revive_stream(self, stream_id: int):
+        """Registers an expired stream again once its producer resumed."""
+        self._expired.discard(stream_id)
+        data_key = self._slots[stream_id].data_key
+        with self._lock:
+            self._add_valid_key(data_key)
+        logger.info(f"Expired data stream {data_key} updated again, registered it again.")
+        await self._attach_patterns(stream_id)
+
+    async def _close_stream_async(self, stream_id: int, reason: str, registrations: Union[int, None]=None):
+        """
+        Releases everything held for a stream and disconnects its subscribers with a
+        'closed' status message telling why.
+
+        Parameters
+        ----------
+        stream_id : int
+            The interned id of the data stream.
+        reason : str
+            'closed' by its producer or 'expired' for being idle.
+        registrations : Union[int, None], optional
+            The registration count when the close was queued, the close is dropped if the 
+            stream was registered again since. Defaults to None (always closed).
+        """
+        slot = self._slots[stream_id]
+        data_key = slot.data_key
+        with self._lock:
+            if registrations is not None and slot.registrations != registrations:
+                logger.info(f"Data stream {data_key} was registered again after it was closed, kept open.")
+                return
+            self._discard_valid_key(data_key)
+            if reason == 'closed':
+                self._stream_ttls.pop(data_key, None)
+        if reason == 'closed':
+            self._remove_derived_stream(stream_id)
+            slot.quantizer = None
+        if reason == 'expired':
+            self._expired.add(stream_id)
+        else:
+            self._expired.discard(stream_id)
+        self._cache.pop(data_key, None)
+        self._forget_snapshot(data_key)
+        self._cache_bytes -= self._cache_sizes.pop(data_key, 0)
+        self._history.pop(data_key, None)
+        self._resume_from.pop(data_key, None)
+        self._metric_updates.remove(data_key)
+        self._metric_closed.labels(reason).inc()
+        self._snapshot_dirty = True
+
+        # The slot stays with its id, emptied
+        subscribers, pattern_subscribers = slot.subscribers, slot.pattern_subscribers
+        slot.subscribers, slot.pattern_subscribers = set(), set()
+        slot.history = slot.updates = slot.last_update_ns = None
+        self._subscriptions.pop(data_key, None)
+        if reason == 'expired':
+            ttl = self._stream_ttls.get(data_key, self.stream_ttl)
+            text = f"Data stream '{data_key}' expired after {ttl:g} s without updates."
+        else:
+            text = f"Data stream '{data_key}' was closed by its producer."
+        logger.info(f"{text} Disconnecting {len(subscribers)} subscribers.")
+
+        # Pattern subscriptions stay open, only this stream is detached from them
+        if pattern_subscribers:
+            message = json.dumps({"status": "detached", "stream_id": stream_id, "key_word": data_key.partition('<:>')[2], "message": text})
+            for websocket in pattern_subscribers:
+                pattern = self._pattern_subscriptions.get(websocket)
+                if pattern is not None:
+                    pattern[2].discard(stream_id)
+            await asyncio.gather(*[self._safe_send(websocket, message, set()) for websocket in pattern_subscribers])
+
+        if not subscribers:
+            return
+        message = json.dumps({"status": "closed", "message": text})
+        await asyncio.gather(*[self._safe_send(websocket, message, set()) for websocket in subscribers])
+        for websocket in subscribers:
+            # The closing handshake may take long with unresponsive clients, do not hold up the update queue
+            task = self.loop.create_task(websocket.close(code=1000, reason="Data stream closed"))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _expiry_loop(self):
+        """Unregisters streams idle for longer than their TTL, checked every `expiry_interval`."""
+        while self._is_running:
+            await asyncio.sleep(self.expiry_interval)
+            if not self.stream_ttl and not self._stream_ttls:
+                continue
+            now_ns = get_clock().time_ns()
+            with self._lock:
+                candidates = [(data_key, self._stream_ttls.get(data_key, self.stream_ttl)) for data_key in self._valid_data_keys]
+            for data_key, ttl in candidates:
+                if not ttl or data_key.split('<:>', 1)[-1].startswith(DIAGNOSTICS_KEY_WORD):
+                    continue
+                stream_id = self.stream_id(data_key)
+                slot = self._slots[stream_id]
+                if slot.last_update_ns is None:
+                    slot.last_update_ns = now_ns # Streams never updated count from now
+                elif now_ns - slot.last_update_ns > ttl * 1e9:
+                    try:
+                        await self._close_stream_async(stream_id, 'expired')
+                    except Exception as e:
+                        logger.error(f"Failed to expire data stream {data_key}: {e}")
+
+    async def _reaper_loop(self):
+        """
+        Reaps dead clients, checked every `reap_interval`: clients that missed a keepalive 
+        pong, and clients whose send buffer did not drain for `stall_timeout`. Sends to 
+        either block, on the full buffer or on the closing handshake the peer will never 
+        complete, holding back the fan-out of every stream they subscribe to.
+        """
+        while self._is_running:
+            await asyncio.sleep(self.reap_interval)
+            now = time.monotonic()
+            stalls = self._write_stalls
+            for websocket in list(self._connection_bytes):
+                if websocket.state is not State.OPEN:
+                    close_sent = getattr(websocket, 'close_sent', None)
+                    if close_sent is not None and close_sent.reason == "keepalive ping timeout":
+                        self._reap(websocket, 'ping_timeout', f"no pong within {self.ping_timeout}s")
+                    continue
+                if self.stall_timeout <= 0:
+                    continue
+                transport = websocket.transport
+                buffered = transport.get_write_buffer_size() if transport is not None else 0
+                previous = stalls.get(websocket)
+                if not buffered or previous is None or buffered < previous[0]:
+                    stalls[websocket] = (buffered, None) # Empty or draining
+                elif previous[1] is None:
+                    stalls[websocket] = (buffered, now)
+                elif now - previous[1] > self.stall_timeout:
+                    self._reap(websocket, 'stalled', f"{buffered} bytes not drained for {now - previous[1]:.1f}s")
+            for websocket in [websocket for websocket in stalls if websocket not in self._connection_bytes]:
+                del stalls[websocket]
+
+    def _reap(self, websocket: WebSocketServerProtocol, reason: str, detail: str):
+        """Removes a dead client from every fan-out set right away and aborts its connection."""
+        self._metric_reaped.labels(reason).inc()
+        logger.warning(f"Reaping client {websocket.remote_address[0]}:{websocket.remote_address[1]} ({reason}): {detail}.")
+        self._forget_connection(websocket)
+        for slot in self._slots:
+            if websocket in slot.subscribers:
+                slot.subscribers.discard(websocket)
+                if not slot.subscribers:
+                    self._subscriptions.pop(slot.data_key, None)
+        if websocket.transport is not None:
+            websocket.transport.abort() # The peer will not complete a closing handshake, blocked sends fail now
+
+    def _forget_connection(self, websocket: WebSocketServerProtocol):
+        """Drops the per-connection state: byte count, write stall, pending traces and pattern subscription."""
+        self._connection_bytes.pop(websocket, None)
+        self._write_stalls.pop(websocket, None)
+        self._client_features.pop(websocket, None)
+        for pending in [key for key in self._trace_pending if key[1] is websocket]:
+            del self._trace_pending[pending]
+        self._unsubscribe_pattern(websocket)
+
+    async def _lag_loop(self):
+        """
+        Measures the event loop lag as the oversleep of a `lag_interval` sleep, and switches 
+        overload mode on above `overload_lag`, off once the lag stayed below half of it for 
+        a second.
+        """
+        calm_since = None
+        while self._is_running:
+            expected = time.perf_counter() + self.lag_interval
+            await asyncio.sleep(self.lag_interval)
+            now = time.perf_counter()
+            lag = self._loop_lag = max(now - expected, 0.0)
+            if lag > self.overload_lag:
+                calm_since = None
+                if not self._overloaded:
+                    self._overloaded = True
+                    logger.warning(f"Event loop lag {lag * 1e3:.0f}ms above {self.overload_lag * 1e3:.0f}ms, entering overload mode.")
+            elif self._overloaded and lag < self.overload_lag / 2:
+                if calm_since is None:
+                    calm_since = now
+                elif now - calm_since >= 1.0:
+                    self._overloaded = False
+                    calm_since = None
+                    logger.info("Event loop lag back to normal, leaving overload mode.")
+
+    def _admit(self, client_ip: str, subscription: bool=False) -> Union[Tuple[str, str], None]:
+        """
+        Checks a new connection against the connection caps, or, with `subscription`, its 
+        subscription against the rate limit and overload mode.
+
+        Returns
+        -------
+        Union[Tuple[str, str], None]
+            (reason, message) of the rejection, None if admitted.
+        """
+        if subscription:
+            if self._overloaded:
+                return 'overload', "Server overloaded, retry later."
+            if not self._subscription_limiter.allow(client_ip):
+                return 'rate', "Too many subscriptions, retry later."
+            return None
+        if self.max_connections and self._connection_count >= self.max_connections:
+            return 'connections', "Too many connections, retry later."
+        if self.max_connections_per_ip and self._connections_by_ip.get(client_ip, 0) >= self.max_connections_per_ip:
+            return 'connections_per_ip', "Too many connections from this address, retry later."
+        return None
+
+    async def _reject(self, websocket: WebSocketServerProtocol, client_address: str, rejection: Tuple[str, str]):
+        """Refuses a connection or subscription refused by `_admit`, the client may retry later."""
+        reason, message = rejection
+        self._metric_admission.labels(reason).inc()
+        logger.warning(f"Refused client '{client_address}' ({reason}).")
+        await websocket.send(json.dumps({"status": "failure", "message": message}))
+        await websocket.close(code=1013, reason=message) # Try Again Later
+
+    # --- Pattern Subscriptions ---
+
+    async def _subscribe_pattern(self, websocket: WebSocketServerProtocol, chart_type: str, prefix: str, client_address: str) -> bool:
+        """
+        Subscribes a connection to every stream of a chart type whose key word starts 
+        with prefix. Each matching stream is announced with an 'attached' status message 
+        carrying its stream id, then its cached data; data messages of all attached streams 
+        carry their "stream_id".
+
+        Returns
+        -------
+        bool
+            True if subscribed, False if the pattern was rejected and the connection closed.
+        """
+        if PATTERN_WILDCARD in prefix:
+            self._metric_rejected.inc()
+            logger.warning(f"Invalid pattern subscription request from '{client_address}': chart_type='{chart_type}', key_word='{prefix}{PATTERN_WILDCARD}'.")
+            await websocket.send(json.dumps({"status": "failure", "message": f"Invalid pattern, '{PATTERN_WILDCARD}' is only supported at the end of the keyword."}))
+            await websocket.close(code=1008, reason="Invalid subscription format.")
+            return False
+
+        with self._lock:
+            key_words = self._key_index.match(chart_type, prefix)
+            if not self.max_subscriptions or len(key_words) <= self.max_subscriptions:
+                self._patterns.add(chart_type, prefix, websocket)
+        if self.max_subscriptions and len(key_words) > self.max_subscriptions:
+            await self._reject(websocket, client_address, ('subscriptions', f"Pattern matches {len(key_words)} streams, more than the limit of {self.max_subscriptions}."))
+            return False
+        self._pattern_subscriptions[websocket] = (chart_type, prefix, set())
+        logger.info(f"Client '{client_address}' subscribing to pattern: chart_type='{chart_type}', key_word='{prefix}{PATTERN_WILDCARD}', {len(key_words)} streams match.")
+
+        await websocket.send(json.dumps({"status": "success", "message": "Subscription successful.", "pattern": True}))
+        await self._send_primer(websocket)
+        for key_word in key_words:
+            await self._attach_pattern_stream(websocket, self.stream_id(f"{chart_type}<:>{key_word}"))
+        return True
+
+    async def _attach_patterns(self, stream_id: int):
+        """Attaches a newly registered stream to the pattern subscriptions it matches."""
+        chart_type, _, key_word = self._slots[stream_id].data_key.partition('<:>')
+        with self._lock:
+            websockets = self._patterns.match(chart_type, key_word)
+        if websockets:
+            await asyncio.gather(*[self._attach_pattern_stream(websocket, stream_id) for websocket in websockets])
+
+    async def _attach_pattern_stream(self, websocket: WebSocketServerProtocol, stream_id: int):
+        """Adds a pattern subscription to the fan-out of a stream and sends it the cached data, once per stream."""
+        pattern = self._pattern_subscriptions.get(websocket)
+        if pattern is None or stream_id in pattern[2]:
+            return
+        chart_type, prefix, attached = pattern
+        slot = self._slots[stream_id]
+        key_word = slot.data_key.partition('<:>')[2]
+        if key_word.startswith(DIAGNOSTICS_KEY_WORD) and not prefix.startswith(DIAGNOSTICS_KEY_WORD):
+            return # Built-in diagnostics only match patterns naming them
+        if self.max_subscriptions and len(attached) >= self.max_subscriptions:
+            self._metric_admission.labels('subscriptions').inc()
+            logger.debug(f"Stream {slot.data_key} not attached, the pattern reached {self.max_subscriptions} streams.")
+            return
+        attached.add(stream_id)
+        slot.pattern_subscribers.add(websocket)
+        if self._hooks['on_subscribe']:
+            _run_hooks(self._hooks['on_subscribe'], slot.data_key, websocket)
+
+        self._restore_cached(slot.data_key)
+        self._touch_cache(slot.data_key)
+        entry = self._cache.get(slot.data_key)
+        initial_data = entry[1] if entry is not None else {"id": "INIT", "timestamp": "N/A", "value": 0}
+        disconnected_websockets = set() # Cleaned up by the connection handler
+        await self._safe_send(websocket, json.dumps({"status": "attached", "stream_id": stream_id, "key_word": key_word}), disconnected_websockets)
+        await self._safe_send(websocket, _tag_message(self._encode(slot, initial_data), stream_id), disconnected_websockets)
+
+    def _unsubscribe_pattern(self, websocket: WebSocketServerProtocol):
+        """Removes a pattern subscription and detaches it from all its streams."""
+        pattern = self._pattern_subscriptions.pop(websocket, None)
+        if pattern is None:
+            return
+        chart_type, prefix, attached = pattern
+        with self._lock:
+            self._patterns.discard(chart_type, prefix, websocket)
+        for stream_id in attached:
+            self._slots[stream_id].pattern_subscribers.discard(websocket)
+
+    # --- Diagnostics ---
+
+    async def _process_http_request(self, path: str, request_headers: Any):
+        """
+        Serves plain HTTP requests on the WebSocket port before the handshake. 
+        Returns the metrics for `metrics_path`, None continues with the WebSocket handshake.
+        """
+        if self.metrics_path and path == self.metrics_path:
+            body = self.metrics.render_prometheus().encode('utf-8')
+            return HTTPStatus.OK, [("Content-Type", "text/plain; version=0.0.4; charset=utf-8")], body
+        return None
+
+    def _register_diagnostics(self) -> Dict[str, str]:
+        """Registers the built-in diagnostics streams, returns their data keys by name."""
+        data_keys = {
+            "queue": f"gauge<:>{DIAGNOSTICS_KEY_WORD}.queue",
+            "throughput": f"lines<:>{DIAGNOSTICS_KEY_WORD}.throughput",
+            "latency": f"lines<:>{DIAGNOSTICS_KEY_WORD}.latency",
+            "summary": f"text<:>{DIAGNOSTICS_KEY_WORD}.summary",
+        }
+        for data_key in data_keys.values():
+            self.register_data_stream(data_key)
+        return data_keys
+
+    async def _diagnostics_loop(self):
+        """
+        Publishes the manager health as regular streams every `diagnostics_interval`, 
+        so the panel can chart it: queue depth (Gauge), throughput and p99 latencies 
+        (Lines) and a summary (Text). Rates and percentiles cover the last interval.
+        """
+        data_keys = self._register_diagnostics()
+        diagnostics = set(data_keys.values())
+        queue_peak = 1
+        previous_time = time.perf_counter()
+        previous_updates = {}
+        previous_messages = self._metric_messages.value
+        previous_encode = self._metric_encode.snapshot()
+        previous_send = self._metric_send.snapshot()
+
+        while self._is_running:
+            await asyncio.sleep(self.diagnostics_interval)
+            now = time.perf_counter()
+            elapsed = max(now - previous_time, 1e-9)
+
+            updates = {label[0]: counter.value for label, counter in list(self._metric_updates.children.items()) if label[0] not in diagnostics}
+            rates = {data_key: (count - previous_updates.get(data_key, 0)) / elapsed for data_key, count in updates.items()}
+            update_rate = sum(rates.values())
+            message_rate = (self._metric_messages.value - previous_messages) / elapsed
+            encode_p99 = self._metric_encode.percentile(0.99, since=previous_encode) * 1e3
+            send_p99 = self._metric_send.percentile(0.99, since=previous_send) * 1e3
+            queue_depth = len(self._update_queue)
+            queue_peak = max(queue_peak, queue_depth)
+
+            previous_time = now
+            previous_updates = updates
+            previous_messages = self._metric_messages.value
+            previous_encode = self._metric_encode.snapshot()
+            previous_send = self._metric_send.snapshot()
+
+            busiest = sorted(rates.items(), key=lambda item: item[1], reverse=True)[:5]
+            summary = "\n".join([
+                f"streams: {len(self._valid_data_keys)}, connections: {len(self._connection_bytes)}, subscriptions: {sum(len(s) for s in self._subscriptions.values())}",
+                f"updates/s: {update_rate:.1f}, messages/s: {message_rate:.1f}, queue: {queue_depth}",
+                f"encode p99: {encode_p99:.3f} ms, send p99: {send_p99:.3f} ms",
+                f"dropped clients: {self._metric_dropped.value}, rejected subscriptions: {self._metric_rejected.value}",
+            ] + [f"  {data_key}: {rate:.1f}/s" for data_key, rate in busiest])
+
+            try:
+                await self._update_and_push_async(self.stream_id(data_keys["queue"]), _make_payload(["queue", [0, queue_peak], queue_depth]))
+                await self._update_and_push_async(self.stream_id(data_keys["throughput"]), _make_payload([["updates/s", "messages/s"], [round(update_rate, 1), round(message_rate, 1)]]))
+                await self._update_and_push_async(self.stream_id(data_keys["latency"]), _make_payload([["encode p99 ms", "send p99 ms"], [round(encode_p99, 3), round(send_p99, 3)]]))
+                await self._update_and_push_async(self.stream_id(data_keys["summary"]), _make_payload(summary))
+            except Exception as e:
+                logger.error(f"Failed to publish diagnostics: {e}")
+
+    async def _trace_and_push_async(self, stream_id: int, new_data: Dict[str, Any], trace: Tuple[int, int]):
+        """
+        Pushes a traced update. The message carries a trace id the browser echoes back 
+        after rendering, the send time of every client is kept until then. Clients that 
+        did not announce the "trace" feature, e.g. older panels, get the plain message 
+        and are not waited for.
+        """
+        slot = self._slots[stream_id]
+        data_key = slot.data_key
+        subscribers = slot.subscribers
+        hooks = self._hooks
+        if hooks['pre_encode']:
+            _run_hooks(hooks['pre_encode'], data_key, new_data)
+        trace_id = next(self._trace_ids)
+        quantizer = slot.quantizer
+        payload = new_data if quantizer is None else quantizer(new_data)
+        message = json.dumps({**payload, "trace": trace_id})
+        encoded_ns = time.monotonic_ns()
+        self._metric_trace.labels(data_key, 'encode').observe((encoded_ns - trace[1]) / 1e9)
+        if hooks['post_encode']:
+            _run_hooks(hooks['post_encode'], data_key, new_data, message)
+
+        disconnected_websockets = set()
+        if hooks['pre_send']:
+            _run_hooks(hooks['pre_send'], data_key, message, subscribers)
+        client_features = self._client_features
+        trace_clients = {websocket for websocket in itertools.chain(subscribers, slot.pattern_subscribers) if "trace" in client_features.get(websocket, ())}
+        traced = list(trace_clients)
+        plain = json.dumps(payload) if len(traced) < len(subscribers) + len(slot.pattern_subscribers) else message
+        tasks = [self._safe_send(websocket, message if websocket in trace_clients else plain, disconnected_websockets) for websocket in subscribers]
+        if slot.pattern_subscribers:
+            tagged, tagged_plain = _tag_message(message, stream_id), _tag_message(plain, stream_id)
+            tasks.extend(self._safe_send(websocket, tagged if websocket in trace_clients else tagged_plain, disconnected_websockets) for websocket in slot.pattern_subscribers)
+        await asyncio.gather(*tasks)
+        if hooks['post_send']:
+            _run_hooks(hooks['post_send'], data_key, message, subscribers, disconnected_websockets)
+
+        sent_ns = time.monotonic_ns()
+        send_histogram = self._metric_trace.labels(data_key, 'send')
+        for websocket in traced:
+            if websocket not in disconnected_websockets:
+                send_histogram.observe((sent_ns - encoded_ns) / 1e9)
+                self._trace_pending[(trace_id, websocket)] = (data_key, sent_ns)
+        while len(self._trace_pending) > self._trace_pending_limit:
+            self._trace_pending.popitem(last=False) # Echo never came, e.g. the tab was closed meanwhile
+
+        if disconnected_websockets:
+            self._drop_subscribers(slot, disconnected_websockets)
+
+    def _drop_subscribers(self, slot: _StreamSlot, disconnected_websockets: Set[WebSocketServerProtocol]):
+        """Removes connections a send failed on from the fan-out sets of a stream, reaped ones are no longer counted."""
+        subscribed = len(slot.subscribers) + len(slot.pattern_subscribers)
+        slot.subscribers -= disconnected_websockets
+        if not slot.subscribers:
+            self._subscriptions.pop(slot.data_key, None)
+        slot.pattern_subscribers -= disconnected_websockets
+        self._metric_dropped.inc(subscribed - len(slot.subscribers) - len(slot.pattern_subscribers))
+
+    def _trace_echo(self, websocket: WebSocketServerProtocol, trace_id: int, render_ms: float):
+        """Completes a trace with the browser echo: render time as measured by the browser, network as the remaining round trip."""
+        pending = self._trace_pending.pop((trace_id, websocket), None)
+        if pending is None:
+            return
+        data_key, sent_ns = pending
+        render = max(float(render_ms), 0.0) / 1e3
+        self._metric_trace.labels(data_key, 'render').observe(render)
+        self._metric_trace.labels(data_key, 'network').observe(max((time.monotonic_ns() - sent_ns) / 1e9 - render, 0.0))
+
+    def trace_summary(self, q: float=0.99) -> Dict[str, Dict[str, float]]:
+        """
+        Summarizes traced latencies per stream and stage.
+
+        Parameters
+        ----------
+        q : float, optional
+            The percentile, estimated from histogram buckets. Defaults to 0.99.
+
+        Returns
+        -------
+        Dict[str, Dict[str, float]]
+            Seconds by data key and stage ('queue', 'encode', 'send', 'network', 'render').
+        """
+        summary: Dict[str, Dict[str, float]] = {}
+        for (data_key, stage), histogram in list(self._metric_trace.children.items()):
+            summary.setdefault(data_key, {})[stage] = histogram.percentile(q)
+        return summary
 
     # --- WebSocket Protocol Handling ---
 
@@ -335,7 +2092,8 @@ class WebsocketManager:
         path : str
             The requested path for the connection.
         """
-        client_address = f"{websocket.remote_address[0]}:{websocket.remote_address[1]}"
+        client_ip = websocket.remote_address[0]
+        client_address = f"{client_ip}:{websocket.remote_address[1]}"
         data_key = "" # Used to clean up subscription upon disconnection
 
         if self.route and path != self.route:
@@ -344,41 +2102,84 @@ class WebsocketManager:
             await websocket.close(code=1008, reason="Connection attempt on invalid path.")
             return
 
+        # Admission control: connection caps, checked before anything is held for the client
+        rejection = self._admit(client_ip)
+        if rejection is not None:
+            await self._reject(websocket, client_address, rejection)
+            return
+        self._connection_bytes[websocket] = 0
+        self._connection_count += 1
+        self._connections_by_ip[client_ip] = self._connections_by_ip.get(client_ip, 0) + 1
+
         try:
-            # Receive subscription message (expecting the frontend to send {"chart_type": "...", "key_word": "..."})
+            # Receive subscription message (expecting the frontend to send {"chart_type": "...", "key_word": "..."}, 
+            # optionally "features" it supports: "trace" for panels echoing traced updates, "batch" for back-fills, 
+            # "resume" for panels following a "reconnect" message with a resume token)
             subscription_message_raw = await websocket.recv()
             subscription_message = json.loads(subscription_message_raw)
             
             chart_type = subscription_message.get("chart_type")
             key_word = subscription_message.get("key_word")
             data_key = f"{chart_type}<:>{key_word}"
+            resume_token = subscription_message.get("resume_token")
+            features = subscription_message.get("features")
+            if isinstance(features, list):
+                self._client_features[websocket] = frozenset(feature for feature in features if isinstance(feature, str))
+
+            # Subscription rate, and overload mode, which still lets clients resuming after a restart in. 
+            # The token is redeemed once admitted, a rejected client keeps its resume point for the next attempt
+            rejection = self._admit(client_ip, subscription=True)
+            if rejection is not None and (rejection[0] != 'overload' or not self._resume_token_valid(resume_token, data_key)):
+                await self._reject(websocket, client_address, rejection)
+                return
+            resumed_data = self._redeem_resume_token(resume_token, data_key)
+
+            if isinstance(key_word, str) and key_word.endswith(PATTERN_WILDCARD):
+                # Pattern subscription: matching streams are attached now and whenever one is registered later
+                if await self._subscribe_pattern(websocket, str(chart_type), key_word[:-len(PATTERN_WILDCARD)], client_address):
+                    async for message in websocket:
+                        await self._handle_client_message(websocket, data_key, message, client_address)
+                return
 
             # Check if the data stream has been registered by the user
+            self._restore_cached(data_key)
+            self._touch_cache(data_key)
             initial_data = await _simulate_initial_data_fetch(data_key, self._cache, self._valid_data_keys)
             
             if initial_data is None:
+                self._metric_rejected.inc()
                 logger.warning(f"Invalid subscription request from '{client_address}': chart_type='{chart_type}', key_word='{key_word}'.")
                 await websocket.send(json.dumps({"status": "failure", "message": "Invalid chart type or keyword (not registered)."}))
                 await websocket.close(code=1008, reason="Invalid subscription format.")
                 return
 
-            # Register subscription, add WebSocket to the set
-            if data_key not in self._subscriptions:
-                self._subscriptions[data_key] = set()
-                
-            self._subscriptions[data_key].add(websocket)
+            # Register subscription, add WebSocket to the set of the stream slot
+            stream_id = self.stream_id(data_key)
+            self._subscriptions.setdefault(data_key, self._slots[stream_id].subscribers).add(websocket)
+            if self._hooks['on_subscribe']:
+                _run_hooks(self._hooks['on_subscribe'], data_key, websocket)
             logger.info(f"Client '{client_address}' subscribing to: chart_type='{chart_type}', key_word='{key_word}'. Total subscription: {len(self._subscriptions[data_key])}")
 
             # Successful response, and push initial/cached data
-            await websocket.send(json.dumps({"status": "success", "message": "Subscription successful."}))
-            # Push cached data
-            await websocket.send(json.dumps(initial_data))
+            await websocket.send(json.dumps({"status": "success", "message": "Subscription successful.", "stream_id": stream_id}))
+            await self._send_primer(websocket)
+            slot = self._slots[stream_id]
+            if resumed_data is not None and self._overloaded:
+                # Shed the replay of what the client missed, it gets the latest update instead
+                self._metric_shed.labels('history').inc()
+                resumed_data = None
+            if resumed_data is None:
+                # Push cached data
+                await websocket.send(self._encode(slot, initial_data))
+            else:
+                # Resumed after a hot restart, only push what the client missed meanwhile
+                for data_payload in resumed_data:
+                    await websocket.send(self._encode(slot, data_payload))
             
             # Keep the connection open, waiting for disconnection or message reception, e.g., unsubscribe message
             async for message in websocket:
-                # Can handle unsubscribe or other control commands here
-                logger.debug(f"Received message from {client_address}: {message}")
-                pass
+                # Handle control commands, e.g., history queries
+                await self._handle_client_message(websocket, data_key, message, client_address)
             
         # Catch Exception
         except ConnectionClosedOK:
@@ -393,12 +2194,85 @@ class WebsocketManager:
         except Exception as e:
             logger.error(f"Error handling connection with {client_address}: {type(e).__name__} - {e}")
         finally:
+            self._forget_connection(websocket)
+            self._connection_count -= 1
+            remaining = self._connections_by_ip.pop(client_ip) - 1
+            if remaining:
+                self._connections_by_ip[client_ip] = remaining
             # Connection disconnected, remove subscription
             if data_key and websocket in self._subscriptions.get(data_key, set()):
                 self._subscriptions[data_key].remove(websocket)
                 logger.info(f"Client {client_address} unsubscribed from {data_key}. Remaining: {len(self._subscriptions[data_key])}")
 
 
+    async def _send_primer(self, websocket: WebSocketServerProtocol):
+        """Primes the compression window of a new subscriber with the preset dictionary, if any."""
+        if self.compression is not None:
+            primer = self.compression.primer(websocket.extensions)
+            if primer is not None:
+                await websocket.send(primer)
+
+    async def _handle_client_message(self, websocket: WebSocketServerProtocol, data_key: str, message_raw: Union[str, bytes], client_address: str):
+        """
+        Handles a control message received on an established subscription.
+
+        Supported messages:
+            {"action": "query", "start": ..., "end": ..., "max_points": ..., "request_id": ...}
+                Replies {"status": "history", "request_id": ..., "data": [payloads]} with the 
+                updates between start and end, given as ISO strings or epoch milliseconds. 
+                Pattern subscriptions add the "stream_id" of an attached stream. Refused 
+                with an "error" status in overload mode.
+            {"action": "trace", "trace": ..., "render_ms": ...}
+                Echo of a traced update, with the milliseconds from receive to render.
+
+        Parameters
+        ----------
+        websocket : WebSocketServerProtocol
+            The protocol instance for the active connection.
+        data_key : str
+            The data key the connection is subscribed to.
+        message_raw : Union[str, bytes]
+            The raw message received.
+        client_address : str
+            The client address, used for logging.
+        """
+        try:
+            message = json.loads(message_raw)
+        except json.JSONDecodeError:
+            logger.error(f"Received malformed JSON from client: {client_address}")
+            return
+        
+        action = message.get("action") if isinstance(message, dict) else None
+        if action == "query":
+            if self._overloaded:
+                self._metric_shed.labels('history').inc()
+                await websocket.send(json.dumps({"status": "error", "request_id": message.get("request_id"), "message": "Server overloaded, retry later."}))
+                return
+            try:
+                start_ns = time_to_ns(message.get("start"), unit=1e6, default=0)
+                end_ns = time_to_ns(message.get("end"), unit=1e6, default=MAX_TIMESTAMP_NS)
+                max_points = message.get("max_points")
+                query_key = data_key
+                pattern = self._pattern_subscriptions.get(websocket)
+                if pattern is not None:
+                    stream_id = int(message.get("stream_id"))
+                    if stream_id not in pattern[2]:
+                        raise ValueError(f"stream {stream_id} is not attached to this subscription")
+                    query_key = self._slots[stream_id].data_key
+                data = await self.query_history_async(query_key, start_ns, end_ns, int(max_points) if max_points else None)
+            except (TypeError, ValueError) as e:
+                logger.warning(f"Invalid history query from '{client_address}': {e}")
+                await websocket.send(json.dumps({"status": "error", "request_id": message.get("request_id"), "message": "Invalid history query."}))
+                return
+            await websocket.send(json.dumps({"status": "history", "request_id": message.get("request_id"), "data": data}))
+        elif action == "trace":
+            try:
+                self._trace_echo(websocket, int(message["trace"]), message.get("render_ms", 0.0))
+            except (KeyError, TypeError, ValueError):
+                logger.debug(f"Invalid trace echo from {client_address}: {message}")
+        else:
+            logger.debug(f"Received message from {client_address}: {message}")
+
     async def _safe_send(self, websocket: WebSocketServerProtocol, message: str, disconnected_websockets: Set[WebSocketServerProtocol]):
         """
         Safely sends a message to a WebSocket client. 
@@ -415,7 +2289,12 @@ class WebsocketManager:
             The set to collect closed/disconnected WebSocket instances.
         """
         try:
+            send_start = time.perf_counter()
             await websocket.send(message) 
+            self._metric_send.observe(time.perf_counter() - send_start)
+            self._metric_messages.inc()
+            if websocket in self._connection_bytes:
+                self._connection_bytes[websocket] += len(message)
         except ConnectionClosed as e:
             logger.info(f"WebSocket connection closed (Code {e.code}) during send, marking for cleanup: {e}")
             disconnected_websockets.add(websocket)
@@ -0,0 +1,186 @@
+import math
+from collections import deque
+from typing import Union, Any, Deque, Tuple
+
+# Statistics a derived stream can compute, see `Derivation`
+DERIVED_STATS = ('mean', 'sum', 'count', 'min', 'max', 'rate', 'ewma')
+
+# Chart types whose value is a single number a statistic can be computed from
+DERIVED_SOURCE_CHART_TYPES = ('line', 'bar', 'sequence', 'gauge')
+
+# Chart types a derived stream can be published as
+DERIVED_CHART_TYPES = ('line', 'bar', 'sequence', 'gauge', 'text')
+
+
+def source_number(chart_type: str, value: Any) -> Union[float, None]:
+    """Returns the number carried by a payload value of a source chart type, None if it carries none."""
+    if chart_type == 'gauge':
+        try:
+            value = value[2]
+        except (TypeError, IndexError, KeyError):
+            return None
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    return value
+
+
+class RollingWindow:
+    """
+    The values of the last `window` seconds. Sum, count, min, max and rate are
+    maintained incrementally: a running sum, and monotonic deques whose head is
+    the current minimum or maximum, so every push is amortized O(1).
+    """
+
+    __slots__ = ('window_ns', '_points', '_seq', '_sum', '_pushes', '_min', '_max')
+
+    # Pushes between exact re-summations, bounds the drift of the running sum
+    RESUM_EVERY = 10000
+
+    def __init__(self, window: float, track_extremes: bool=True):
+        """
+        Parameters
+        ----------
+        window : float
+            The window length in seconds.
+        track_extremes : bool, optional
+            Maintain min and max. Defaults to True.
+        """
+        self.window_ns = int(window * 1e9)
+        self._points: Deque[Tuple[int, int, float]] = deque() # (timestamp_ns, seq, value)
+        self._seq = 0
+        self._sum = 0.0
+        self._pushes = 0
+        self._min: Union[Deque[Tuple[int, float]], None] = deque() if track_extremes else None # (seq, value), increasing values
+        self._max: Union[Deque[Tuple[int, float]], None] = deque() if track_extremes else None # (seq, value), decreasing values
+
+    def push(self, timestamp_ns: int, value: float):
+        """Adds a value and drops the values that left the window."""
+        seq = self._seq = self._seq + 1
+        self._points.append((timestamp_ns, seq, value))
+        self._sum += value
+        if self._min is not None:
+            while self._min and self._min[-1][1] >= value:
+                self._min.pop()
+            self._min.append((seq, value))
+            while self._max and self._max[-1][1] <= value:
+                self._max.pop()
+            self._max.append((seq, value))
+
+        horizon_ns = timestamp_ns - self.window_ns
+        points = self._points
+        while points[0][0] <= horizon_ns and len(points) > 1: # The newest value always stays
+            _, expired_seq, expired = points.popleft()
+            self._sum -= expired
+            if self._min is not None:
+                if self._min[0][0] == expired_seq:
+                    self._min.popleft()
+                if self._max[0][0] == expired_seq:
+                    self._max.popleft()
+
+        self._pushes += 1
+        if self._pushes % self.RESUM_EVERY == 0:
+            self._sum = math.fsum(point[2] for point in points)
+
+    @property
+    def count(self) -> int:
+        return len(self._points)
+
+    @property
+    def sum(self) -> float:
+        return self._sum
+
+    @property
+    def mean(self) -> float:
+        return self._sum / len(self._points) if self._points else 0.0
+
+    @property
+    def min(self) -> float:
+        return self._min[0][1] if self._min else 0.0
+
+    @property
+    def max(self) -> float:
+        return self._max[0][1] if self._max else 0.0
+
+    @property
+    def rate(self) -> float:
+        """Change of the value per second between the oldest and the newest value of the window."""
+        if len(self._points) < 2:
+            return 0.0
+        first_ns, _, first = self._points[0]
+        last_ns, _, last = self._points[-1]
+        return (last - first) / ((last_ns - first_ns) / 1e9) if last_ns > first_ns else 0.0
+
+
+class Derivation:
+    """
+    Computes one statistic of a source stream and formats it as the payload value
+    of the derived stream's chart type. A Gauge shows the statistic within the
+    window minimum and maximum, a Text the statistic as text, other charts the number.
+    """
+
+    __slots__ = ('stat', 'window', 'chart_type', 'name', '_window', '_ewma', '_ewma_ns')
+
+    def __init__(self, stat: str, window: float, chart_type: str, name: str):
+        """
+        Parameters
+        ----------
+        stat : str
+            One of DERIVED_STATS. 'ewma' is exponentially weighted with `window` as its time
+            constant, 'rate' is the change of the value per second over the window.
+        window : float
+            The window length in seconds.
+        chart_type : str
+            The chart type of the derived stream, one of DERIVED_CHART_TYPES.
+        name : str
+            The name shown by a Gauge.
+        """
+        if stat not in DERIVED_STATS:
+            raise ValueError(f"Unknown statistic '{stat}', expected one of {DERIVED_STATS}.")
+        if chart_type not in DERIVED_CHART_TYPES:
+            raise ValueError(f"Derived streams can not be '{chart_type}' charts, expected one of {DERIVED_CHART_TYPES}.")
+        if window <= 0:
+            raise ValueError(f"Window must be positive, got {window}.")
+        self.stat = stat
+        self.window = window
+        self.chart_type = chart_type
+        self.name = name
+        extremes = stat in ('min', 'max') or chart_type == 'gauge'
+        self._window = RollingWindow(window, track_extremes=extremes) if stat != 'ewma' or extremes else None
+        self._ewma: Union[float, None] = None
+        self._ewma_ns = 0
+
+    def update(self, timestamp_ns: int, value: float) -> Any:
+        """
+        Adds a source value and returns the new payload value of the derived stream.
+
+        Parameters
+        ----------
+        timestamp_ns : int
+            The time of the source update in epoch nanoseconds.
+        value : float
+            The source value.
+
+        Returns
+        -------
+        Any
+            The payload value.
+        """
+        window = self._window
+        if window is not None:
+            window.push(timestamp_ns, value)
+        if self.stat == 'ewma':
+            if self._ewma is None:
+                self._ewma = value
+            else:
+                alpha = 1.0 - math.exp(-max(timestamp_ns - self._ewma_ns, 0) / 1e9 / self.window)
+                self._ewma += alpha * (value - self._ewma)
+            self._ewma_ns = timestamp_ns
+            result = self._ewma
+        else:
+            result = getattr(window, self.stat)
+
+        if self.chart_type == 'gauge':
+            return [self.name, [window.min, window.max], result]
+        if self.chart_type == 'text':
+            return f"{self.stat} {self.window:g}s: {result:.6g}"
+        return result
@@ -0,0 +1,168 @@
+import bisect
+from datetime import datetime
+from typing import Union, Dict, Any, List, Tuple
+
+MAX_TIMESTAMP_NS = 2 ** 63 - 1
+
+# Chart types appending every update, the only ones whose updates are kept in memory. Other
+# chart types replace the whole chart with each update, their latest payload is the cache.
+HISTORY_CHART_TYPES = ('line', 'bar', 'sequence', 'lines', 'bars', 'sequences', 'scatter')
+
+
+def time_to_ns(value: Union[datetime, str, float, int, None], unit: float=1e9, default: Union[int, None]=None) -> Union[int, None]:
+    """
+    Converts a point in time into epoch nanoseconds.
+
+    Parameters
+    ----------
+    value : Union[datetime, str, float, int, None]
+        A datetime, an ISO 8601 string (as in the 'timestamp' field of payloads),
+        or an epoch number expressed in `unit`.
+    unit : float, optional
+        Nanoseconds per unit of numeric values. Defaults to 1e9 (epoch seconds),
+        use 1e6 for epoch milliseconds as sent by browsers.
+    default : Union[int, None], optional
+        Returned when value is None.
+
+    Returns
+    -------
+    Union[int, None]
+        Epoch nanoseconds.
+    """
+    if value is None:
+        return default
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if isinstance(value, datetime):
+        return int(value.timestamp() * 1e9)
+    return int(value * unit)
+
+
+def downsample(points: List[Tuple[int, Dict[str, Any]]], max_points: Union[int, None]) -> List[Tuple[int, Dict[str, Any]]]:
+    """
+    Reduces time-ordered points to at most `max_points`, splitting the covered time
+    span into equal buckets and keeping the latest point of each bucket.
+
+    Parameters
+    ----------
+    points : List[Tuple[int, Dict[str, Any]]]
+        Time-ordered (timestamp_ns, data_payload) pairs.
+    max_points : Union[int, None]
+        The point budget. None or 0 keeps every point.
+
+    Returns
+    -------
+    List[Tuple[int, Dict[str, Any]]]
+        The downsampled points.
+    """
+    if not max_points or len(points) <= max_points:
+        return points
+    first_ns = points[0][0]
+    span = points[-1][0] - first_ns + 1
+    result = []
+    current = -1
+    for point in points:
+        bucket = (point[0] - first_ns) * max_points // span
+        if bucket == current:
+            result[-1] = point
+        else:
+            result.append(point)
+            current = bucket
+    return result
+
+
+class StreamHistory:
+    """
+    Bounded in-memory history of one data stream. Points are kept in parallel lists
+    sorted by record time, so a range lookup is two binary searches.
+    """
+
+    __slots__ = ('maxlen', '_timestamps', '_payloads', '_start')
+
+    def __init__(self, maxlen: int):
+        """
+        Parameters
+        ----------
+        maxlen : int
+            The number of latest points kept.
+        """
+        self.maxlen = maxlen
+        self._timestamps: List[int] = []
+        self._payloads: List[Dict[str, Any]] = []
+        # Points before _start are expired, they are dropped in bulk to keep append amortized O(1)
+        self._start = 0
+
+    def __len__(self) -> int:
+        return len(self._timestamps) - self._start
+
+    def append(self, timestamp_ns: int, data_payload: Dict[str, Any]):
+        """Adds the latest point, expiring the oldest one when full."""
+        self._timestamps.append(timestamp_ns)
+        self._payloads.append(data_payload)
+        if len(self._timestamps) - self._start > self.maxlen:
+            self._start += 1
+            if self._start >= self.maxlen:
+                del self._timestamps[:self._start]
+                del self._payloads[:self._start]
+                self._start = 0
+
+    def extend(self, timestamps_ns: List[int], data_payloads: List[Dict[str, Any]]):
+        """
+        Adds time-ordered points in bulk, keeping the latest `maxlen` points. Points older
+        than the latest one held are merged in by record time.
+
+        Parameters
+        ----------
+        timestamps_ns : List[int]
+            Record times in epoch nanoseconds, sorted.
+        data_payloads : List[Dict[str, Any]]
+            The data payloads, one per record time.
+        """
+        if not timestamps_ns:
+            return
+        timestamps_ns = timestamps_ns[-self.maxlen:]
+        data_payloads = data_payloads[-self.maxlen:]
+        if len(self) and timestamps_ns[0] < self._timestamps[-1]:
+            points = sorted(
+                zip(self._timestamps[self._start:] + timestamps_ns, self._payloads[self._start:] + data_payloads),
+                key=lambda point: point[0]
+            )
+            self._timestamps = [point[0] for point in points]
+            self._payloads = [point[1] for point in points]
+            self._start = 0
+        else:
+            self._timestamps.extend(timestamps_ns)
+            self._payloads.extend(data_payloads)
+        excess = len(self) - self.maxlen
+        if excess > 0:
+            del self._timestamps[:self._start + excess]
+            del self._payloads[:self._start + excess]
+            self._start = 0
+
+    def oldest(self) -> Union[int, None]:
+        """Returns the record time of the oldest point still held, or None if empty."""
+        return self._timestamps[self._start] if len(self) else None
+
+    def newest(self) -> Union[int, None]:
+        """Returns the record time of the latest point, or None if empty."""
+        return self._timestamps[-1] if len(self) else None
+
+    def range(self, start_ns: int, end_ns: int) -> List[Tuple[int, Dict[str, Any]]]:
+        """
+        Returns the points whose record time falls in [start_ns, end_ns].
+
+        Parameters
+        ----------
+        start_ns : int
+            Range start in epoch nanoseconds (inclusive).
+        end_ns : int
+            Range end in epoch nanoseconds (inclusive).
+
+        Returns
+        -------
+        List[Tuple[int, Dict[str, Any]]]
+            Time-ordered (timestamp_ns, data_payload) pairs.
+        """
+        lo = bisect.bisect_left(self._timestamps, start_ns, lo=self._start)
+        hi = bisect.bisect_right(self._timestamps, end_ns, lo=lo)
+        return list(zip(self._timestamps[lo:hi], self._payloads[lo:hi]))
@@ -0,0 +1,108 @@
+import bisect
+from typing import Dict, Any, Set, List
+
+# Sorts after every character a key word can contain, bounds prefix ranges
+_MAX_CHAR = '\U0010ffff'
+
+
+class KeyIndex:
+    """
+    Registered key words by chart type, kept sorted so the key words starting with
+    a prefix are found with two bisections instead of a scan over every stream.
+    """
+
+    def __init__(self):
+        self._key_words: Dict[str, List[str]] = {}
+
+    def add(self, chart_type: str, key_word: str):
+        """Adds a key word, known key words are ignored."""
+        key_words = self._key_words.setdefault(chart_type, [])
+        i = bisect.bisect_left(key_words, key_word)
+        if i == len(key_words) or key_words[i] != key_word:
+            key_words.insert(i, key_word)
+
+    def discard(self, chart_type: str, key_word: str):
+        """Removes a key word, unknown key words are ignored."""
+        key_words = self._key_words.get(chart_type)
+        if not key_words:
+            return
+        i = bisect.bisect_left(key_words, key_word)
+        if i < len(key_words) and key_words[i] == key_word:
+            del key_words[i]
+
+    def match(self, chart_type: str, prefix: str) -> List[str]:
+        """
+        Returns the key words of a chart type starting with a prefix.
+
+        Parameters
+        ----------
+        chart_type : str
+            The chart type, e.g. 'gauge'.
+        prefix : str
+            The prefix, '' matches every key word.
+
+        Returns
+        -------
+        List[str]
+            The matching key words in sorted order.
+        """
+        key_words = self._key_words.get(chart_type)
+        if not key_words:
+            return []
+        lo = bisect.bisect_left(key_words, prefix)
+        hi = bisect.bisect_right(key_words, prefix + _MAX_CHAR, lo)
+        return key_words[lo:hi]
+
+
+class PatternTable:
+    """
+    Prefix subscriptions by chart type. A key word is matched by looking up each of
+    its prefixes, so the cost grows with the key length, not the number of patterns.
+    """
+
+    def __init__(self):
+        self._prefixes: Dict[str, Dict[str, Set[Any]]] = {}
+
+    def __bool__(self) -> bool:
+        return bool(self._prefixes)
+
+    def add(self, chart_type: str, prefix: str, subscriber: Any):
+        """Subscribes to the key words of a chart type starting with prefix."""
+        self._prefixes.setdefault(chart_type, {}).setdefault(prefix, set()).add(subscriber)
+
+    def discard(self, chart_type: str, prefix: str, subscriber: Any):
+        """Removes a subscription added by `add`, empty entries are dropped."""
+        prefixes = self._prefixes.get(chart_type)
+        if prefixes is None or prefix not in prefixes:
+            return
+        prefixes[prefix].discard(subscriber)
+        if not prefixes[prefix]:
+            del prefixes[prefix]
+            if not prefixes:
+                del self._prefixes[chart_type]
+
+    def match(self, chart_type: str, key_word: str) -> Set[Any]:
+        """
+        Returns the subscribers whose prefix matches a key word.
+
+        Parameters
+        ----------
+        chart_type : str
+            The chart type of the key word.
+        key_word : str
+            The key word.
+
+        Returns
+        -------
+        Set[Any]
+            The matching subscribers.
+        """
+        prefixes = self._prefixes.get(chart_type)
+        matched: Set[Any] = set()
+        if not prefixes:
+            return matched
+        for i in range(len(key_word) + 1):
+            subscribers = prefixes.get(key_word[:i])
+            if subscribers:
+                matched |= subscribers
+        return matched
@@ -0,0 +1,350 @@
+import os
+import sys
+import json
+import math
+import time
+import socket
+import asyncio
+import logging
+import argparse
+import resource
+import itertools
+import importlib.util
+import threading
+import multiprocessing
+from array import array
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Any, List, Tuple, Optional
+from .api import DataStream
+from .apiTest import generate_data
+from .apiReplay import CHART_CLASSES
+from .apiBenchmark import CHART_TYPES, _benchmark_manager
+
+logger = logging.getLogger(__name__)
+
+# Client connections opened at once by one worker, keeps the listen backlog from overflowing
+CONNECT_CONCURRENCY = 64
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _raise_file_limit():
+    """Raises the soft open-file limit to the hard limit, each client connection needs a descriptor."""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if hard == resource.RLIM_INFINITY or soft < hard:
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+        except (ValueError, OSError) as e:
+            logger.warning(f"Could not raise the open-file limit from {soft}: {e}")
+
+
+def _rss_bytes() -> Tuple[int, int]:
+    """Returns the current and the peak resident set size of this process, read from /proc."""
+    current = peak = 0
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    current = int(line.split()[1]) * 1024
+                elif line.startswith('VmHWM:'):
+                    peak = int(line.split()[1]) * 1024
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    return current, peak
+
+
+def _cpu_seconds() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of ascending values, q in [0, 1]; 0.0 if empty."""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, max(0, math.ceil(q * len(sorted_values)) - 1))]
+
+
+# Client side, run in worker processes
+
+async def _client_connection(url: str, chart_type: str, key_word: str, latencies: array, counters: Dict[str, int], connected: asyncio.Semaphore, stop: asyncio.Event):
+    import websockets
+    try:
+        async with connected:
+            websocket = await websockets.connect(url, subprotocols=["json"], max_queue=None, ping_interval=None)
+            await websocket.send(json.dumps({"chart_type": chart_type, "key_word": key_word}))
+            reply = json.loads(await websocket.recv())
+            if reply.get("status") != "success":
+                counters['rejected'] += 1
+                await websocket.close()
+                return
+        counters['subscribed'] += 1
+        async with websocket:
+            recv = websocket.recv
+            while not stop.is_set():
+                message = json.loads(await recv())
+                # The producer stamps epoch nanoseconds into the opaque 'id' field, control and initial messages have none
+                if "status" in message or not str(message.get("id", "")).isdigit():
+                    continue
+                latencies.append((time.time_ns() - int(message["id"])) // 1000)
+                counters['received'] += 1
+    except asyncio.CancelledError:
+        pass
+    except Exception as e:
+        counters['errors'] += 1
+        logger.debug(f"Load client {chart_type}<:>{key_word} failed: {e}")
+
+
+async def _client_main(url: str, subscriptions: List[Tuple[str, str]], ready: Any, start: Any, stop: Any) -> Dict[str, Any]:
+    loop = asyncio.get_running_loop()
+    latencies = array('q')
+    counters = {'subscribed': 0, 'rejected': 0, 'received': 0, 'errors': 0}
+    stop_event = asyncio.Event()
+    connected = asyncio.Semaphore(CONNECT_CONCURRENCY)
+    tasks = [loop.create_task(_client_connection(url, chart_type, key_word, latencies, counters, connected, stop_event)) for chart_type, key_word in subscriptions]
+
+    while counters['subscribed'] + counters['rejected'] + counters['errors'] < len(tasks):
+        await asyncio.sleep(0.05)
+    ready.set()
+
+    # Only updates produced during the measured window count
+    await loop.run_in_executor(None, start.wait)
+    del latencies[:]
+    counters['received'] = 0
+    cpu_start = _cpu_seconds()
+    await loop.run_in_executor(None, stop.wait)
+    cpu = _cpu_seconds() - cpu_start
+
+    stop_event.set()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return {**counters, 'cpu_seconds': cpu, 'rss_peak': _rss_bytes()[1], 'latencies': latencies.tobytes()}
+
+
+def _client_worker(url: str, subscriptions: List[Tuple[str, str]], ready: Any, start: Any, stop: Any, results: Any):
+    """Entry of a client worker process, runs its share of the simulated clients on one asyncio loop."""
+    logging.getLogger().setLevel(logging.WARNING)
+    _raise_file_limit()
+    try:
+        results.put(asyncio.run(_client_main(url, subscriptions, ready, start, stop)))
+    except Exception as e:
+        ready.set()
+        results.put({'subscribed': 0, 'rejected': 0, 'received': 0, 'errors': len(subscriptions), 'cpu_seconds': 0.0, 'rss_peak': 0, 'latencies': b'', 'failure': str(e)})
+
+
+# Server side, run in this process
+
+def _producer(streams: List[Tuple[DataStream, Any]], rate: float, start_time: float, stop: threading.Event, published: List[int]):
+    """
+    Publishes every stream at `rate` updates per second until stopped. Streams are
+    staggered over the period and updates missed while behind are caught up, so the
+    offered load does not drift.
+    """
+    count = len(streams)
+    sent = [0] * count
+    period = min(1.0 / rate, 0.01)
+    while not stop.is_set():
+        elapsed = time.perf_counter() - start_time
+        for i, (stream, value) in enumerate(streams):
+            due = int(elapsed * rate + i / count) - sent[i]
+            for _ in range(due):
+                stream.update({"id": str(time.time_ns()), "timestamp": datetime.now().isoformat(), "value": value})
+            sent[i] += due
+        delay = period - (time.perf_counter() - start_time - elapsed)
+        if delay > 0:
+            stop.wait(delay)
+    published.append(sum(sent))
+
+
+@contextmanager
+def _quiet_logging():
+    """Silences per-connection and per-stream logging, thousands of lines would distort the measurement."""
+    names = ['', 'websockets', DataStream.__module__.rsplit('.', 1)[0] + '.apiCore']
+    levels = {name: logging.getLogger(name).level for name in names}
+    for name in names:
+        logging.getLogger(name).setLevel(logging.WARNING)
+    try:
+        yield
+    finally:
+        for name, level in levels.items():
+            logging.getLogger(name).setLevel(level)
+
+
+def run_load(streams: int=10, clients: int=100, fan_in: int=1, rate: float=10.0, duration: float=10.0, workers: Optional[int]=None, chart_types: Optional[List[str]]=None, grace: float=1.0, event_loop: str='asyncio') -> Dict[str, Any]:
+    """
+    Runs one load-test configuration against a manager started locally.
+
+    Parameters
+    ----------
+    streams : int, optional
+        The number of streams, spread round-robin over `chart_types`. Defaults to 10.
+    clients : int, optional
+        The number of simulated viewers. Defaults to 100.
+    fan_in : int, optional
+        Streams each viewer subscribes to; every subscription is one WebSocket, as
+        in the web app. Defaults to 1.
+    rate : float, optional
+        Updates per second of every stream. Defaults to 10.
+    duration : float, optional
+        Seconds of measured load. Defaults to 10s.
+    workers : Optional[int], optional
+        Client processes, None uses one per 500 connections up to the CPU count.
+    chart_types : Optional[List[str]], optional
+        The chart types to create streams of. Defaults to every chart type.
+    grace : float, optional
+        Seconds to wait after producing stops for updates still in flight. Defaults to 1s.
+    event_loop : str, optional
+        Event loop implementation of the server: 'asyncio', 'uvloop' or 'auto'. Defaults to 'asyncio'.
+
+    Returns
+    -------
+    Dict[str, Any]
+        The configuration, delivered throughput, latency percentiles in milliseconds,
+        and CPU and RSS of the server process and of the clients.
+    """
+    chart_types = chart_types or CHART_TYPES
+    connections = clients * fan_in
+    if workers is None:
+        workers = max(1, min(os.cpu_count() or 1, math.ceil(connections / 500)))
+    _raise_file_limit()
+    port = _free_port()
+    url = f"ws://127.0.0.1:{port}/load"
+
+    stream_keys = [(chart_types[i % len(chart_types)], f"load.{i}") for i in range(streams)]
+    # Viewer i watches fan_in consecutive streams, so subscribers spread evenly over the streams
+    subscriptions = [stream_keys[(i * fan_in + j) % streams] for i in range(clients) for j in range(min(fan_in, streams))]
+    shares = [subscriptions[w::workers] for w in range(workers)]
+    subscribers_per_stream = {key: 0 for key in stream_keys}
+    for key in subscriptions:
+        subscribers_per_stream[key] += 1
+
+    context = multiprocessing.get_context('spawn')
+    start, stop, results = context.Event(), context.Event(), context.Queue()
+    readies = [context.Event() for _ in range(workers)]
+
+    with _quiet_logging(), _benchmark_manager(start=True, port=port, route='/load', event_loop=event_loop) as manager:
+        chart_streams = [(CHART_CLASSES[chart_type](key_word), generate_data(chart_type)) for chart_type, key_word in stream_keys]
+        processes = [context.Process(target=_client_worker, args=(url, share, ready, start, stop, results), daemon=True) for share, ready in zip(shares, readies)]
+        for process in processes:
+            process.start()
+        for ready in readies:
+            ready.wait()
+
+        rss_start = _rss_bytes()[0]
+        cpu_start = _cpu_seconds()
+        start.set()
+        wall_start = time.perf_counter()
+        producing = threading.Event()
+        published: List[int] = []
+        producer = threading.Thread(target=_producer, args=(chart_streams, rate, wall_start, producing, published), daemon=True)
+        producer.start()
+        producing.wait(duration)
+        producing.set()
+        producer.join()
+        wall = time.perf_counter() - wall_start
+        time.sleep(grace)
+        cpu = _cpu_seconds() - cpu_start
+        rss, rss_peak = _rss_bytes()
+        queue_left = len(manager._update_queue)
+        stop.set()
+
+        reports = [results.get() for _ in processes]
+        for process in processes:
+            process.join(timeout=5)
+
+    latencies = array('q')
+    for report in reports:
+        latencies.frombytes(report['latencies'])
+    latencies = sorted(latencies)
+    received = sum(report['received'] for report in reports)
+    per_stream = published[0] / streams if streams else 0
+    expected = sum(per_stream * count for count in subscribers_per_stream.values())
+    return {
+        'event_loop': manager.event_loop,
+        'streams': streams,
+        'clients': clients,
+        'fan_in': fan_in,
+        'rate': rate,
+        'duration': wall,
+        'workers': workers,
+        'connections': connections,
+        'subscribed': sum(report['subscribed'] for report in reports),
+        'errors': sum(report['errors'] + report['rejected'] for report in reports),
+        'published': published[0],
+        'delivered': received,
+        'delivery_ratio': received / expected if expected else 0.0,
+        'throughput': received / (wall + grace),
+        'queue_left': queue_left,
+        'latency_ms': {
+            'p50': percentile(latencies, 0.50) / 1e3,
+            'p99': percentile(latencies, 0.99) / 1e3,
+            'p999': percentile(latencies, 0.999) / 1e3,
+            'max': (latencies[-1] if latencies else 0) / 1e3,
+        },
+        'server_cpu_percent': 100 * cpu / (wall + grace),
+        'server_rss_mb': rss / 2 ** 20,
+        'server_rss_peak_mb': rss_peak / 2 ** 20,
+        'server_rss_growth_mb': (rss - rss_start) / 2 ** 20,
+        'client_cpu_percent': 100 * sum(report['cpu_seconds'] for report in reports) / (wall + grace),
+        'client_rss_peak_mb': sum(report['rss_peak'] for report in reports) / 2 ** 20,
+    }
+
+
+def _parse_list(text: str, cast: type) -> List[Any]:
+    return [cast(item) for item in text.split(',') if item.strip()]
+
+
+def _print_report(report: Dict[str, Any]):
+    latency = report['latency_ms']
+    print(
+        f"{report['event_loop']:>8} {report['streams']:>7}{report['clients']:>8}{report['fan_in']:>7}{report['rate']:>8g}"
+        f"{report['throughput']:>12.0f}{report['delivery_ratio']:>9.1%}"
+        f"{latency['p50']:>9.2f}{latency['p99']:>9.2f}{latency['p999']:>9.2f}"
+        f"{report['server_cpu_percent']:>9.0f}{report['server_rss_mb']:>9.0f}{report['errors']:>7}"
+    )
+
+
+def main(argv: Optional[List[str]]=None) -> int:
+    """
+    Command line entry of the load generator, every combination of the given
+    streams, clients, fan-in and rate lists is run as one configuration.
+    """
+    parser = argparse.ArgumentParser(description="End-to-end load test of a local StreamDataPanel server.", prog="python -m StreamDataPanel.apiLoad")
+    parser.add_argument('-s', '--streams', default='10', help='comma separated stream counts')
+    parser.add_argument('-c', '--clients', default='100', help='comma separated viewer counts')
+    parser.add_argument('-f', '--fan-in', default='1', help='comma separated subscriptions per viewer')
+    parser.add_argument('-r', '--rate', default='10', help='comma separated updates per second per stream')
+    parser.add_argument('-d', '--duration', type=float, default=10.0, help='measured seconds per configuration')
+    parser.add_argument('-w', '--workers', type=int, default=None, help='client processes')
+    parser.add_argument('--chart-types', default=None, help='comma separated chart types, all by default')
+    parser.add_argument('-l', '--event-loops', default='asyncio', help='comma separated server event loops to compare, e.g. asyncio,uvloop')
+    parser.add_argument('-o', '--output', default=None, help='write the reports as JSON to this file')
+    args = parser.parse_args(argv)
+
+    chart_types = _parse_list(args.chart_types, str) if args.chart_types else None
+    event_loops = _parse_list(args.event_loops, str)
+    if 'uvloop' in event_loops and importlib.util.find_spec('uvloop') is None:
+        logger.warning("uvloop is not installed, it is left out of the comparison.")
+        event_loops.remove('uvloop')
+    reports = []
+    print(f"{'loop':>8} {'streams':>7}{'clients':>8}{'fan_in':>7}{'rate':>8}{'msg/s':>12}{'deliv':>9}{'p50 ms':>9}{'p99 ms':>9}{'p999 ms':>9}{'cpu %':>9}{'rss MB':>9}{'errors':>7}")
+    # Loops innermost, so each configuration is compared side by side under the same load
+    for streams, clients, fan_in, rate, event_loop in itertools.product(_parse_list(args.streams, int), _parse_list(args.clients, int), _parse_list(args.fan_in, int), _parse_list(args.rate, float), event_loops):
+        report = run_load(streams=streams, clients=clients, fan_in=fan_in, rate=rate, duration=args.duration, workers=args.workers, chart_types=chart_types, event_loop=event_loop)
+        _print_report(report)
+        reports.append(report)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'created': datetime.now().isoformat(), 'cpu_count': os.cpu_count(), 'reports': reports}, f, indent=4)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
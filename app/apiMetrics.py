@@ -0,0 +1,206 @@
+import bisect
+from typing import Union, Dict, Any, List, Tuple, Callable, Iterable
+
+# Latency buckets in seconds, roughly x2.5 apart from 10 microseconds to 10 seconds
+LATENCY_BUCKETS = (1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3, 1e-2, 2.5e-2, 5e-2, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(label_names: Tuple[str, ...], label_values: Tuple[str, ...], extra: str='') -> str:
+    """Formats Prometheus labels, e.g. '{stream="line<:>test"}'."""
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(label_names, label_values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+class Counter:
+    """Monotonic counter. Updated from the event loop only, so a plain integer add is enough."""
+
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: Union[int, float]=1):
+        self.value += amount
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram. `observe` is one binary search and two additions,
+    percentiles are estimated from the bucket bounds.
+    """
+
+    __slots__ = ('bounds', 'counts', 'count', 'sum')
+
+    def __init__(self, bounds: Iterable[float]=LATENCY_BUCKETS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1) # The last bucket is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def snapshot(self) -> List[int]:
+        """Returns a copy of the bucket counts, see `percentile`."""
+        return list(self.counts)
+
+    def percentile(self, q: float, since: Union[List[int], None]=None) -> float:
+        """
+        Estimates a percentile as the upper bound of the bucket it falls in.
+
+        Parameters
+        ----------
+        q : float
+            The percentile in [0, 1], e.g. 0.99.
+        since : Union[List[int], None], optional
+            Bucket counts from an earlier `snapshot`, only observations made
+            afterwards are considered. Defaults to None (all observations).
+
+        Returns
+        -------
+        float
+            The estimate, 0.0 without observations, the largest bound for the +Inf bucket.
+        """
+        counts = self.counts if since is None else [now - before for now, before in zip(self.counts, since)]
+        total = sum(counts)
+        if not total:
+            return 0.0
+        rank = q * total
+        cumulative = 0
+        for i, count in enumerate(counts):
+            cumulative += count
+            if cumulative >= rank:
+                return self.bounds[min(i, len(self.bounds) - 1)]
+        return self.bounds[-1]
+
+
+class _Family:
+    """All label combinations of one metric name."""
+
+    def __init__(self, name: str, help_text: str, kind: str, label_names: Tuple[str, ...], factory: Callable[[], Any]):
+        self.name = name
+        self.help_text = help_text
+        self.kind = kind
+        self.label_names = label_names
+        self.factory = factory
+        self.children: Dict[Tuple[str, ...], Any] = {}
+
+    def labels(self, *label_values: str) -> Any:
+        child = self.children.get(label_values)
+        if child is None:
+            child = self.children[label_values] = self.factory()
+        return child
+
+    def remove(self, *label_values: str):
+        self.children.pop(label_values, None)
+
+
+class MetricsRegistry:
+    """
+    Registry of the manager metrics, renders them in the Prometheus text format.
+    Counters and histograms are created once and then updated through direct
+    references, gauges are callbacks evaluated only when rendered.
+    """
+
+    def __init__(self, prefix: str='sdp_'):
+        """
+        Parameters
+        ----------
+        prefix : str, optional
+            Prepended to every metric name. Defaults to 'sdp_'.
+        """
+        self.prefix = prefix
+        self._families: Dict[str, _Family] = {}
+        self._gauges: Dict[str, Tuple[str, Tuple[str, ...], Callable[[], Any]]] = {}
+
+    def counter(self, name: str, help_text: str, label_names: Tuple[str, ...]=()) -> Union[Counter, _Family]:
+        """
+        Registers a counter.
+
+        Returns
+        -------
+        Union[Counter, _Family]
+            The counter itself, or its family when labelled; use `.labels(...)` to get a child.
+        """
+        return self._register(name, help_text, 'counter', label_names, Counter)
+
+    def histogram(self, name: str, help_text: str, label_names: Tuple[str, ...]=(), bounds: Iterable[float]=LATENCY_BUCKETS) -> Union[Histogram, _Family]:
+        """
+        Registers a histogram.
+
+        Returns
+        -------
+        Union[Histogram, _Family]
+            The histogram itself, or its family when labelled; use `.labels(...)` to get a child.
+        """
+        bounds = tuple(bounds)
+        return self._register(name, help_text, 'histogram', label_names, lambda: Histogram(bounds))
+
+    def gauge(self, name: str, help_text: str, callback: Callable[[], Any], label_names: Tuple[str, ...]=()):
+        """
+        Registers a gauge computed on demand.
+
+        Parameters
+        ----------
+        name : str
+            Metric name without prefix.
+        help_text : str
+            The HELP line.
+        callback : Callable[[], Any]
+            Returns a number, or for labelled gauges an iterable of (label_values, number).
+        label_names : Tuple[str, ...], optional
+            The label names of a labelled gauge.
+        """
+        self._gauges[self.prefix + name] = (help_text, tuple(label_names), callback)
+
+    def _register(self, name: str, help_text: str, kind: str, label_names: Tuple[str, ...], factory: Callable[[], Any]) -> Any:
+        family = self._families.get(self.prefix + name)
+        if family is None:
+            family = self._families[self.prefix + name] = _Family(self.prefix + name, help_text, kind, tuple(label_names), factory)
+        return family if family.label_names else family.labels()
+
+    def family(self, name: str) -> Union[_Family, None]:
+        """Returns the family of a registered counter or histogram, by name without prefix."""
+        return self._families.get(self.prefix + name)
+
+    def render_prometheus(self) -> str:
+        """
+        Renders all metrics in the Prometheus text exposition format (version 0.0.4).
+
+        Returns
+        -------
+        str
+            The exposition text.
+        """
+        lines = []
+        for family in self._families.values():
+            lines.append(f"# HELP {family.name} {family.help_text}")
+            lines.append(f"# TYPE {family.name} {family.kind}")
+            for label_values, metric in list(family.children.items()):
+                if family.kind == 'counter':
+                    lines.append(f"{family.name}{_format_labels(family.label_names, label_values)} {metric.value}")
+                else:
+                    cumulative = 0
+                    for bound, count in zip(metric.bounds + (float('inf'),), metric.counts):
+                        cumulative += count
+                        le = 'le="+Inf"' if bound == float('inf') else f'le="{bound!r}"'
+                        lines.append(f"{family.name}_bucket{_format_labels(family.label_names, label_values, le)} {cumulative}")
+                    lines.append(f"{family.name}_sum{_format_labels(family.label_names, label_values)} {metric.sum}")
+                    lines.append(f"{family.name}_count{_format_labels(family.label_names, label_values)} {metric.count}")
+        for name, (help_text, label_names, callback) in self._gauges.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            if label_names:
+                for label_values, value in callback():
+                    lines.append(f"{name}{_format_labels(label_names, label_values)} {value}")
+            else:
+                lines.append(f"{name} {callback()}")
+        return '\n'.join(lines) + '\n'
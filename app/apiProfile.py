@@ -0,0 +1,195 @@
+import time
+import random
+import logging
+import traceback
+from typing import Union, Dict, Any, Deque, List, Tuple
+from collections import deque, Counter, OrderedDict
+from .apiCore import WebsocketManager
+
+logger = logging.getLogger(__name__)
+
+
+class SamplingProfiler:
+    """
+    Profiling hook measuring the hot path of a random fraction of updates with
+    `time.perf_counter_ns`. Spans are reported per stage:
+
+        queue    : pre_enqueue  -> post_dequeue   waiting in the update queue
+        dispatch : post_dequeue -> pre_encode     cache, history and recording
+        encode   : pre_encode   -> post_encode    JSON encoding
+        send     : pre_send     -> post_send      fan-out to all subscribers
+
+    Optionally the producer stack of every sampled update is captured, to find
+    out which code publishes the most.
+    """
+
+    STAGES = ('queue', 'dispatch', 'encode', 'send')
+
+    def __init__(self, fraction: float=0.01, capture_stack: bool=False, stack_limit: int=8, max_samples: int=10000):
+        """
+        Parameters
+        ----------
+        fraction : float, optional
+            The fraction of updates sampled, in [0, 1]. Defaults to 0.01.
+        capture_stack : bool, optional
+            Capture the producer stack of sampled updates. Defaults to False.
+        stack_limit : int, optional
+            The number of frames captured per stack. Defaults to 8.
+        max_samples : int, optional
+            The number of latest spans kept per stage. Defaults to 10000.
+        """
+        self.fraction = fraction
+        self.capture_stack = capture_stack
+        self.stack_limit = stack_limit
+        self.spans: Dict[str, Deque[int]] = {stage: deque(maxlen=max_samples) for stage in self.STAGES}
+        self.stacks: Counter = Counter()
+        self._manager: Union[WebsocketManager, None] = None
+
+        # Sampled updates in flight, by (stream id, id of their payload), then by id of their encoded message.
+        # Entries hold the object they are keyed by, so its id can not be reused while it is in flight.
+        self._inflight: OrderedDict[Tuple[int, int], Tuple[Any, Dict[str, int]]] = OrderedDict()
+        self._inflight_messages: OrderedDict[int, Tuple[str, Dict[str, int]]] = OrderedDict()
+        self._inflight_limit = 1000
+
+    # Installation
+
+    def install(self, manager: WebsocketManager) -> "SamplingProfiler":
+        """
+        Attaches the profiler to a manager.
+
+        Parameters
+        ----------
+        manager : WebsocketManager
+            The manager to profile.
+
+        Returns
+        -------
+        SamplingProfiler
+            The profiler itself.
+        """
+        self.uninstall()
+        self._manager = manager
+        for event, callback in self._callbacks():
+            manager.add_hook(event, callback)
+        return self
+
+    def uninstall(self):
+        """Detaches the profiler from its manager, collected spans are kept."""
+        if self._manager is None:
+            return
+        for event, callback in self._callbacks():
+            self._manager.remove_hook(event, callback)
+        self._manager = None
+
+    def _callbacks(self) -> List[Tuple[str, Any]]:
+        return [
+            ('pre_enqueue', self._pre_enqueue),
+            ('post_dequeue', self._post_dequeue),
+            ('pre_encode', self._pre_encode),
+            ('post_encode', self._post_encode),
+            ('pre_send', self._pre_send),
+            ('post_send', self._post_send),
+        ]
+
+    # Hooks
+
+    def _key(self, data_key: str, data_payload: Dict[str, Any]) -> Tuple[int, int]:
+        return (self._manager.stream_id(data_key), id(data_payload))
+
+    def _pre_enqueue(self, data_key: str, data_payload: Dict[str, Any]):
+        if random.random() >= self.fraction or self._manager is None:
+            return
+        self._inflight[self._key(data_key, data_payload)] = (data_payload, {'pre_enqueue': time.perf_counter_ns()})
+        if len(self._inflight) > self._inflight_limit:
+            self._inflight.popitem(last=False) # Oldest sample, its update never reached the end, e.g. shed under overload
+        if self.capture_stack:
+            frames = traceback.extract_stack(limit=self.stack_limit + 3)[:-3] # Without the hook frames
+            self.stacks[' <- '.join(f"{frame.name} ({frame.filename}:{frame.lineno})" for frame in reversed(frames))] += 1
+
+    def _post_dequeue(self, data_key: str, data_payload: Dict[str, Any]):
+        key = self._key(data_key, data_payload)
+        entry = self._inflight.get(key)
+        if entry is None:
+            return
+        sample = entry[1]
+        sample['post_dequeue'] = time.perf_counter_ns()
+        self.spans['queue'].append(sample['post_dequeue'] - sample['pre_enqueue'])
+        slot = self._manager._slots[key[0]]
+        if not slot.subscribers and not slot.pattern_subscribers:
+            del self._inflight[key] # Dispatched without subscribers, never encoded
+
+    def _pre_encode(self, data_key: str, data_payload: Dict[str, Any]):
+        entry = self._inflight.get(self._key(data_key, data_payload))
+        if entry is not None and 'post_dequeue' in entry[1]:
+            sample = entry[1]
+            sample['pre_encode'] = time.perf_counter_ns()
+            self.spans['dispatch'].append(sample['pre_encode'] - sample['post_dequeue'])
+
+    def _post_encode(self, data_key: str, data_payload: Dict[str, Any], message: str):
+        entry = self._inflight.pop(self._key(data_key, data_payload), None)
+        if entry is not None and 'pre_encode' in entry[1]:
+            sample = entry[1]
+            self.spans['encode'].append(time.perf_counter_ns() - sample['pre_encode'])
+            self._inflight_messages[id(message)] = (message, sample)
+            if len(self._inflight_messages) > self._inflight_limit:
+                self._inflight_messages.popitem(last=False)
+
+    def _pre_send(self, data_key: str, message: str, subscribers: Any):
+        entry = self._inflight_messages.get(id(message))
+        if entry is not None:
+            entry[1]['pre_send'] = time.perf_counter_ns()
+
+    def _post_send(self, data_key: str, message: str, subscribers: Any, disconnected: Any):
+        entry = self._inflight_messages.pop(id(message), None)
+        if entry is not None and 'pre_send' in entry[1]:
+            self.spans['send'].append(time.perf_counter_ns() - entry[1]['pre_send'])
+
+    # Reporting
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """
+        Summarizes the collected spans.
+
+        Returns
+        -------
+        Dict[str, Dict[str, float]]
+            By stage: 'count' and 'mean_us', 'p50_us', 'p99_us', 'max_us' in microseconds.
+        """
+        result = {}
+        for stage, spans in self.spans.items():
+            values = sorted(spans)
+            if not values:
+                result[stage] = {'count': 0}
+                continue
+            result[stage] = {
+                'count': len(values),
+                'mean_us': sum(values) / len(values) / 1e3,
+                'p50_us': values[len(values) // 2] / 1e3,
+                'p99_us': values[min(int(len(values) * 0.99), len(values) - 1)] / 1e3,
+                'max_us': values[-1] / 1e3,
+            }
+        return result
+
+    def top_stacks(self, n: int=10) -> List[Tuple[str, int]]:
+        """
+        Returns the producer stacks seen most often, if `capture_stack` is enabled.
+
+        Parameters
+        ----------
+        n : int, optional
+            The number of stacks returned. Defaults to 10.
+
+        Returns
+        -------
+        List[Tuple[str, int]]
+            (stack, count) pairs, innermost frame first.
+        """
+        return self.stacks.most_common(n)
+
+    def reset(self):
+        """Discards every collected span and stack."""
+        for spans in self.spans.values():
+            spans.clear()
+        self.stacks.clear()
+        self._inflight.clear()
+        self._inflight_messages.clear()
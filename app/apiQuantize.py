@@ -0,0 +1,76 @@
+import logging
+from typing import Dict, Any
+from .apiValidate import NUMPY_MIN_SIZE
+
+try:
+    import numpy as np
+except ImportError: # Numbers are rounded one by one without NumPy
+    np = None
+
+logger = logging.getLogger(__name__)
+
+
+class Quantizer:
+    """
+    Lossy encoding of one stream: every number of a payload value is scaled to an integer,
+    multiplied by 10 ** decimals, before the payload is encoded, with the factor in the "scale"
+    field of the payload for the browser to divide by. Integers are shorter than float reprs
+    and faster to encode and to parse in the browser. Large lists of numbers, like Surface
+    rows, are scaled vectorized with NumPy when installed.
+    """
+
+    __slots__ = ('decimals', 'scale')
+
+    def __init__(self, decimals: int):
+        """
+        Parameters
+        ----------
+        decimals : int
+            The decimals kept.
+        """
+        if decimals < 0:
+            raise ValueError(f"Decimals must not be negative, got {decimals}.")
+        self.decimals = int(decimals)
+        self.scale = 10 ** self.decimals
+
+    def __call__(self, data_payload: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Returns a quantized copy of a payload, the payload itself if its value holds
+        numbers that can not be scaled to integers (NaN or infinity).
+
+        Parameters
+        ----------
+        data_payload : Dict[str, Any]
+            The data payload dictionary containing 'id', 'timestamp', and 'value'.
+
+        Returns
+        -------
+        Dict[str, Any]
+            The payload to encode.
+        """
+        try:
+            value = self._quantize(data_payload.get("value"))
+        except (ValueError, OverflowError) as e:
+            logger.debug(f"Payload sent unquantized: {e}")
+            return data_payload
+        return {**data_payload, "value": value, "scale": self.scale}
+
+    def _quantize(self, value: Any) -> Any:
+        """Scales the numbers of a value, strings and other items are kept."""
+        kind = type(value)
+        if kind is float:
+            return round(value * self.scale)
+        if kind is int:
+            return value * self.scale
+        if kind is not list and kind is not tuple:
+            return value
+        if np is not None and len(value) >= NUMPY_MIN_SIZE:
+            try:
+                numbers = np.asarray(value)
+            except (ValueError, TypeError): # Ragged nesting
+                numbers = None
+            if numbers is not None and numbers.dtype.kind in 'iuf':
+                if numbers.dtype.kind == 'f' and not np.isfinite(numbers).all():
+                    raise ValueError("NaN and infinity can not be scaled to integers.")
+                return np.rint(numbers * self.scale).astype('int64').tolist()
+        return [self._quantize(item) for item in value]
@@ -0,0 +1,527 @@
+import os
+import json
+import mmap
+import bisect
+import time
+import struct
+import logging
+import threading
+from datetime import datetime, timedelta
+from urllib.parse import quote, unquote
+from typing import Union, Dict, Any, Deque, Tuple, List, Iterator, IO
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Segment layout
+# Every segment starts with a fixed header, followed by append-only records.
+#   header  : magic(4s) version(B) kind(B) padding(2x) created_ns(q)            -> 16 bytes
+#   numeric : timestamp_ns(q) moment_us(q) value_type(B) value(d or q)           -> 25 bytes per record
+#   json    : timestamp_ns(q) length(I) payload(length bytes, utf-8 json)        -> 12 bytes + payload
+# moment_us is the payload's own 'timestamp' in microseconds since the naive epoch, from which
+# its 'id' and 'timestamp' are rebuilt exactly. value_type tells a float (d) from an int64 (q),
+# so streams mixing both stay in one segment. Only payloads shaped like `DataStream.fresh`
+# ones, with a float or int64 value, take the fixed-size layout, which is searched directly;
+# anything else is kept as JSON. JSON segments get a sparse sidecar index holding
+# timestamp_ns(q) offset(Q) of every INDEX_INTERVAL-th record.
+SEGMENT_MAGIC = b'SDPR'
+SEGMENT_VERSION = 1
+SEGMENT_SUFFIX = '.seg'
+INDEX_SUFFIX = '.idx'
+INDEX_INTERVAL = 64
+SEGMENT_KIND_NUMERIC = 0
+SEGMENT_KIND_JSON = 1
+VALUE_TYPE_FLOAT = 0
+VALUE_TYPE_INT = 1
+
+HEADER_STRUCT = struct.Struct('<4sBBxxq')
+NUMERIC_FLOAT_STRUCT = struct.Struct('<qqBd')
+NUMERIC_INT_STRUCT = struct.Struct('<qqBq')
+NUMERIC_SIZE = NUMERIC_FLOAT_STRUCT.size
+VALUE_TYPE_OFFSET = 16
+TIMESTAMP_STRUCT = struct.Struct('<q')
+JSON_STRUCT = struct.Struct('<qI')
+INDEX_STRUCT = struct.Struct('<qQ')
+
+ID_FORMAT = "%Y%m%d%H%M%S%f"
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+INT64_MIN, INT64_MAX = -2 ** 63, 2 ** 63 - 1
+
+
+def stream_directory(root: str, data_key: str) -> str:
+    """
+    Returns the directory holding all segments of one data stream.
+
+    Parameters
+    ----------
+    root : str
+        The root directory of the recording.
+    data_key : str
+        The unique identifier for the data stream (e.g., 'line<:>test_stream').
+
+    Returns
+    -------
+    str
+        The path '<root>/<chart_type>/<quoted key_word>'.
+    """
+    chart_type, key_word = data_key.split('<:>', 1)
+    return os.path.join(root, quote(chart_type, safe=''), quote(key_word, safe=''))
+
+
+def stream_key_from_directory(root: str, directory: str) -> str:
+    """
+    Inverse of `stream_directory`, rebuilds the data key from a stream directory.
+
+    Parameters
+    ----------
+    root : str
+        The root directory of the recording.
+    directory : str
+        The stream directory under root.
+
+    Returns
+    -------
+    str
+        The data key, e.g. 'line<:>test_stream'.
+    """
+    chart_type, key_word = os.path.relpath(directory, root).split(os.sep, 1)
+    return f"{unquote(chart_type)}<:>{unquote(key_word)}"
+
+
+def _fixed_moment(data_payload: Dict[str, Any]) -> Union[int, None]:
+    """
+    Returns the payload's moment in microseconds since the naive epoch when its 'id' and
+    'timestamp' are exactly what `_numeric_payload` rebuilds from it, None otherwise.
+    """
+    if len(data_payload) != 3:
+        return None
+    timestamp = data_payload.get('timestamp')
+    try:
+        moment = datetime.fromisoformat(timestamp)
+    except (TypeError, ValueError):
+        return None
+    if moment.tzinfo is not None or moment.isoformat() != timestamp or moment.strftime(ID_FORMAT) != data_payload.get('id'):
+        return None
+    return (moment - EPOCH) // MICROSECOND
+
+
+def _layout(data_payload: Dict[str, Any]) -> Tuple[int, Union[int, None]]:
+    """
+    Returns the segment kind of a payload and, for the numeric kind, its moment.
+    Numeric streams (Line, Bar, Sequence) fed through `fresh` take the compact layout,
+    their value keeping its float or int type.
+    """
+    value = data_payload.get('value')
+    if type(value) is not float and not (type(value) is int and INT64_MIN <= value <= INT64_MAX):
+        return SEGMENT_KIND_JSON, None
+    moment_us = _fixed_moment(data_payload)
+    if moment_us is None:
+        return SEGMENT_KIND_JSON, None
+    return SEGMENT_KIND_NUMERIC, moment_us
+
+
+def _unpack_numeric(buffer: Any, offset: int) -> Tuple[int, int, Union[float, int]]:
+    """Returns timestamp_ns, moment_us and value of the numeric record at offset."""
+    record_struct = NUMERIC_INT_STRUCT if buffer[offset + VALUE_TYPE_OFFSET] == VALUE_TYPE_INT else NUMERIC_FLOAT_STRUCT
+    timestamp_ns, moment_us, _, value = record_struct.unpack_from(buffer, offset)
+    return timestamp_ns, moment_us, value
+
+
+class _Segment:
+    """An open, append-only segment file of a single data stream."""
+
+    def __init__(self, directory: str, kind: int, created_ns: int, buffer_size: int):
+        self.kind = kind
+        self.created_ns = created_ns
+        self.path = os.path.join(directory, f"{created_ns:020d}{SEGMENT_SUFFIX}")
+        self.file: IO[bytes] = open(self.path, 'ab', buffering=buffer_size)
+        self.file.write(HEADER_STRUCT.pack(SEGMENT_MAGIC, SEGMENT_VERSION, kind, created_ns))
+        self.size = HEADER_STRUCT.size
+        self.count = 0
+        self.index_file: Union[IO[bytes], None] = None
+        if kind == SEGMENT_KIND_JSON:
+            self.index_file = open(self.path[:-len(SEGMENT_SUFFIX)] + INDEX_SUFFIX, 'ab')
+
+    def append(self, timestamp_ns: int, data_payload: Dict[str, Any], moment_us: Union[int, None]=None):
+        if self.kind == SEGMENT_KIND_NUMERIC:
+            value = data_payload['value']
+            if type(value) is int:
+                self.file.write(NUMERIC_INT_STRUCT.pack(timestamp_ns, moment_us, VALUE_TYPE_INT, value))
+            else:
+                self.file.write(NUMERIC_FLOAT_STRUCT.pack(timestamp_ns, moment_us, VALUE_TYPE_FLOAT, value))
+            self.size += NUMERIC_SIZE
+        else:
+            raw = json.dumps(data_payload, separators=(',', ':')).encode('utf-8')
+            if self.count % INDEX_INTERVAL == 0:
+                self.index_file.write(INDEX_STRUCT.pack(timestamp_ns, self.size))
+            self.file.write(JSON_STRUCT.pack(timestamp_ns, len(raw)))
+            self.file.write(raw)
+            self.size += JSON_STRUCT.size + len(raw)
+        self.count += 1
+
+    def flush(self):
+        # The segment goes first, so an index entry never points past the flushed data
+        self.file.flush()
+        if self.index_file is not None:
+            self.index_file.flush()
+
+    def close(self):
+        self.file.close()
+        if self.index_file is not None:
+            self.index_file.close()
+
+
+class StreamRecorder:
+    """
+    Append-only recorder persisting every stream update into segmented files.
+
+    `record` only appends to an in-memory queue, so it is safe to call from the
+    event loop without adding latency to live delivery. A background writer
+    thread drains the queue in batches, writes one directory per stream and
+    rotates segments by size or age.
+    """
+
+    def __init__(self, root: str, max_segment_bytes: int=64 * 1024 * 1024, max_segment_seconds: float=3600.0, flush_interval: float=0.5, buffer_size: int=256 * 1024):
+        """
+        Initializes the recorder, nothing is written until `start` is called.
+
+        Parameters
+        ----------
+        root : str
+            The root directory of the recording. Created if missing.
+        max_segment_bytes : int, optional
+            A segment is rotated once it grows beyond this size. Defaults to 64 MiB.
+        max_segment_seconds : float, optional
+            A segment is rotated once it is older than this. Defaults to one hour.
+        flush_interval : float, optional
+            Interval (in seconds) at which the writer drains the queue and flushes files. Defaults to 0.5s.
+        buffer_size : int, optional
+            Write buffer size of each open segment. Defaults to 256 KiB.
+        """
+        self.root = os.path.abspath(root)
+        self.max_segment_bytes = int(max_segment_bytes)
+        self.max_segment_seconds = float(max_segment_seconds)
+        self.flush_interval = float(flush_interval)
+        self.buffer_size = int(buffer_size)
+
+        # Filled by the event loop, drained by the writer thread
+        self._queue: Deque[Tuple[int, str, Dict[str, Any]]] = deque()
+        self._segments: Dict[str, _Segment] = {}
+
+        self._stop_event = threading.Event()
+        self._writer_thread: threading.Thread = None
+
+    def record(self, data_key: str, data_payload: Dict[str, Any], timestamp_ns: Union[int, None]=None):
+        """
+        Queues one update for persistence. Never blocks and never touches the disk.
+
+        Parameters
+        ----------
+        data_key : str
+            The unique identifier for the data stream.
+        data_payload : Dict[str, Any]
+            The data payload dictionary containing 'id', 'timestamp', and 'value'.
+        timestamp_ns : Union[int, None], optional
+            Record time in epoch nanoseconds. Defaults to now.
+        """
+        self._queue.append((time.time_ns() if timestamp_ns is None else timestamp_ns, data_key, data_payload))
+
+    # Thread management
+
+    def start(self):
+        """Starts the background writer thread."""
+        if self._writer_thread is not None and self._writer_thread.is_alive():
+            return
+        os.makedirs(self.root, exist_ok=True)
+        self._stop_event.clear()
+        self._writer_thread = threading.Thread(target=self._run, daemon=True)
+        self._writer_thread.start()
+        logger.info(f"StreamRecorder writing to {self.root}")
+
+    def stop(self):
+        """Stops the writer thread after draining everything still queued."""
+        if self._writer_thread is None:
+            return
+        self._stop_event.set()
+        self._writer_thread.join(timeout=10)
+        if self._writer_thread.is_alive():
+            logger.warning("StreamRecorder writer did not terminate gracefully.")
+        self._writer_thread = None
+
+    def _run(self):
+        """Writer loop, wakes up every `flush_interval` and writes all pending records."""
+        try:
+            while not self._stop_event.wait(self.flush_interval):
+                self._write_pending()
+            self._write_pending()
+        except Exception as e:
+            logger.error(f"StreamRecorder writer error: {e}", exc_info=True)
+        finally:
+            for segment in self._segments.values():
+                segment.close()
+            self._segments.clear()
+
+    def _write_pending(self):
+        """Writes the queued records in one batch, then flushes touched segments once."""
+        touched = set()
+        while self._queue:
+            timestamp_ns, data_key, data_payload = self._queue.popleft()
+            try:
+                kind, moment_us = _layout(data_payload)
+                segment = self._segment_for(data_key, kind, timestamp_ns)
+                segment.append(timestamp_ns, data_payload, moment_us)
+                touched.add(segment)
+            except Exception as e:
+                logger.error(f"Failed to record update for {data_key}: {e}")
+        for segment in touched:
+            # A segment rotated within the batch was flushed when it was closed
+            if not segment.file.closed:
+                segment.flush()
+
+    def _segment_for(self, data_key: str, kind: int, timestamp_ns: int) -> _Segment:
+        """Returns the open segment for a stream, rotating it when it is full, too old, or of another kind."""
+        segment = self._segments.get(data_key)
+        if segment is not None:
+            if segment.kind == kind and segment.size < self.max_segment_bytes and timestamp_ns - segment.created_ns < self.max_segment_seconds * 1e9:
+                return segment
+            segment.close()
+
+        directory = stream_directory(self.root, data_key)
+        os.makedirs(directory, exist_ok=True)
+        # Segment names must stay unique and sorted even if the clock does not move
+        created_ns = timestamp_ns if segment is None else max(timestamp_ns, segment.created_ns + 1)
+        while os.path.exists(os.path.join(directory, f"{created_ns:020d}{SEGMENT_SUFFIX}")):
+            created_ns += 1
+        segment = _Segment(directory, kind, created_ns, self.buffer_size)
+        self._segments[data_key] = segment
+        return segment
+
+
+# Reading
+
+def list_recorded_streams(root: str) -> List[str]:
+    """
+    Lists all data keys found in a recording.
+
+    Parameters
+    ----------
+    root : str
+        The root directory of the recording.
+
+    Returns
+    -------
+    List[str]
+        Sorted data keys, e.g. ['line<:>test_stream', 'text<:>test'].
+    """
+    data_keys = []
+    if not os.path.isdir(root):
+        return data_keys
+    for chart_type in os.listdir(root):
+        chart_directory = os.path.join(root, chart_type)
+        if not os.path.isdir(chart_directory):
+            continue
+        for key_word in os.listdir(chart_directory):
+            directory = os.path.join(chart_directory, key_word)
+            if os.path.isdir(directory):
+                data_keys.append(stream_key_from_directory(root, directory))
+    return sorted(data_keys)
+
+
+def list_segments(root: str, data_key: str) -> List[str]:
+    """
+    Lists the segment files of one stream in chronological order.
+
+    Parameters
+    ----------
+    root : str
+        The root directory of the recording.
+    data_key : str
+        The unique identifier for the data stream.
+
+    Returns
+    -------
+    List[str]
+        Paths of the segment files, oldest first.
+    """
+    directory = stream_directory(root, data_key)
+    if not os.path.isdir(directory):
+        return []
+    # Names are zero padded creation times, so lexical order is chronological order
+    return [os.path.join(directory, name) for name in sorted(os.listdir(directory)) if name.endswith(SEGMENT_SUFFIX)]
+
+
+def _numeric_payload(moment_us: int, value: Union[float, int]) -> Dict[str, Any]:
+    """Rebuilds the payload of a numeric record, as `DataStream.fresh` built it."""
+    moment = EPOCH + moment_us * MICROSECOND
+    return {
+        "id": moment.strftime(ID_FORMAT),
+        "timestamp": moment.isoformat(),
+        "value": value
+    }
+
+
+def read_segment(path: str) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """
+    Reads all records of one segment file through a read-only memory map.
+    A trailing record cut short by a crash or an unflushed buffer is ignored.
+
+    Parameters
+    ----------
+    path : str
+        The segment file path.
+
+    Yields
+    ------
+    Tuple[int, Dict[str, Any]]
+        The record timestamp in epoch nanoseconds and the data payload.
+    """
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < HEADER_STRUCT.size:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            magic, version, kind, created_ns = HEADER_STRUCT.unpack_from(mapped, 0)
+            if magic != SEGMENT_MAGIC or version != SEGMENT_VERSION:
+                logger.error(f"Not a stream segment, skipped: {path}")
+                return
+
+            offset = HEADER_STRUCT.size
+            if kind == SEGMENT_KIND_NUMERIC:
+                end = offset + (size - offset) // NUMERIC_SIZE * NUMERIC_SIZE
+                for record_offset in range(offset, end, NUMERIC_SIZE):
+                    timestamp_ns, moment_us, value = _unpack_numeric(mapped, record_offset)
+                    yield timestamp_ns, _numeric_payload(moment_us, value)
+            else:
+                while offset + JSON_STRUCT.size <= size:
+                    timestamp_ns, length = JSON_STRUCT.unpack_from(mapped, offset)
+                    offset += JSON_STRUCT.size
+                    if offset + length > size:
+                        break
+                    yield timestamp_ns, json.loads(mapped[offset:offset + length])
+                    offset += length
+
+
+def read_stream(root: str, data_key: str) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """
+    Reads all records of one stream across its segments, oldest first.
+
+    Parameters
+    ----------
+    root : str
+        The root directory of the recording.
+    data_key : str
+        The unique identifier for the data stream.
+
+    Yields
+    ------
+    Tuple[int, Dict[str, Any]]
+        The record timestamp in epoch nanoseconds and the data payload.
+    """
+    for path in list_segments(root, data_key):
+        yield from read_segment(path)
+
+
+def _bisect_numeric(mapped: mmap.mmap, count: int, timestamp_ns: int) -> int:
+    """Returns the index of the first numeric record not older than timestamp_ns."""
+    lo, hi = 0, count
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if TIMESTAMP_STRUCT.unpack_from(mapped, HEADER_STRUCT.size + mid * NUMERIC_SIZE)[0] < timestamp_ns:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+def _read_index(path: str) -> Tuple[List[int], List[int]]:
+    """Loads the sparse index of a JSON segment, returns parallel lists of timestamps and offsets."""
+    index_path = path[:-len(SEGMENT_SUFFIX)] + INDEX_SUFFIX
+    if not os.path.exists(index_path):
+        return [], []
+    with open(index_path, 'rb') as f:
+        raw = f.read()
+    entries = list(INDEX_STRUCT.iter_unpack(raw[:len(raw) // INDEX_STRUCT.size * INDEX_STRUCT.size]))
+    return [entry[0] for entry in entries], [entry[1] for entry in entries]
+
+
+def read_segment_range(path: str, start_ns: int, end_ns: int) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """
+    Reads the records of one segment whose timestamps fall in [start_ns, end_ns].
+    Numeric segments are binary searched in place, JSON segments start scanning 
+    from the closest sparse index entry, so a lookup never reads the whole file.
+
+    Parameters
+    ----------
+    path : str
+        The segment file path.
+    start_ns : int
+        Range start in epoch nanoseconds (inclusive).
+    end_ns : int
+        Range end in epoch nanoseconds (inclusive).
+
+    Yields
+    ------
+    Tuple[int, Dict[str, Any]]
+        The record timestamp in epoch nanoseconds and the data payload.
+    """
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < HEADER_STRUCT.size:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            magic, version, kind, created_ns = HEADER_STRUCT.unpack_from(mapped, 0)
+            if magic != SEGMENT_MAGIC or version != SEGMENT_VERSION:
+                logger.error(f"Not a stream segment, skipped: {path}")
+                return
+
+            if kind == SEGMENT_KIND_NUMERIC:
+                count = (size - HEADER_STRUCT.size) // NUMERIC_SIZE
+                for i in range(_bisect_numeric(mapped, count, start_ns), count):
+                    timestamp_ns, moment_us, value = _unpack_numeric(mapped, HEADER_STRUCT.size + i * NUMERIC_SIZE)
+                    if timestamp_ns > end_ns:
+                        break
+                    yield timestamp_ns, _numeric_payload(moment_us, value)
+            else:
+                timestamps, offsets = _read_index(path)
+                position = bisect.bisect_right(timestamps, start_ns) - 1
+                offset = offsets[position] if position >= 0 else HEADER_STRUCT.size
+                while offset + JSON_STRUCT.size <= size:
+                    timestamp_ns, length = JSON_STRUCT.unpack_from(mapped, offset)
+                    offset += JSON_STRUCT.size
+                    if timestamp_ns > end_ns or offset + length > size:
+                        break
+                    if timestamp_ns >= start_ns:
+                        yield timestamp_ns, json.loads(mapped[offset:offset + length])
+                    offset += length
+
+
+def read_stream_range(root: str, data_key: str, start_ns: int, end_ns: int) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """
+    Reads the records of one stream whose timestamps fall in [start_ns, end_ns], 
+    opening only the segments overlapping the range.
+
+    Parameters
+    ----------
+    root : str
+        The root directory of the recording.
+    data_key : str
+        The unique identifier for the data stream.
+    start_ns : int
+        Range start in epoch nanoseconds (inclusive).
+    end_ns : int
+        Range end in epoch nanoseconds (inclusive).
+
+    Yields
+    ------
+    Tuple[int, Dict[str, Any]]
+        The record timestamp in epoch nanoseconds and the data payload.
+    """
+    paths = list_segments(root, data_key)
+    created = [int(os.path.basename(path)[:-len(SEGMENT_SUFFIX)]) for path in paths]
+    # The segment created last before start_ns may still hold records of the range
+    first = max(bisect.bisect_right(created, start_ns) - 1, 0)
+    for path, created_ns in zip(paths[first:], created[first:]):
+        if created_ns > end_ns:
+            break
+        yield from read_segment_range(path, start_ns, end_ns)
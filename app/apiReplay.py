@@ -0,0 +1,132 @@
+import heapq
+import logging
+from typing import Union, Optional, Dict, Any, List, Iterator, Tuple
+from .api import *
+from .api import DataStream
+from .apiRecord import list_recorded_streams, read_stream
+from .apiClock import get_clock
+
+logger = logging.getLogger(__name__)
+
+CHART_CLASSES = {
+    'sequence': Sequence,
+    'line': Line,
+    'bar': Bar,
+    'sequences': Sequences,
+    'lines': Lines,
+    'bars': Bars,
+    'scatter': Scatter,
+    'area': Area,
+    'areas': Areas,
+    'pie': Pie,
+    'radar': Radar,
+    'surface': Surface,
+    'text': Text,
+    'gauge': Gauge,
+}
+
+def replay_streams(root: str, data_keys: Optional[List[str]]=None, key_word_prefix: str='') -> Dict[str, DataStream]:
+    """
+    Creates one chart object for every recorded stream that should be replayed.
+
+    Parameters
+    ----------
+    root : str
+        The root directory of the recording.
+    data_keys : Optional[List[str]], optional
+        Only replay these data keys. Defaults to every stream in the recording.
+    key_word_prefix : str, optional
+        Prepended to the key word of every replayed stream, so replayed data does not
+        collide with live streams of the same name. Defaults to '' (original names).
+
+    Returns
+    -------
+    Dict[str, DataStream]
+        The chart objects by recorded data key.
+
+    Note: The API Server must be initialized and running before calling this function.
+    """
+    streams = {}
+    for data_key in (list_recorded_streams(root) if data_keys is None else data_keys):
+        chart_type, key_word = data_key.split('<:>', 1)
+        if chart_type not in CHART_CLASSES:
+            logger.warning(f"Unknown chart type in recording, skipped: {data_key}")
+            continue
+        streams[data_key] = CHART_CLASSES[chart_type](key_word_prefix + key_word)
+    return streams
+
+def replay_records(root: str, data_keys: List[str]) -> Iterator[Tuple[int, str, Dict[str, Any]]]:
+    """
+    Merges the records of several streams into one iterator ordered by record time.
+
+    Parameters
+    ----------
+    root : str
+        The root directory of the recording.
+    data_keys : List[str]
+        The data keys to merge.
+
+    Yields
+    ------
+    Tuple[int, str, Dict[str, Any]]
+        Record timestamp in epoch nanoseconds, data key and data payload.
+    """
+    def tagged(data_key):
+        for timestamp_ns, data_payload in read_stream(root, data_key):
+            yield timestamp_ns, data_key, data_payload
+    # Segments of each stream are already sorted, a k-way merge keeps the memory flat
+    return heapq.merge(*[tagged(data_key) for data_key in data_keys], key=lambda record: record[0])
+
+def replay(root: str, speed: Union[float, None]=1.0, data_keys: Optional[List[str]]=None, key_word_prefix: str='', start: Optional[float]=None, end: Optional[float]=None):
+    """
+    Republishes a recorded session through the normal `DataStream` path, keeping
+    the original inter-arrival timing scaled by `speed`.
+
+    Parameters
+    ----------
+    root : str
+        The root directory of the recording.
+    speed : Union[float, None], optional
+        Replay speed: 1.0 is real time, 10.0 is ten times faster. None or 0
+        replays as fast as possible. Defaults to 1.0.
+    data_keys : Optional[List[str]], optional
+        Only replay these data keys. Defaults to every stream in the recording.
+    key_word_prefix : str, optional
+        Prepended to the key word of every replayed stream. Defaults to ''.
+    start : Optional[float], optional
+        Skip records before this epoch time (in seconds).
+    end : Optional[float], optional
+        Stop at records after this epoch time (in seconds).
+
+    Returns
+    -------
+    int
+        The number of replayed updates.
+
+    Note: The API Server must be initialized and running before calling this function.
+    """
+    streams = replay_streams(root, data_keys, key_word_prefix)
+    start_ns = None if start is None else int(start * 1e9)
+    end_ns = None if end is None else int(end * 1e9)
+
+    count = 0
+    first_ns = None
+    clock = get_clock()
+    wall_start = clock.monotonic()
+    for timestamp_ns, data_key, data_payload in replay_records(root, list(streams)):
+        if start_ns is not None and timestamp_ns < start_ns:
+            continue
+        if end_ns is not None and timestamp_ns > end_ns:
+            break
+        if first_ns is None:
+            first_ns = timestamp_ns
+        if speed:
+            # Sleep against the replay start rather than the previous record, so delays do not accumulate
+            delay = (timestamp_ns - first_ns) / 1e9 / speed - (clock.monotonic() - wall_start)
+            if delay > 0:
+                clock.sleep(delay)
+        streams[data_key].update(data_payload)
+        count += 1
+
+    logger.info(f"Replayed {count} updates of {len(streams)} streams in {clock.monotonic() - wall_start:.3f}s.")
+    return count
@@ -0,0 +1,239 @@
+import heapq
+import logging
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Union, Dict, Any, List, Tuple, Callable, Optional
+from .apiClock import Clock, VirtualClock, get_clock
+
+logger = logging.getLogger(__name__)
+
+
+class Job:
+    """A scheduled call, returned by `Scheduler.every` and `Scheduler.call_later`; `cancel` stops it."""
+
+    def __init__(self, interval: Union[float, None], func: Callable, args: tuple, kwargs: Dict[str, Any], stream: Any=None, process: bool=False, times: Union[int, None]=None):
+        self.interval = interval
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.stream = stream
+        self.process = process
+        self.remaining = times
+        self.due = 0.0 # In clock.monotonic() seconds
+        self.runs = 0
+        self.skipped = 0 # Periods missed because the previous run was still going
+        self.cancelled = False
+        self.running = False
+
+    def cancel(self):
+        """Stops future runs, a run in progress completes."""
+        self.cancelled = True
+
+    @property
+    def active(self) -> bool:
+        """True while further runs are pending."""
+        return not self.cancelled and self.remaining != 0
+
+
+class Scheduler:
+    """
+    Runs periodic producers on one timer thread and a bounded worker pool, so the
+    number of threads does not grow with the number of streams. Periodic jobs are
+    fixed-rate against their first due time and never overlap: a period missed while
+    the previous run is still going is skipped and counted.
+
+    CPU-heavy jobs can run in a process pool instead, their return value is then
+    published from this process.
+
+    Under a `VirtualClock` the timer thread is a producer of the clock and runs every
+    job inline, in due order, so runs stay deterministic.
+    """
+
+    def __init__(self, workers: int=8, processes: Optional[int]=None, clock: Optional[Clock]=None):
+        """
+        Parameters
+        ----------
+        workers : int, optional
+            The size of the thread pool running jobs. Defaults to 8.
+        processes : Optional[int], optional
+            The size of the process pool, created on the first process job.
+            Defaults to None (one per CPU).
+        clock : Optional[Clock], optional
+            The clock jobs are timed with. Defaults to the package clock when the scheduler starts.
+        """
+        self.workers = workers
+        self.processes = processes
+        self.clock = clock
+        self._condition = threading.Condition()
+        self._timers: List[Tuple[float, int, Job]] = [] # Heap of (due, seq, job)
+        self._seq = itertools.count()
+        self._thread: Union[threading.Thread, None] = None
+        self._pool: Union[ThreadPoolExecutor, None] = None
+        self._process_pool: Union[ProcessPoolExecutor, None] = None
+        self._is_running = False
+
+    # Scheduling
+
+    def every(self, interval: float, func: Callable, *args, stream: Any=None, process: bool=False, times: Optional[int]=None, delay: float=0.0, **kwargs) -> Job:
+        """
+        Calls `func(*args, **kwargs)` every `interval` seconds.
+
+        Parameters
+        ----------
+        interval : float
+            Seconds between the starts of two runs.
+        func : Callable
+            The producer. With `stream`, a return value other than None is published by `stream.fresh`.
+        stream : Any, optional
+            The DataStream the return values are published to. Defaults to None.
+        process : bool, optional
+            Run in the process pool; func, its arguments and its return value must be picklable. Defaults to False.
+        times : Optional[int], optional
+            Stop after this many runs. Defaults to None (until cancelled).
+        delay : float, optional
+            Seconds before the first run. Defaults to 0 (immediately).
+
+        Returns
+        -------
+        Job
+            The job handle.
+        """
+        if interval <= 0:
+            raise ValueError(f"Interval must be positive, got {interval}.")
+        job = Job(interval, func, args, kwargs, stream=stream, process=process, times=times)
+        self._add(job, delay)
+        return job
+
+    def call_later(self, delay: float, func: Callable, *args, stream: Any=None, process: bool=False, **kwargs) -> Job:
+        """Calls `func(*args, **kwargs)` once after `delay` seconds, see `every`."""
+        job = Job(None, func, args, kwargs, stream=stream, process=process, times=1)
+        self._add(job, delay)
+        return job
+
+    def submit(self, func: Callable, *args, **kwargs):
+        """
+        Runs `func(*args, **kwargs)` once on the worker pool as soon as a worker is free.
+
+        Returns
+        -------
+        concurrent.futures.Future
+            The future of the call.
+        """
+        self.start()
+        return self._pool.submit(func, *args, **kwargs)
+
+    def _add(self, job: Job, delay: float):
+        self.start()
+        with self._condition:
+            job.due = self.clock.monotonic() + delay
+            heapq.heappush(self._timers, (job.due, next(self._seq), job))
+            self._condition.notify_all()
+
+    # Thread management
+
+    def start(self):
+        """Starts the timer thread and the worker pool, called on the first job."""
+        with self._condition:
+            if self._is_running:
+                return
+            self._is_running = True
+            if self.clock is None:
+                self.clock = get_clock()
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='sdp-scheduler')
+            self._thread = self.clock.start_thread(target=self._run_timer, daemon=True)
+
+    def stop(self, wait: bool=True):
+        """Cancels every job and shuts the pools down."""
+        with self._condition:
+            if not self._is_running:
+                return
+            self._is_running = False
+            for _, _, job in self._timers:
+                job.cancel()
+            self._timers.clear()
+            self._condition.notify_all()
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait)
+        with self._condition:
+            process_pool, self._process_pool = self._process_pool, None
+        if process_pool is not None:
+            process_pool.shutdown(wait=wait)
+
+    def _get_process_pool(self) -> ProcessPoolExecutor:
+        """Returns the process pool, created on the first process job so workers that never need it spawn nothing."""
+        with self._condition:
+            if self._process_pool is None:
+                self._process_pool = ProcessPoolExecutor(max_workers=self.processes)
+            return self._process_pool
+
+    def _run_timer(self):
+        virtual = isinstance(self.clock, VirtualClock)
+        while True:
+            with self._condition:
+                if not self._is_running:
+                    return
+                if not self._timers:
+                    # Nothing to time, let a virtual clock move on without us
+                    self.clock.detach()
+                    self._condition.wait_for(lambda: self._timers or not self._is_running)
+                    self._condition.release()
+                    try:
+                        self.clock.attach()
+                    finally:
+                        self._condition.acquire()
+                    continue
+                due, _, job = self._timers[0]
+                delay = due - self.clock.monotonic()
+                if delay > 0 and not virtual:
+                    self._condition.wait(delay) # Woken early when an earlier job is added
+                    continue
+                if delay <= 0:
+                    heapq.heappop(self._timers)
+            if delay > 0:
+                self.clock.sleep(delay)
+            elif job.cancelled:
+                continue
+            elif virtual:
+                self._run_job(job)
+            else:
+                self._pool.submit(self._run_job, job)
+
+    def _run_job(self, job: Job):
+        job.running = True
+        try:
+            if job.process:
+                value = self._get_process_pool().submit(job.func, *job.args, **job.kwargs).result()
+            else:
+                value = job.func(*job.args, **job.kwargs)
+            if job.stream is not None and value is not None:
+                job.stream.fresh(value)
+        except Exception as e:
+            logger.error(f"Scheduled job {getattr(job.func, '__name__', job.func)} failed: {e}")
+        finally:
+            job.running = False
+            job.runs += 1
+            if job.remaining is not None:
+                job.remaining -= 1
+            self._reschedule(job)
+
+    def _reschedule(self, job: Job):
+        if job.interval is None or not job.active:
+            return
+        with self._condition:
+            if not self._is_running:
+                return
+            job.due += job.interval
+            now = self.clock.monotonic()
+            if job.due < now:
+                # Keep the phase, skip the periods the last run overran
+                missed = int((now - job.due) // job.interval) + 1
+                job.due += missed * job.interval
+                job.skipped += missed
+            heapq.heappush(self._timers, (job.due, next(self._seq), job))
+            self._condition.notify_all()
+
+    def jobs(self) -> List[Job]:
+        """Returns the jobs waiting for their next run."""
+        with self._condition:
+            return [job for _, _, job in self._timers if not job.cancelled]
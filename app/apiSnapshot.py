@@ -0,0 +1,172 @@
+import os
+import json
+import mmap
+import time
+import struct
+import logging
+from typing import Union, Dict, Any, Iterable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Snapshot layout
+#   header : magic(4s) version(B) padding(3x) count(I) created_ns(q)                       -> 20 bytes
+#   index  : count x [payload_offset(Q) payload_length(I) key_length(I) key(utf-8)]
+#   blobs  : compact utf-8 json payloads, addressed by the index
+# A key registered without any cached payload has payload_length 0.
+SNAPSHOT_MAGIC = b'SDPS'
+SNAPSHOT_VERSION = 1
+
+HEADER_STRUCT = struct.Struct('<4sBxxxIq')
+ENTRY_STRUCT = struct.Struct('<QII')
+
+
+def write_snapshot(path: str, cache: Dict[str, Dict[str, Any]], valid_keys: Iterable[str]) -> int:
+    """
+    Writes the stream cache into a snapshot file. The file is written next to its
+    destination and moved into place, so a crash never leaves a truncated snapshot.
+
+    Parameters
+    ----------
+    path : str
+        The snapshot file path.
+    cache : Dict[str, Dict[str, Any]]
+        The latest data payload by data key.
+    valid_keys : Iterable[str]
+        All registered data keys, including the ones without cached data.
+
+    Returns
+    -------
+    int
+        The number of keys written.
+    """
+    keys = []
+    blobs = []
+    for data_key in sorted(set(valid_keys) | set(cache)):
+        data_payload = cache.get(data_key)
+        try:
+            blob = b'' if data_payload is None else json.dumps(data_payload, separators=(',', ':')).encode('utf-8')
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Cached data of {data_key} is not serializable, skipped in snapshot: {e}")
+            blob = b''
+        keys.append(data_key.encode('utf-8'))
+        blobs.append(blob)
+
+    offset = HEADER_STRUCT.size + sum(ENTRY_STRUCT.size + len(key) for key in keys)
+    index = bytearray()
+    for key, blob in zip(keys, blobs):
+        index += ENTRY_STRUCT.pack(offset, len(blob), len(key))
+        index += key
+        offset += len(blob)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    path_temp = path + '.tmp'
+    with open(path_temp, 'wb') as f:
+        f.write(HEADER_STRUCT.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(keys), time.time_ns()))
+        f.write(index)
+        for blob in blobs:
+            f.write(blob)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path_temp, path)
+    return len(keys)
+
+
+class SnapshotReader:
+    """
+    Read-only view of a snapshot file. Only the index is parsed when opened,
+    each payload is decoded from the memory map on first access.
+    """
+
+    def __init__(self, path: str):
+        """
+        Opens and maps a snapshot file.
+
+        Parameters
+        ----------
+        path : str
+            The snapshot file path.
+
+        Raises
+        ------
+        ValueError
+            If the file is not a snapshot of a supported version.
+        """
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._mapped = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"Empty snapshot file: {path}")
+
+        magic, version, count, self.created_ns = HEADER_STRUCT.unpack_from(self._mapped, 0)
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            self.close()
+            raise ValueError(f"Not a snapshot file: {path}")
+
+        self._index: Dict[str, Tuple[int, int]] = {}
+        position = HEADER_STRUCT.size
+        for _ in range(count):
+            offset, length, key_length = ENTRY_STRUCT.unpack_from(self._mapped, position)
+            position += ENTRY_STRUCT.size
+            data_key = self._mapped[position:position + key_length].decode('utf-8')
+            position += key_length
+            self._index[data_key] = (offset, length)
+
+    def keys(self) -> List[str]:
+        """Returns every data key held by the snapshot."""
+        return list(self._index)
+
+    def get(self, data_key: str) -> Union[Dict[str, Any], None]:
+        """
+        Decodes the cached payload of one key.
+
+        Parameters
+        ----------
+        data_key : str
+            The unique identifier for the data stream.
+
+        Returns
+        -------
+        Union[Dict[str, Any], None]
+            The data payload, or None if the key has no cached data.
+        """
+        offset, length = self._index.get(data_key, (0, 0))
+        if not length or self._mapped is None:
+            return None
+        return json.loads(self._mapped[offset:offset + length])
+
+    def discard(self, data_key: str):
+        """Forgets a key whose payload is superseded, `get` returns None for it from now on."""
+        self._index.pop(data_key, None)
+
+    def close(self):
+        """Releases the memory map and the file."""
+        if self._mapped is not None:
+            self._mapped.close()
+            self._mapped = None
+        self._file.close()
+
+
+def open_snapshot(path: str) -> Union[SnapshotReader, None]:
+    """
+    Opens a snapshot if one exists and is readable.
+
+    Parameters
+    ----------
+    path : str
+        The snapshot file path.
+
+    Returns
+    -------
+    Union[SnapshotReader, None]
+        The reader, or None if there is no usable snapshot.
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        return SnapshotReader(path)
+    except (ValueError, struct.error, OSError) as e:
+        logger.error(f"Failed to open snapshot {path}: {e}")
+        return None
@@ -1,10 +1,10 @@
 import sys, os
 import math
 import json
-import time
 import random
 from datetime import datetime
 from .api import *
+from .apiClock import get_clock
 
 def generate_data(chart_type: str):
     """
@@ -76,25 +76,35 @@ def simulate(chart, chart_type, num=20000, freq=0.1):
         The total number of data points to generate. Defaults to 20000.
     freq : float, optional
         The time interval (in seconds) between data pushes. Defaults to 0.1s.
+        Paced by the package clock, so it runs in virtual time under a `VirtualClock`.
     """
     for i in range(num):
         data = generate_data(chart_type)
         chart.fresh(data)
-        time.sleep(freq)
+        get_clock().sleep(freq)
 
-def simulate_all():
+def simulate_all(seed: int=None):
     """
     Initializes one instance of every available chart type with the keyword 
-    'test' and starts a data simulation thread for each.
+    'test' and publishes generated data to each every 0.1s from the shared scheduler.
+
+    Parameters
+    ----------
+    seed : int, optional
+        Seeds the generated data. Together with a `VirtualClock`, runs are reproducible.
 
     Note: The API Server must be initialized and running before calling this function.
     """
+    if seed is not None:
+        random.seed(seed)
     chart_obj_list = [Sequence, Line, Bar, Sequences, Lines, Bars, Scatter, Area, Areas, Pie, Radar, Surface, Text, Gauge]
     key_word_list = ['test' for _ in chart_obj_list]
     chart_type_list = ['sequence', 'line', 'bar', 'sequences', 'lines', 'bars', 'scatter', 'area', 'areas', 'pie', 'radar', 'surface', 'text', 'gauge']
 
-    for chart_obj, key_word, chart_type in zip(chart_obj_list, key_word_list, chart_type_list):
-        obj = chart_obj(key_word)
-        obj.execute(simulate, chart_type)
+    # Under a VirtualClock every simulation starts at the same virtual instant
+    with get_clock().hold():
+        for chart_obj, key_word, chart_type in zip(chart_obj_list, key_word_list, chart_type_list):
+            obj = chart_obj(key_word)
+            obj.every(0.1, generate_data, chart_type, times=20000)
 
 
@@ -0,0 +1,187 @@
+import math
+import itertools
+from array import array
+from typing import Union, Dict, Any, List, Tuple, Callable
+
+try:
+    import numpy as np
+except ImportError: # Numbers are checked through the array module without NumPy
+    np = None
+
+# Parts with fewer numbers are checked through `array`, faster than the NumPy call overhead
+NUMPY_MIN_SIZE = 256
+
+# How the numeric contents of payloads are checked: never, every `sample_every`-th update, or every update
+VALIDATION_MODES = ('off', 'sampled', 'full')
+
+# Numeric parts of the payload value by chart type, as (index in the value, expected shape). A dimension
+# of the shape is a fixed size, ('len', i) for the length of value[i], or ('prod', i) for the product
+# of the numbers in value[i]. Chart types without lists of numbers are fully checked by their validator.
+NUMERIC_SCHEMAS: Dict[str, Tuple[Tuple[int, Tuple[Any, ...]], ...]] = {
+    'lines': ((1, (('len', 0),)),),
+    'bars': ((1, (('len', 0),)),),
+    'sequences': ((1, (('len', 0),)),),
+    'area': ((1, (('len', 0),)),),
+    'pie': ((1, (('len', 0),)),),
+    'areas': ((2, (('len', 1), ('len', 0))),),
+    'radar': ((1, (('len', 0),)), (2, (('len', 0),))),
+    'surface': ((1, (2,)), (2, (('prod', 1), 3))),
+    'gauge': ((1, (2,)),),
+}
+
+
+def _compile_dimension(dimension: Any) -> Callable[[List[Any]], int]:
+    """Turns a shape dimension of NUMERIC_SCHEMAS into a function of the payload value."""
+    if isinstance(dimension, int):
+        return lambda value: dimension
+    kind, index = dimension
+    if kind == 'len':
+        return lambda value: len(value[index])
+    if kind == 'prod':
+        return lambda value: math.prod(value[index])
+    raise ValueError(f"Unknown schema dimension {dimension}.")
+
+
+def is_numeric_array(values: Any, shape: Tuple[int, ...]) -> bool:
+    """
+    Checks in one vectorized pass that nested lists hold finite numbers only, in the given
+    shape. Uses NumPy for large parts when installed, else a C-level conversion into an `array`.
+
+    Parameters
+    ----------
+    values : Any
+        A list of numbers, or a list of lists of numbers.
+    shape : Tuple[int, ...]
+        The expected shape, one or two dimensions.
+
+    Returns
+    -------
+    bool
+        True if the values are finite numbers of that shape.
+    """
+    if np is not None and math.prod(shape) >= NUMPY_MIN_SIZE:
+        try:
+            converted = np.asarray(values)
+        except (ValueError, TypeError): # Ragged nesting
+            return False
+        if converted.shape != shape or converted.dtype.kind not in 'biuf':
+            return False
+        return converted.dtype.kind != 'f' or bool(np.isfinite(converted).all())
+
+    if not isinstance(values, list) or len(values) != shape[0]:
+        return False
+    if len(shape) == 2:
+        if not all(isinstance(row, list) and len(row) == shape[1] for row in values):
+            return False
+        values = itertools.chain.from_iterable(values)
+    try:
+        converted = array('d', values)
+    except (TypeError, OverflowError):
+        return False
+    # A single NaN or infinity makes the sum non-finite, so does an overflow of huge values
+    return math.isfinite(sum(converted))
+
+
+class Schema:
+    """
+    The numeric schema of one chart type, compiled from NUMERIC_SCHEMAS into the parts of
+    the payload value to check and functions computing their expected shape.
+    """
+
+    __slots__ = ('chart_type', '_parts')
+
+    def __init__(self, chart_type: str):
+        """
+        Parameters
+        ----------
+        chart_type : str
+            The chart type, e.g. 'surface'.
+        """
+        self.chart_type = chart_type
+        self._parts = tuple(
+            (index, tuple(_compile_dimension(dimension) for dimension in shape))
+            for index, shape in NUMERIC_SCHEMAS.get(chart_type, ())
+        )
+
+    def __bool__(self) -> bool:
+        return bool(self._parts)
+
+    def check(self, value: Any) -> bool:
+        """
+        Checks the numeric parts of a payload value whose structure passed the validator
+        of its chart type.
+
+        Parameters
+        ----------
+        value : Any
+            The 'value' field of the payload.
+
+        Returns
+        -------
+        bool
+            True if every numeric part holds finite numbers in its expected shape.
+        """
+        try:
+            for index, dimensions in self._parts:
+                if not is_numeric_array(value[index], tuple(dimension(value) for dimension in dimensions)):
+                    return False
+        except (TypeError, ValueError, IndexError, KeyError):
+            return False
+        return True
+
+
+_schemas: Dict[str, Schema] = {}
+
+
+def get_schema(chart_type: str) -> Schema:
+    """Returns the compiled schema of a chart type, compiled once and shared by all its streams."""
+    schema = _schemas.get(chart_type)
+    if schema is None:
+        schema = _schemas[chart_type] = Schema(chart_type)
+    return schema
+
+
+class Validator:
+    """
+    Checks the numeric contents of one stream's payloads in a validation mode. Sampling
+    counts updates per stream and always checks the first one, so a producer sending
+    malformed data is reported right away.
+    """
+
+    __slots__ = ('schema', 'mode', 'sample_every', '_count')
+
+    def __init__(self, chart_type: str, mode: str='full', sample_every: int=10):
+        """
+        Parameters
+        ----------
+        chart_type : str
+            The chart type of the stream.
+        mode : str, optional
+            One of VALIDATION_MODES. Defaults to 'full'.
+        sample_every : int, optional
+            Check one update in this many in 'sampled' mode. Defaults to 10.
+        """
+        self.schema = get_schema(chart_type)
+        self._count = 0
+        self.configure(mode, sample_every)
+
+    def configure(self, mode: str, sample_every: Union[int, None]=None):
+        """Changes the validation mode, and the sampling rate if given."""
+        if mode not in VALIDATION_MODES:
+            raise ValueError(f"Unknown validation mode '{mode}', expected one of {VALIDATION_MODES}.")
+        if sample_every is not None:
+            if sample_every < 1:
+                raise ValueError(f"Sampling rate must be at least 1, got {sample_every}.")
+            self.sample_every = int(sample_every)
+        self.mode = mode
+
+    def __call__(self, value: Any) -> bool:
+        """Returns False if the numeric contents of a payload value are checked and invalid."""
+        if self.mode == 'off' or not self.schema:
+            return True
+        if self.mode == 'sampled':
+            count = self._count
+            self._count = count + 1
+            if count % self.sample_every:
+                return True
+        return self.schema.check(value)
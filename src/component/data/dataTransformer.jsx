@@ -1,5 +1,17 @@
 // /src/component/data/dataTransformer.jsx
 
+/**
+ * Divides every number of a value sent as scaled integers, strings are kept.
+ * * @param {*} value - the payload value
+ * * @param {number} scale - the factor the numbers were multiplied by
+ * * @returns {*} - the value with its original numbers
+ */
+const descaleValue = (value, scale) => {
+  if (typeof value === 'number') return value / scale;
+  if (Array.isArray(value)) return value.map(item => descaleValue(item, scale));
+  return value;
+};
+
 /**
  * * @param {Object} rawData - raw data obj from websocket
  * * @returns {Object} - converted data obj
@@ -14,7 +26,7 @@ const transformSinglePointData = (rawData) => {
   return {
     id: rawData.id || `data-${Date.now()}-${pointIndex}`,
     index: rawData.timestamp,
-    value: rawData.value,
+    value: rawData.scale ? descaleValue(rawData.value, rawData.scale) : rawData.value,
   };
 };
 
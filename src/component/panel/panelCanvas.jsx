@@ -1,12 +1,15 @@
 // src/component/panel/panelCanvas.jsx
 
 import { useState, useRef, useEffect, useCallback } from 'react';
-import { transformSinglePointData } from '../data/dataTransformer.jsx';
+import { transformSinglePointData, transformDataList } from '../data/dataTransformer.jsx';
 import * as ChartConst from '../chart/chartConst.jsx';
 import * as EelConst from '../eel/eelConst.jsx';
 
 const lowerString = (str) => str.trim().toLowerCase();
 
+// Server features this panel handles, announced with every subscription
+const CLIENT_FEATURES = ['trace', 'batch', 'resume'];
+
 
 /* WebSocket connection and timer cleanup logic upon component unmount */
 const useWsCleanupEffect = (wsConnections, updateTimeout, subscriptionTimer, chartRefs, chartData) => {
@@ -108,11 +111,15 @@ const usePanelCore = (isImporting, chartStates) => {
         const globalUpdateChart = ChartConst.GLOBAL_UPDATE_CHART;
 
         const onMessage = (ws) => (event) => {
+            const receivedAt = performance.now();
             const message = JSON.parse(event.data);
 
             if (message.status) {
                 // Subscription status message (success/failure)
-                if (message.status === 'success') {
+                if (message.status === 'success' && chartData.current.has(newId)) {
+                    // Resumed after a server restart, the chart already exists
+                    wsConnections.current.set(newId, ws);
+                } else if (message.status === 'success') {
                     const newChart = { id: newId, chartType, keyWord };
                     
                     chartData.current.set(newId, []); // Initialize data array
@@ -142,6 +149,28 @@ const usePanelCore = (isImporting, chartStates) => {
                 } else if (message.status === 'failure') {
                     handleSubscriptionStatus('failure');
                     ws.close(); // Close connection on subscription failure
+                } else if (message.status === 'reconnect') {
+                    // Server is restarting, resume this chart on the announced address
+                    const resumedWs = new WebSocket(message.url);
+                    resumedWs.onopen = () => {
+                        resumedWs.send(JSON.stringify({ chart_type: chartType, key_word: keyWord, resume_token: message.resume_token, features: CLIENT_FEATURES }));
+                    };
+                    resumedWs.onmessage = onMessage(resumedWs);
+                    resumedWs.onclose = () => { console.log(`[WS Close] ID: ${newId}`); };
+                    resumedWs.onerror = (e) => onError(e, resumedWs);
+                    // The old connection is released once the new one took over
+                    resumedWs.addEventListener('message', () => ws.close(), { once: true });
+                } else if (message.status === 'batch') {
+                    // History back-filled in bulk, appended like as many data messages
+                    const currentData = chartData.current.get(newId);
+                    if (currentData && chartStatesRef.current[newId] !== 'on') {
+                        const newData = [...currentData, ...transformDataList(message.data)].slice(-100);
+                        chartData.current.set(newId, newData);
+                        triggerRender();
+                    }
+                } else if (message.status === 'closed' || message.status === 'evicted') {
+                    // Stream closed or expired (the server disconnects), or its cached data was evicted
+                    console.warn(`[WS ${message.status}] ID: ${newId} - ${message.message}`);
                 }
             } else {
                 // Real-time data message
@@ -167,6 +196,14 @@ const usePanelCore = (isImporting, chartStates) => {
                         }
                     }
                 }
+                if (message.trace !== undefined) {
+                    // Traced update: echo the receive-to-render time once the next frame is painted
+                    requestAnimationFrame(() => {
+                        if (ws.readyState === WebSocket.OPEN) {
+                            ws.send(JSON.stringify({ action: 'trace', trace: message.trace, render_ms: performance.now() - receivedAt }));
+                        }
+                    });
+                }
             }
         };
 
@@ -209,7 +246,7 @@ const usePanelCore = (isImporting, chartStates) => {
 
             // Bind events
             ws.onopen = () => {
-                const subscriptionMessage = { chart_type: chartType, key_word: keyWord, };
+                const subscriptionMessage = { chart_type: chartType, key_word: keyWord, features: CLIENT_FEATURES };
                 // Send subscription request
                 ws.send(JSON.stringify(subscriptionMessage)); 
             };
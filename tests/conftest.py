@@ -0,0 +1,65 @@
+import json
+import time
+import socket
+import asyncio
+import pytest
+import websockets
+from app.apiCore import WebsocketManager
+
+ROUTE = '/data'
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(condition, timeout: float=5.0):
+    """Polls condition until it holds, the manager processes updates on its own thread."""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("Condition not met in time.")
+        time.sleep(0.01)
+
+
+def cached_value(manager: WebsocketManager, data_key: str):
+    data_payload = manager.get_cached_data_sync(data_key)
+    return None if data_payload is None else data_payload['value']
+
+
+async def subscribe(manager: WebsocketManager, chart_type: str, key_word: str, **fields):
+    """Connects and subscribes, returns the connection and the parsed response."""
+    websocket = await websockets.connect(f"ws://127.0.0.1:{manager.port}{ROUTE}")
+    await websocket.send(json.dumps({"chart_type": chart_type, "key_word": key_word, **fields}))
+    return websocket, json.loads(await websocket.recv())
+
+
+async def receive(websocket, timeout: float=5.0):
+    return json.loads(await asyncio.wait_for(websocket.recv(), timeout))
+
+
+@pytest.fixture
+def make_manager():
+    """Builds managers on free ports, stopped again after the test. Start them with `start=True`."""
+    managers = []
+
+    def make(start: bool=True, **kwargs) -> WebsocketManager:
+        kwargs.setdefault('diagnostics_interval', 0)
+        kwargs.setdefault('metrics_path', None)
+        manager = WebsocketManager('127.0.0.1', free_port(), ROUTE, **kwargs)
+        managers.append(manager)
+        if start:
+            manager.start_server_thread()
+            assert manager.wait_until_ready()
+        return manager
+
+    yield make
+    for manager in managers:
+        manager.stop_server_thread()
+
+
+@pytest.fixture
+def manager(make_manager) -> WebsocketManager:
+    return make_manager()
@@ -0,0 +1,112 @@
+import time
+import asyncio
+import websockets
+from app.apiCore import _make_payload
+from app.apiAdmission import RateLimiter
+from .conftest import ROUTE, subscribe, receive, wait_for
+
+
+def test_rate_limiter_allows_bursts_then_refills():
+    limiter = RateLimiter(rate=1000, burst=3)
+    assert [limiter.allow('a') for _ in range(4)] == [True, True, True, False]
+    assert limiter.allow('b')
+    time.sleep(0.01)
+    assert limiter.allow('a')
+
+
+def test_rate_limiter_without_rate_allows_everything():
+    limiter = RateLimiter(rate=0, burst=1)
+    assert all(limiter.allow('a') for _ in range(100))
+    assert len(limiter) == 0
+
+
+def test_rate_limiter_prunes_full_buckets():
+    limiter = RateLimiter(rate=1, burst=2)
+    limiter.allow('idle')
+    limiter.allow('busy')
+    limiter.allow('busy')
+    limiter.prune(time.monotonic() + 1.5)
+    assert len(limiter) == 1
+
+
+async def _closed_with(websocket):
+    try:
+        await asyncio.wait_for(websocket.recv(), 5)
+    except websockets.ConnectionClosed as e:
+        return e.rcvd.code
+    raise AssertionError("Connection still open.")
+
+
+def test_connections_per_ip_are_capped(make_manager):
+    manager = make_manager(max_connections_per_ip=2)
+    manager.register_data_stream('line<:>px')
+
+    async def run():
+        connections = []
+        for _ in range(2):
+            websocket, response = await subscribe(manager, 'line', 'px')
+            assert response['status'] == 'success'
+            connections.append(websocket)
+        # Refused before the subscription message is read
+        websocket = await websockets.connect(f"ws://127.0.0.1:{manager.port}{ROUTE}")
+        assert (await receive(websocket))['status'] == 'failure'
+        assert await _closed_with(websocket) == 1013
+        # A slot frees up once a client leaves
+        await connections.pop().close()
+        await asyncio.sleep(0.1)
+        websocket, response = await subscribe(manager, 'line', 'px')
+        assert response['status'] == 'success'
+        for websocket in connections + [websocket]:
+            await websocket.close()
+
+    asyncio.run(run())
+    wait_for(lambda: manager._connection_count == 0 and not manager._connections_by_ip)
+
+
+def test_subscription_rate_is_limited(make_manager):
+    manager = make_manager(subscription_rate=0.1, subscription_burst=2)
+    manager.register_data_stream('line<:>px')
+
+    async def run():
+        statuses = []
+        for _ in range(3):
+            websocket, response = await subscribe(manager, 'line', 'px')
+            statuses.append(response['status'])
+            await websocket.close()
+        return statuses
+
+    assert asyncio.run(run()) == ['success', 'success', 'failure']
+
+
+def test_pattern_subscriptions_are_capped(make_manager):
+    manager = make_manager(max_subscriptions=2)
+    for key_word in ('a', 'b', 'c'):
+        manager.register_data_stream(f'gauge<:>desk.{key_word}')
+
+    async def run():
+        websocket, response = await subscribe(manager, 'gauge', 'desk.*')
+        assert response['status'] == 'failure'
+        assert await _closed_with(websocket) == 1013
+
+    asyncio.run(run())
+
+
+def test_overload_sheds_queries_and_non_critical_streams(make_manager):
+    manager = make_manager(overload_lag=0.05)
+    manager.register_data_stream('line<:>low')
+    manager.set_stream_critical('line<:>low', False)
+
+    async def run():
+        websocket, _ = await subscribe(manager, 'line', 'low')
+        await receive(websocket) # Cached INIT payload
+        manager.loop.call_soon_threadsafe(time.sleep, 0.3) # Stalls the event loop
+        await asyncio.sleep(0.5)
+        assert manager._overloaded
+        manager.push_update_sync('line<:>low', _make_payload(1.0))
+        await websocket.send('{"action": "query", "request_id": 1}')
+        # The update is shed, the query refused
+        reply = await receive(websocket)
+        assert reply['status'] == 'error' and reply['request_id'] == 1
+        await websocket.close()
+
+    asyncio.run(run())
@@ -0,0 +1,89 @@
+import time
+import asyncio
+import threading
+import pytest
+from datetime import datetime
+from .conftest import subscribe, receive, wait_for, cached_value
+
+np = pytest.importorskip('numpy')
+from app.apiBulk import history_payloads
+
+START = np.datetime64('2026-10-19T09:00:00')
+
+
+def test_history_payloads_are_sorted_and_stamped():
+    timestamps = START + np.array([2, 0, 1]).astype('timedelta64[s]')
+    timestamps_ns, payloads = history_payloads('line', timestamps, np.array([3.0, 1.0, 2.0]))
+    assert timestamps_ns == sorted(timestamps_ns)
+    assert [payload['value'] for payload in payloads] == [1.0, 2.0, 3.0]
+    assert payloads[0]['id'] == '20261019090000000000'
+    assert datetime.fromisoformat(payloads[0]['timestamp']) == datetime(2026, 10, 19, 9)
+
+
+def test_history_payloads_of_series_charts():
+    _, payloads = history_payloads('lines', [1.0, 2.0], [[1, 2], [3, 4]], labels=['a', 'b'])
+    assert [payload['value'] for payload in payloads] == [[['a', 'b'], [1, 2]], [['a', 'b'], [3, 4]]]
+    with pytest.raises(ValueError):
+        history_payloads('lines', [1.0, 2.0], [[1, 2], [3, 4]])
+
+
+@pytest.mark.parametrize('chart_type, values', [
+    ('line', ['a', 'b']),
+    ('line', [1.0, float('nan')]),
+    ('line', [1.0]),
+    ('pie', [1.0, 2.0]),
+])
+def test_history_payloads_reject_invalid_columns(chart_type, values):
+    with pytest.raises(ValueError):
+        history_payloads(chart_type, [1.0, 2.0], values)
+
+
+def test_back_fill_is_sent_as_one_batch(make_manager):
+    manager = make_manager(history_size=100)
+    manager.register_data_stream('line<:>px')
+    timestamps_ns, payloads = history_payloads('line', START + np.arange(250).astype('timedelta64[s]'), np.arange(250.0))
+
+    async def run():
+        batch_client, _ = await subscribe(manager, 'line', 'px', features=['batch'])
+        plain_client, _ = await subscribe(manager, 'line', 'px')
+        for websocket in (batch_client, plain_client):
+            await receive(websocket) # Cached INIT payload
+        manager.load_history_sync('line<:>px', timestamps_ns, payloads)
+        batch, latest = await receive(batch_client), await receive(plain_client)
+        await batch_client.close()
+        await plain_client.close()
+        return batch, latest
+
+    batch, latest = asyncio.run(run())
+    # Only the points the in-memory history keeps are pushed
+    assert batch['status'] == 'batch'
+    assert [payload['value'] for payload in batch['data']] == list(np.arange(150.0, 250.0))
+    assert latest['value'] == 249.0
+    assert cached_value(manager, 'line<:>px') == 249.0
+    assert len(manager.query_history_sync('line<:>px', 0, timestamps_ns[-1])) == 100
+
+
+def test_back_fill_older_than_live_data_keeps_the_cache(make_manager):
+    manager = make_manager(history_size=100)
+    manager.register_data_stream('line<:>px')
+    manager.load_history_sync('line<:>px', *history_payloads('line', [2.0], [2.0]))
+    wait_for(lambda: cached_value(manager, 'line<:>px') == 2.0)
+    manager.load_history_sync('line<:>px', *history_payloads('line', [1.0], [1.0]))
+    wait_for(lambda: len(manager.query_history_sync('line<:>px', 0, 3_000_000_000)) == 2)
+    assert cached_value(manager, 'line<:>px') == 2.0
+
+
+def test_back_fill_queued_at_export_moves_with_the_handoff(make_manager):
+    predecessor = make_manager(history_size=100)
+    predecessor.register_data_stream('line<:>px')
+    wait_for(lambda: not predecessor._update_queue)
+    # Keep the loop busy until the export is scheduled ahead of the update loop, which finds the back-fill queued
+    predecessor.loop.call_soon_threadsafe(time.sleep, 0.3)
+    state = {}
+    export = threading.Thread(target=lambda: state.update(predecessor.export_state()))
+    export.start()
+    time.sleep(0.1)
+    predecessor.load_history_sync('line<:>px', *history_payloads('line', [1.0, 2.0], [1.0, 2.0]))
+    export.join()
+    assert state['cache']['line<:>px']['value'] == 2.0
+    assert len(state['history']['line<:>px']) == 2
@@ -0,0 +1,71 @@
+import time
+from datetime import datetime
+from app.apiClock import Clock, VirtualClock, VIRTUAL_EPOCH_NS, get_clock, set_clock
+
+
+def test_virtual_time_starts_at_the_given_moment():
+    assert VirtualClock().time_ns() == VIRTUAL_EPOCH_NS
+    assert VirtualClock(start=1000.5).monotonic() == 1000.5
+    assert VirtualClock(start='2026-10-19T09:30:00').now() == datetime(2026, 10, 19, 9, 30)
+
+
+def test_producers_run_in_virtual_time_order():
+    clock = VirtualClock(start=0.0)
+    events = []
+
+    def producer(name, period):
+        for _ in range(3):
+            clock.sleep(period)
+            events.append((clock.monotonic(), name))
+
+    started = time.perf_counter()
+    with clock.hold():
+        threads = [clock.start_thread(producer, args=('slow', 3600.0)), clock.start_thread(producer, args=('fast', 1500.0))]
+    for thread in threads:
+        thread.join(5)
+    # Three virtual hours without waiting for them
+    assert time.perf_counter() - started < 5
+    assert events == [(1500.0, 'fast'), (3000.0, 'fast'), (3600.0, 'slow'), (4500.0, 'fast'), (7200.0, 'slow'), (10800.0, 'slow')]
+    assert clock.idle()
+
+
+def test_advance_releases_due_sleepers_only():
+    clock = VirtualClock(start=0.0, auto_advance=False)
+    woken = []
+
+    def sleeper(seconds):
+        clock.sleep(seconds)
+        woken.append(seconds)
+
+    threads = [clock.start_thread(sleeper, args=(seconds,)) for seconds in (2.0, 1.0, 5.0)]
+    # Returns once every producer due so far ran until its next sleep or its end
+    clock.advance(3.0)
+    assert woken == [1.0, 2.0] and clock.monotonic() == 3.0
+    clock.advance(2.0)
+    threads[2].join(5)
+    assert woken == [1.0, 2.0, 5.0]
+
+
+def test_hold_keeps_time_still_until_producers_are_set_up():
+    clock = VirtualClock(start=0.0)
+    events = []
+    with clock.hold():
+        for name in ('a', 'b'):
+            clock.start_thread(lambda name=name: (clock.sleep(1.0), events.append((clock.monotonic(), name))))
+        time.sleep(0.1)
+        assert clock.monotonic() == 0.0
+    deadline = time.monotonic() + 5
+    while not clock.idle() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert events == [(1.0, 'a'), (1.0, 'b')]
+
+
+def test_set_clock_returns_the_previous_clock():
+    clock = VirtualClock()
+    previous = set_clock(clock)
+    try:
+        assert get_clock() is clock
+    finally:
+        assert set_clock(previous) is clock
+    assert set_clock(None) is previous and type(get_clock()) is Clock
+    set_clock(previous)
@@ -0,0 +1,74 @@
+import json
+import asyncio
+import pytest
+from websockets.frames import Frame, Opcode
+from app.apiCompress import AdaptiveDeflate, Compression
+from app.apiCore import _make_payload
+from app.apiMetrics import Counter
+from .conftest import subscribe, receive, wait_for, cached_value
+
+
+def _deflate(threshold: int):
+    counters = (Counter(), Counter(), Counter(), Counter())
+    return AdaptiveDeflate(False, False, 15, 12, threshold=threshold, counters=counters), counters
+
+
+def test_frames_below_the_threshold_are_sent_as_is():
+    extension, counters = _deflate(100)
+    small = Frame(Opcode.TEXT, b'{"value": 1.0}')
+    assert extension.encode(small) is small and not small.rsv1
+    large = extension.encode(Frame(Opcode.TEXT, b'{"value": "' + b'a' * 1000 + b'"}'))
+    assert large.rsv1 and len(large.data) < 100
+    ping = Frame(Opcode.PING, b'x' * 200)
+    assert extension.encode(ping) is ping
+    assert [counter.value for counter in counters[:3]] == [1, 1, 1013]
+
+
+def test_fragmented_messages_follow_their_first_frame():
+    extension, _ = _deflate(100)
+    first = Frame(Opcode.TEXT, b'x' * 10, fin=False)
+    last = Frame(Opcode.CONT, b'x' * 500)
+    assert extension.encode(first) is first and extension.encode(last) is last
+
+
+def test_primer_is_compressed_whatever_its_size():
+    compression = Compression(threshold=4096, dictionary='desk1 desk2')
+    extension, _ = _deflate(compression.threshold)
+    primer = compression.primer([extension])
+    assert json.loads(primer) == {"status": "dictionary", "data": 'desk1 desk2'}
+    assert extension.encode(Frame(Opcode.TEXT, primer.encode())).rsv1
+    assert compression.primer([]) is None
+    assert Compression().primer([extension]) is None
+
+
+@pytest.mark.parametrize('settings', [{'threshold': -1}, {'level': 0}, {'window_bits': 16}, {'mem_level': 10}])
+def test_invalid_settings_are_rejected(settings):
+    with pytest.raises(ValueError):
+        Compression(**settings)
+
+
+def test_dictionary_needs_context_takeover():
+    assert Compression(dictionary='desk1', context_takeover=False).dictionary is None
+
+
+def test_subscribers_receive_the_primer_and_large_updates_compressed(make_manager):
+    manager = make_manager(compression=Compression(threshold=256, dictionary='"timestamp": "value": '))
+    manager.register_data_stream('text<:>news')
+    manager.push_update_sync('text<:>news', _make_payload('short'))
+    wait_for(lambda: cached_value(manager, 'text<:>news') == 'short')
+
+    async def run():
+        websocket, response = await subscribe(manager, 'text', 'news')
+        primer = await receive(websocket)
+        cached = await receive(websocket)
+        manager.push_update_sync('text<:>news', _make_payload('long ' * 200))
+        update = await receive(websocket)
+        await websocket.close()
+        return response, primer, cached, update
+
+    response, primer, cached, update = asyncio.run(run())
+    assert response['status'] == 'success' and primer['status'] == 'dictionary'
+    assert cached['value'] == 'short' and update['value'] == 'long ' * 200
+    # The primer and the long update are compressed, the response and the cached payload are not
+    wait_for(lambda: manager._metric_compressed.labels('compressed').value == 2)
+    assert manager._metric_compressed.labels('skipped').value == 2
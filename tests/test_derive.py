@@ -0,0 +1,73 @@
+import random
+import pytest
+from app.apiCore import _make_payload
+from app.apiDerive import RollingWindow, Derivation
+from .conftest import wait_for, cached_value
+
+
+def test_rolling_window_matches_brute_force():
+    window = RollingWindow(1.0)
+    points = []
+    rng = random.Random(7)
+    for i in range(3000):
+        timestamp_ns, value = i * 37_000_000, rng.uniform(-5, 5)
+        window.push(timestamp_ns, value)
+        points.append((timestamp_ns, value))
+        live = [value for timestamp, value in points if timestamp > timestamp_ns - 1e9]
+        assert window.count == len(live)
+        assert window.sum == pytest.approx(sum(live))
+        assert window.min == min(live) and window.max == max(live)
+
+
+def test_derivation_formats_by_chart_type():
+    gauge = Derivation('mean', 60, 'gauge', 'price.mean')
+    text = Derivation('max', 60, 'text', 'price.max')
+    for i, value in enumerate((1.0, 2.0, 6.0)):
+        gauge_value = gauge.update(i * 1_000_000_000, value)
+        text_value = text.update(i * 1_000_000_000, value)
+    assert gauge_value == ['price.mean', [1.0, 6.0], 3.0]
+    assert text_value == 'max 60s: 6'
+
+
+def test_derivation_rejects_unknown_settings():
+    with pytest.raises(ValueError):
+        Derivation('median', 60, 'line', 'x')
+    with pytest.raises(ValueError):
+        Derivation('mean', 60, 'pie', 'x')
+    with pytest.raises(ValueError):
+        Derivation('mean', 0, 'line', 'x')
+
+
+def test_derived_streams_follow_their_source(manager):
+    manager.register_data_stream('line<:>price')
+    manager.add_derived_stream('line<:>price', 'line<:>price.mean', 'mean', 60)
+    manager.add_derived_stream('line<:>price', 'line<:>price.count', 'count', 60)
+    for value in (1, 2, 3, 10):
+        manager.push_update_sync('line<:>price', _make_payload(value))
+    wait_for(lambda: cached_value(manager, 'line<:>price.count') == 4)
+    assert cached_value(manager, 'line<:>price.mean') == 4.0
+
+    # Closing a derived stream stops its computation
+    manager.unregister_data_stream('line<:>price.count')
+    wait_for(lambda: len(manager._slots[manager.stream_id('line<:>price')].derived) == 1)
+
+    with pytest.raises(ValueError):
+        manager.add_derived_stream('pie<:>share', 'line<:>share.mean', 'mean')
+
+
+def test_derived_streams_move_with_the_handoff(make_manager):
+    previous = make_manager()
+    previous.register_data_stream('line<:>px')
+    previous.add_derived_stream('line<:>px', 'gauge<:>px.mean', 'mean', 60)
+    for value in (1, 3):
+        previous.push_update_sync('line<:>px', _make_payload(value))
+    wait_for(lambda: cached_value(previous, 'gauge<:>px.mean') == ['px.mean', [1, 3], 2.0])
+
+    manager = make_manager(start=False)
+    manager.import_state(previous.export_state())
+    manager.start_server_thread()
+    assert manager.wait_until_ready()
+    manager.push_update_sync('line<:>px', _make_payload(20))
+    # The window carries on with the points seen before the restart
+    wait_for(lambda: cached_value(manager, 'gauge<:>px.mean') == ['px.mean', [1, 20], 8.0])
+    assert not previous._slots[previous.stream_id('line<:>px')].derived
@@ -0,0 +1,91 @@
+import json
+import asyncio
+import pytest
+from datetime import datetime, timezone
+from app.apiClock import VirtualClock, set_clock
+from app.apiCore import _make_payload
+from app.apiHistory import StreamHistory, downsample, time_to_ns
+from app.apiRecord import StreamRecorder, read_stream
+from .conftest import subscribe, receive, wait_for, cached_value
+
+KEY = 'line<:>px'
+
+
+@pytest.fixture
+def virtual_clock():
+    clock = VirtualClock(start=1000.0, auto_advance=False)
+    previous = set_clock(clock)
+    yield clock
+    set_clock(previous)
+
+
+def _push(manager, clock, values):
+    """Pushes one update per second of virtual time, stamped by the manager at 1000 s, 1001 s, ..."""
+    for value in values:
+        manager.push_update_sync(KEY, _make_payload(value))
+        wait_for(lambda: cached_value(manager, KEY) == value)
+        clock.advance(1.0)
+
+
+def test_time_to_ns():
+    moment = datetime(2026, 10, 19, 9, 30, tzinfo=timezone.utc)
+    assert time_to_ns(moment) == int(moment.timestamp()) * 10 ** 9
+    assert time_to_ns(moment.isoformat()) == time_to_ns(moment)
+    assert time_to_ns(1500, unit=1e6) == 1_500_000_000
+    assert time_to_ns(None, default=7) == 7
+
+
+def test_downsample_keeps_the_latest_point_of_each_bucket():
+    points = [(timestamp_ns, {"value": timestamp_ns}) for timestamp_ns in range(10)]
+    assert downsample(points, None) is points
+    assert downsample(points, 20) is points
+    assert [timestamp_ns for timestamp_ns, _ in downsample(points, 5)] == [1, 3, 5, 7, 9]
+
+
+def test_stream_history_keeps_the_latest_points():
+    history = StreamHistory(3)
+    for timestamp_ns in range(10):
+        history.append(timestamp_ns, {"value": timestamp_ns})
+    assert len(history) == 3 and (history.oldest(), history.newest()) == (7, 9)
+    assert history.range(8, 100) == [(8, {"value": 8}), (9, {"value": 9})]
+    assert history.range(0, 6) == []
+
+
+def test_stream_history_merges_older_points_in_time_order():
+    history = StreamHistory(4)
+    history.extend([10, 30], [{"value": 10}, {"value": 30}])
+    history.extend([5, 20, 40], [{"value": 5}, {"value": 20}, {"value": 40}])
+    assert [timestamp_ns for timestamp_ns, _ in history.range(0, 100)] == [10, 20, 30, 40]
+
+
+def test_clients_query_a_downsampled_range(make_manager, virtual_clock):
+    manager = make_manager(history_size=100)
+    manager.register_data_stream(KEY)
+    _push(manager, virtual_clock, [float(value) for value in range(10)])
+
+    async def run():
+        websocket, _ = await subscribe(manager, 'line', 'px')
+        await receive(websocket) # Cached payload
+        # Epoch milliseconds, as browsers send them
+        await websocket.send(json.dumps({"action": "query", "start": 1002_000, "end": 1007_000, "request_id": 1}))
+        full = await receive(websocket)
+        await websocket.send(json.dumps({"action": "query", "start": 1002_000, "end": 1007_000, "max_points": 3, "request_id": 2}))
+        reduced = await receive(websocket)
+        await websocket.send(json.dumps({"action": "query", "start": "not a time", "request_id": 3}))
+        invalid = await receive(websocket)
+        await websocket.close()
+        return full, reduced, invalid
+
+    full, reduced, invalid = asyncio.run(run())
+    assert (full['status'], full['request_id']) == ('history', 1)
+    assert [data_payload['value'] for data_payload in full['data']] == [2.0, 3.0, 4.0, 5.0, 6.0, 7.0]
+    assert [data_payload['value'] for data_payload in reduced['data']] == [3.0, 5.0, 7.0]
+    assert (invalid['status'], invalid['request_id']) == ('error', 3)
+
+
+def test_query_reads_points_expired_from_memory_from_the_recording(make_manager, virtual_clock, tmp_path):
+    manager = make_manager(history_size=2, recorder=StreamRecorder(str(tmp_path), flush_interval=0.01))
+    manager.register_data_stream(KEY)
+    _push(manager, virtual_clock, [1.0, 2.0, 3.0, 4.0, 5.0])
+    wait_for(lambda: len(list(read_stream(str(tmp_path), KEY))) == 5)
+    assert [data_payload['value'] for data_payload in manager.query_history_sync(KEY, 0, 2000 * 10 ** 9)] == [1.0, 2.0, 3.0, 4.0, 5.0]
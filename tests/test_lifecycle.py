@@ -0,0 +1,116 @@
+import time
+import asyncio
+from app.apiCore import _make_payload
+from .conftest import subscribe, receive, wait_for, cached_value
+
+
+def test_unregister_closes_subscriptions(manager):
+    manager.register_data_stream('line<:>px')
+    manager.push_update_sync('line<:>px', _make_payload(1.0))
+    wait_for(lambda: cached_value(manager, 'line<:>px') == 1.0)
+
+    async def run():
+        websocket, _ = await subscribe(manager, 'line', 'px')
+        await receive(websocket)
+        manager.unregister_data_stream('line<:>px')
+        closed = await receive(websocket)
+        await websocket.close()
+        return closed
+
+    assert asyncio.run(run())['status'] == 'closed'
+    assert 'line<:>px' not in manager._valid_data_keys
+    assert cached_value(manager, 'line<:>px') is None
+
+
+def test_stream_registered_again_after_close_stays_open(manager):
+    manager.register_data_stream('line<:>px')
+    manager.push_update_sync('line<:>px', _make_payload(1.0))
+    wait_for(lambda: cached_value(manager, 'line<:>px') == 1.0)
+    # The close and the new registration race the loop
+    manager.loop.call_soon_threadsafe(time.sleep, 0.2)
+    manager.unregister_data_stream('line<:>px')
+    manager.register_data_stream('line<:>px')
+    manager.push_update_sync('line<:>px', _make_payload(2.0))
+    wait_for(lambda: cached_value(manager, 'line<:>px') == 2.0)
+    assert 'line<:>px' in manager._valid_data_keys
+
+    async def run():
+        websocket, response = await subscribe(manager, 'line', 'px')
+        latest = await receive(websocket)
+        await websocket.close()
+        return response, latest
+
+    response, latest = asyncio.run(run())
+    assert response['status'] == 'success' and latest['value'] == 2.0
+
+
+def test_evicted_payload_is_not_restored_from_the_snapshot(make_manager, tmp_path):
+    snapshot_path = str(tmp_path / 'cache.snap')
+    previous = make_manager(snapshot_path=snapshot_path)
+    previous.register_data_stream('text<:>px')
+    previous.push_update_sync('text<:>px', _make_payload('OLD'))
+    wait_for(lambda: cached_value(previous, 'text<:>px') == 'OLD')
+    previous.stop_server_thread()
+
+    manager = make_manager(snapshot_path=snapshot_path, cache_budget=200)
+    manager.push_update_sync('text<:>px', _make_payload('NEW'))
+    wait_for(lambda: cached_value(manager, 'text<:>px') == 'NEW')
+    manager.register_data_stream('text<:>other')
+    manager.push_update_sync('text<:>other', _make_payload('x' * 150))
+    wait_for(lambda: 'text<:>px' not in manager._cache)
+    assert cached_value(manager, 'text<:>px') is None
+
+
+def test_stream_ttls_move_with_the_handoff(make_manager):
+    previous = make_manager()
+    previous.register_data_stream('line<:>px')
+    previous.set_stream_ttl('line<:>px', 5)
+    manager = make_manager(start=False)
+    manager.import_state(previous.export_state())
+    assert manager._stream_ttls == {'line<:>px': 5}
+
+
+def test_cache_budget_evicts_the_least_recently_updated_payload(make_manager):
+    manager = make_manager(cache_budget=400)
+    for key_word in ('a', 'b', 'c'):
+        manager.register_data_stream(f'text<:>{key_word}')
+
+    async def run():
+        websocket, _ = await subscribe(manager, 'text', 'a')
+        await receive(websocket) # Initial payload
+        for key_word in ('a', 'b', 'c'):
+            manager.push_update_sync(f'text<:>{key_word}', _make_payload(key_word * 100))
+        updated = await receive(websocket)
+        evicted = await receive(websocket)
+        await websocket.close()
+        return updated, evicted
+
+    updated, evicted = asyncio.run(run())
+    assert updated['value'] == 'a' * 100 and evicted['status'] == 'evicted'
+    wait_for(lambda: cached_value(manager, 'text<:>c') == 'c' * 100)
+    assert cached_value(manager, 'text<:>a') is None and cached_value(manager, 'text<:>b') == 'b' * 100
+    assert manager._cache_bytes <= 400
+
+
+def test_idle_streams_expire_and_come_back_with_their_producer(make_manager):
+    manager = make_manager(start=False)
+    manager.expiry_interval = 0.05
+    manager.start_server_thread()
+    assert manager.wait_until_ready()
+    manager.register_data_stream('line<:>px')
+    manager.push_update_sync('line<:>px', _make_payload(1.0))
+    wait_for(lambda: cached_value(manager, 'line<:>px') == 1.0)
+
+    async def run():
+        websocket, _ = await subscribe(manager, 'line', 'px')
+        await receive(websocket)
+        manager.set_stream_ttl('line<:>px', 0.2)
+        closed = await receive(websocket)
+        await websocket.close()
+        return closed
+
+    closed = asyncio.run(run())
+    assert closed['status'] == 'closed' and 'expired' in closed['message']
+    assert 'line<:>px' not in manager._valid_data_keys
+    manager.push_update_sync('line<:>px', _make_payload(2.0))
+    wait_for(lambda: 'line<:>px' in manager._valid_data_keys and cached_value(manager, 'line<:>px') == 2.0)
@@ -0,0 +1,53 @@
+import asyncio
+from app.apiCore import _make_payload
+from .conftest import subscribe, receive, wait_for, cached_value
+
+
+def test_pattern_attaches_existing_and_new_streams(manager):
+    for data_key in ('gauge<:>desk1.a', 'gauge<:>desk1.b', 'gauge<:>desk2.a', 'line<:>desk1.c'):
+        manager.register_data_stream(data_key)
+    manager.push_update_sync('gauge<:>desk1.a', _make_payload(5))
+    wait_for(lambda: cached_value(manager, 'gauge<:>desk1.a') == 5)
+
+    async def run():
+        websocket, response = await subscribe(manager, 'gauge', 'desk1.*')
+        assert response['status'] == 'success' and response['pattern'] is True
+
+        attached = {}
+        for _ in range(2):
+            announcement = await receive(websocket)
+            assert announcement['status'] == 'attached'
+            cached = await receive(websocket)
+            assert cached['stream_id'] == announcement['stream_id']
+            attached[announcement['key_word']] = cached['value']
+        # Other chart types and other prefixes are not attached
+        assert attached == {'desk1.a': 5, 'desk1.b': 0}
+
+        # A stream registered later is attached too, updates carry their stream id
+        manager.register_data_stream('gauge<:>desk1.z')
+        announcement = await receive(websocket)
+        assert announcement['status'] == 'attached' and announcement['key_word'] == 'desk1.z'
+        await receive(websocket)
+        manager.push_update_sync('gauge<:>desk2.a', _make_payload(8))
+        manager.push_update_sync('gauge<:>desk1.z', _make_payload(7))
+        update = await receive(websocket)
+        assert update['stream_id'] == announcement['stream_id'] and update['value'] == 7
+
+        manager.unregister_data_stream('gauge<:>desk1.z')
+        detached = await receive(websocket)
+        assert detached['status'] == 'detached' and detached['stream_id'] == announcement['stream_id']
+        await websocket.close()
+
+    asyncio.run(run())
+    wait_for(lambda: not manager._pattern_subscriptions)
+
+
+def test_pattern_wildcard_only_at_the_end(manager):
+    manager.register_data_stream('gauge<:>desk1.a')
+
+    async def run():
+        websocket, response = await subscribe(manager, 'gauge', 'de*sk*')
+        await websocket.close()
+        return response
+
+    assert asyncio.run(run())['status'] == 'failure'
@@ -0,0 +1,50 @@
+import asyncio
+import pytest
+from app.apiCore import _make_payload
+from app.apiQuantize import Quantizer
+from app.apiValidate import NUMPY_MIN_SIZE
+from .conftest import subscribe, receive, wait_for, cached_value
+
+
+def test_numbers_are_sent_as_integers_with_the_scale():
+    payload = {"id": "1", "timestamp": "t", "value": [["A", "B"], [1.005, 2, -0.5], (2.71828,)]}
+    quantized = Quantizer(2)(payload)
+    assert quantized == {"id": "1", "timestamp": "t", "value": [["A", "B"], [100, 200, -50], [272]], "scale": 100}
+    # The payload itself is never modified, the cache keeps the full values
+    assert payload["value"][1][0] == 1.005 and "scale" not in payload
+
+
+def test_large_lists_are_scaled_vectorized():
+    np = pytest.importorskip('numpy')
+    large = Quantizer(1)({"value": list(np.linspace(0, 1, NUMPY_MIN_SIZE))})
+    assert large["scale"] == 10 and all(type(item) is int for item in large["value"])
+    assert large["value"][-1] == 10
+
+
+def test_non_finite_values_are_sent_unquantized():
+    payload = {"value": [1.5, float('nan')]}
+    assert Quantizer(2)(payload) is payload
+    large = {"value": [1.5] * NUMPY_MIN_SIZE + [float('inf')]}
+    assert Quantizer(2)(large) is large
+
+
+def test_negative_decimals_are_rejected():
+    with pytest.raises(ValueError):
+        Quantizer(-1)
+
+
+def test_subscribers_receive_quantized_updates(manager):
+    manager.register_data_stream('line<:>px')
+    manager.set_stream_precision('line<:>px', 1)
+
+    async def run():
+        websocket, _ = await subscribe(manager, 'line', 'px')
+        await receive(websocket) # Cached INIT payload
+        manager.push_update_sync('line<:>px', _make_payload(2.71828))
+        update = await receive(websocket)
+        await websocket.close()
+        return update
+
+    update = asyncio.run(run())
+    assert (update['value'], update['scale']) == (27, 10)
+    wait_for(lambda: cached_value(manager, 'line<:>px') == 2.71828)
@@ -0,0 +1,61 @@
+import os
+import json
+import base64
+import socket
+import struct
+from app.apiCore import _make_payload
+from .conftest import ROUTE, wait_for, cached_value
+
+
+def _dead_client(manager, key_word: str) -> socket.socket:
+    """Subscribes over a raw socket that never reads again, so it neither answers pings nor drains sends."""
+    sock = socket.socket()
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+    sock.connect(('127.0.0.1', manager.port))
+    key = base64.b64encode(os.urandom(16)).decode()
+    sock.sendall((
+        f"GET {ROUTE} HTTP/1.1\r\nHost: 127.0.0.1:{manager.port}\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+        f"Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n"
+    ).encode())
+    response = b''
+    while b'\r\n\r\n' not in response:
+        response += sock.recv(1)
+    assert b' 101 ' in response
+    message = json.dumps({"chart_type": "text", "key_word": key_word}).encode()
+    mask = os.urandom(4)
+    sock.sendall(struct.pack('!BB', 0x81, 0x80 | len(message)) + mask + bytes(b ^ mask[i % 4] for i, b in enumerate(message)))
+    wait_for(lambda: 'text<:>' + key_word in manager._subscriptions)
+    return sock
+
+
+def _reaped(manager, reason: str) -> int:
+    return manager._metric_reaped.labels(reason).value
+
+
+def test_clients_missing_pongs_are_reaped(make_manager):
+    manager = make_manager(start=False, ping_interval=0.1, ping_timeout=0.1, stall_timeout=0)
+    manager.reap_interval = 0.05
+    manager.start_server_thread()
+    assert manager.wait_until_ready()
+    manager.register_data_stream('text<:>news')
+    sock = _dead_client(manager, 'news')
+    wait_for(lambda: _reaped(manager, 'ping_timeout') == 1)
+    assert 'text<:>news' not in manager._subscriptions and not manager._connection_bytes
+    sock.close()
+
+
+def test_clients_whose_sends_stop_draining_are_reaped(make_manager):
+    manager = make_manager(start=False, ping_interval=None, stall_timeout=0.2)
+    manager.reap_interval = 0.05
+    manager.start_server_thread()
+    assert manager.wait_until_ready()
+    manager.register_data_stream('text<:>news')
+    sock = _dead_client(manager, 'news')
+    for _ in range(100):
+        manager.push_update_sync('text<:>news', _make_payload('x' * 100_000))
+    wait_for(lambda: _reaped(manager, 'stalled') == 1)
+    assert 'text<:>news' not in manager._subscriptions
+    # The fan-out blocked on the dead client goes on
+    manager.push_update_sync('text<:>news', _make_payload('done'))
+    wait_for(lambda: cached_value(manager, 'text<:>news') == 'done')
+    sock.close()
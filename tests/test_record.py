@@ -0,0 +1,70 @@
+import os
+from datetime import datetime, timedelta
+from app.apiRecord import StreamRecorder, list_recorded_streams, list_segments, read_stream, read_stream_range, stream_directory, stream_key_from_directory
+
+KEY = 'line<:>px'
+
+
+def _payload(moment: datetime, value):
+    return {"id": moment.strftime("%Y%m%d%H%M%S%f"), "timestamp": moment.isoformat(), "value": value}
+
+
+def _record(root: str, records, **kwargs):
+    """Records (timestamp_ns, payload) pairs of one stream and flushes them."""
+    recorder = StreamRecorder(root, flush_interval=0.01, **kwargs)
+    recorder.start()
+    for timestamp_ns, data_payload in records:
+        recorder.record(KEY, data_payload, timestamp_ns)
+    recorder.stop()
+
+
+def test_numeric_records_round_trip_exactly(tmp_path):
+    moment = datetime(2026, 10, 19, 9, 30, 0, 123456)
+    records = [(1000 + i, _payload(moment + timedelta(seconds=i), value)) for i, value in enumerate((1.5, 7, -3, 2.25, 2 ** 40))]
+    _record(str(tmp_path), records)
+    assert list(read_stream(str(tmp_path), KEY)) == records
+    assert [type(data_payload['value']) for _, data_payload in read_stream(str(tmp_path), KEY)] == [float, int, int, float, int]
+
+
+def test_mixed_int_and_float_values_share_one_segment(tmp_path):
+    moment = datetime(2026, 10, 19, 9, 30)
+    _record(str(tmp_path), [(1000 + i, _payload(moment, i if i % 2 else float(i))) for i in range(200)])
+    assert len(list_segments(str(tmp_path), KEY)) == 1
+
+
+def test_payloads_that_can_not_be_rebuilt_are_kept_as_json(tmp_path):
+    moment = datetime(2026, 10, 19, 9, 30)
+    records = [
+        (1000, {"id": "custom", "timestamp": moment.isoformat(), "value": 1.0}),
+        (1001, {**_payload(moment, 2.0), "extra": True}),
+        (1002, _payload(moment, 2 ** 70)),
+        (1003, _payload(moment, [["a"], [1]])),
+    ]
+    _record(str(tmp_path), records)
+    assert list(read_stream(str(tmp_path), KEY)) == records
+
+
+def test_range_reads_across_segments(tmp_path):
+    moment = datetime(2026, 10, 19, 9, 30)
+    records = [(1000 + i, _payload(moment, float(i)) if i < 150 else {"id": str(i), "timestamp": "t", "value": i}) for i in range(300)]
+    _record(str(tmp_path), records, max_segment_bytes=1024)
+    assert len(list_segments(str(tmp_path), KEY)) > 2
+    assert list(read_stream_range(str(tmp_path), KEY, 1100, 1199)) == records[100:200]
+    assert list(read_stream_range(str(tmp_path), KEY, 2000, 3000)) == []
+
+
+def test_truncated_trailing_record_is_ignored(tmp_path):
+    moment = datetime(2026, 10, 19, 9, 30)
+    records = [(1000 + i, _payload(moment, float(i))) for i in range(3)]
+    _record(str(tmp_path), records)
+    path, = list_segments(str(tmp_path), KEY)
+    with open(path, 'r+b') as f:
+        f.truncate(os.path.getsize(path) - 5)
+    assert list(read_stream(str(tmp_path), KEY)) == records[:2]
+
+
+def test_stream_directories_round_trip_keys(tmp_path):
+    data_key = 'lines<:>desk/1 <a>'
+    assert stream_key_from_directory(str(tmp_path), stream_directory(str(tmp_path), data_key)) == data_key
+    _record(str(tmp_path), [(1000, _payload(datetime(2026, 10, 19), 1.0))])
+    assert list_recorded_streams(str(tmp_path)) == [KEY]
@@ -0,0 +1,48 @@
+import pytest
+import app.api
+from app.apiCore import _make_payload
+from app.apiClock import VirtualClock, set_clock
+from app.apiRecord import StreamRecorder
+from app.apiReplay import replay, replay_records
+from .conftest import wait_for, cached_value
+
+# Record times in epoch nanoseconds, one second apart, alternating between two streams
+RECORDS = [(i * 10 ** 9, 'line<:>a' if i % 2 else 'line<:>b', _make_payload(float(i))) for i in range(1, 7)]
+
+
+@pytest.fixture
+def recording(tmp_path):
+    recorder = StreamRecorder(str(tmp_path), flush_interval=0.01)
+    recorder.start()
+    for timestamp_ns, data_key, data_payload in RECORDS:
+        recorder.record(data_key, data_payload, timestamp_ns)
+    recorder.stop()
+    return str(tmp_path)
+
+
+@pytest.fixture
+def virtual_clock():
+    clock = VirtualClock()
+    previous = set_clock(clock)
+    yield clock
+    set_clock(previous)
+
+
+def test_records_of_several_streams_are_merged_in_time_order(recording):
+    assert list(replay_records(recording, ['line<:>a', 'line<:>b'])) == RECORDS
+
+
+def test_replay_keeps_the_timing_scaled_by_speed(recording, manager, virtual_clock, monkeypatch):
+    monkeypatch.setattr(app.api, '_manager', manager)
+    started = virtual_clock.monotonic()
+    assert replay(recording, speed=2.0, key_word_prefix='replay.') == 6
+    # Five seconds between the first and the last record, replayed twice as fast
+    assert virtual_clock.monotonic() - started == pytest.approx(2.5)
+    wait_for(lambda: cached_value(manager, 'line<:>replay.a') == 5.0 and cached_value(manager, 'line<:>replay.b') == 6.0)
+
+
+def test_replay_range_and_selected_streams(recording, manager, monkeypatch):
+    monkeypatch.setattr(app.api, '_manager', manager)
+    assert replay(recording, speed=None, data_keys=['line<:>a'], start=2.0, end=4.0) == 1
+    wait_for(lambda: cached_value(manager, 'line<:>a') == 3.0)
+    assert 'line<:>b' not in manager._valid_data_keys
@@ -0,0 +1,119 @@
+import asyncio
+import threading
+from app.apiCore import _make_payload
+from .conftest import subscribe, receive, wait_for, cached_value
+
+KEY = 'line<:>px'
+
+
+def _handoff(make_manager, **kwargs):
+    """Moves a stream with three updates to a successor, which then gets two more."""
+    predecessor = make_manager(history_size=100)
+    predecessor.register_data_stream(KEY)
+    for value in (1.0, 2.0, 3.0):
+        predecessor.push_update_sync(KEY, _make_payload(value))
+    wait_for(lambda: cached_value(predecessor, KEY) == 3.0)
+
+    successor = make_manager(start=False, history_size=100, **kwargs)
+    successor.import_state(predecessor.export_state())
+    successor.start_server_thread()
+    assert successor.wait_until_ready()
+    for value in (4.0, 5.0):
+        successor.push_update_sync(KEY, _make_payload(value))
+    wait_for(lambda: cached_value(successor, KEY) == 5.0)
+    return successor
+
+
+def test_resume_token_replays_missed_updates(make_manager):
+    successor = _handoff(make_manager)
+    token = successor.issue_resume_token(KEY)
+
+    async def run():
+        websocket, response = await subscribe(successor, 'line', 'px', resume_token=token)
+        assert response['status'] == 'success'
+        missed = [(await receive(websocket))['value'] for _ in range(2)]
+        await websocket.close()
+        return missed
+
+    assert asyncio.run(run()) == [4.0, 5.0]
+
+
+def test_resume_token_is_single_use(make_manager):
+    successor = _handoff(make_manager)
+    token = successor.issue_resume_token(KEY)
+    assert successor._redeem_resume_token(token, KEY) is not None
+
+    async def run():
+        # A spent token falls back to a normal subscription with the cached data
+        websocket, response = await subscribe(successor, 'line', 'px', resume_token=token)
+        assert response['status'] == 'success'
+        latest = await receive(websocket)
+        await websocket.close()
+        return latest
+
+    assert asyncio.run(run())['value'] == 5.0
+
+
+def test_resume_token_is_bound_to_its_stream(make_manager):
+    successor = _handoff(make_manager)
+    successor.register_data_stream('line<:>other')
+    token = successor.issue_resume_token(KEY)
+    assert successor._redeem_resume_token(token, 'line<:>other') is None
+    assert successor._redeem_resume_token(token, KEY) is None
+
+
+def test_resume_token_survives_a_rejected_subscription(make_manager):
+    successor = _handoff(make_manager, subscription_rate=5, subscription_burst=1)
+    token = successor.issue_resume_token(KEY)
+
+    async def run():
+        websocket, _ = await subscribe(successor, 'line', 'px')
+        await websocket.close()
+        _, response = await subscribe(successor, 'line', 'px', resume_token=token)
+        assert response['status'] == 'failure'
+        await asyncio.sleep(0.3)
+        websocket, response = await subscribe(successor, 'line', 'px', resume_token=token)
+        assert response['status'] == 'success'
+        missed = [(await receive(websocket))['value'] for _ in range(2)]
+        await websocket.close()
+        return missed
+
+    assert asyncio.run(run()) == [4.0, 5.0]
+
+def test_handoff_moves_resuming_clients_and_keeps_serving_the_others(make_manager):
+    predecessor = make_manager(history_size=100)
+    predecessor.register_data_stream(KEY)
+    predecessor.push_update_sync(KEY, _make_payload(1.0))
+    wait_for(lambda: cached_value(predecessor, KEY) == 1.0)
+
+    async def run():
+        resuming, _ = await subscribe(predecessor, 'line', 'px', features=['resume'])
+        legacy, _ = await subscribe(predecessor, 'line', 'px')
+        for websocket in (resuming, legacy):
+            await receive(websocket)
+
+        successor = make_manager(start=False, history_size=100)
+        successor.import_state(predecessor.export_state())
+        successor.start_server_thread()
+        assert successor.wait_until_ready()
+        handoff = threading.Thread(target=predecessor.handoff, args=(successor, 1.0), daemon=True)
+        handoff.start()
+
+        reconnect = await receive(resuming)
+        assert reconnect['status'] == 'reconnect' and reconnect['url'].endswith(f":{successor.port}/data")
+        # The successor's updates are relayed to the client that can not move
+        successor.push_update_sync(KEY, _make_payload(2.0))
+        assert (await receive(legacy))['value'] == 2.0
+
+        moved, response = await subscribe(successor, 'line', 'px', resume_token=reconnect['resume_token'])
+        assert response['status'] == 'success'
+        assert (await receive(moved))['value'] == 2.0
+        await resuming.close()
+        await asyncio.sleep(1.2)
+        assert handoff.is_alive() # Still serving the legacy client
+        await legacy.close()
+        await asyncio.to_thread(handoff.join, 5)
+        assert not handoff.is_alive() and not successor._hooks['post_dequeue']
+        await moved.close()
+
+    asyncio.run(run())
@@ -0,0 +1,74 @@
+import pytest
+from app.apiClock import VirtualClock
+from app.apiScheduler import Scheduler
+from .conftest import wait_for
+
+
+class _Stream:
+    """Collects what a job publishes, in place of a DataStream."""
+
+    def __init__(self):
+        self.values = []
+
+    def fresh(self, value):
+        self.values.append(value)
+
+
+@pytest.fixture
+def clock():
+    return VirtualClock(start=0.0)
+
+
+@pytest.fixture
+def scheduler(clock):
+    scheduler = Scheduler(workers=2, clock=clock)
+    yield scheduler
+    scheduler.stop()
+
+
+def test_periodic_jobs_run_at_a_fixed_rate(scheduler, clock):
+    runs = []
+    job = scheduler.every(2.0, lambda: runs.append(clock.monotonic()), times=4, delay=1.0)
+    wait_for(lambda: not job.active)
+    assert runs == [1.0, 3.0, 5.0, 7.0]
+    assert scheduler.jobs() == []
+
+
+def test_return_values_are_published_to_the_stream(scheduler, clock):
+    stream = _Stream()
+    job = scheduler.every(1.0, lambda: None if clock.monotonic() == 1.0 else clock.monotonic(), stream=stream, times=3)
+    scheduler.call_later(0.5, lambda: 'once', stream=stream)
+    wait_for(lambda: not job.active)
+    # None is not published
+    assert stream.values == [0.0, 'once', 2.0]
+
+
+def test_overrunning_jobs_skip_the_missed_periods(scheduler, clock):
+    runs = []
+
+    def slow():
+        runs.append(clock.monotonic())
+        clock.sleep(2.5)
+
+    job = scheduler.every(1.0, slow, times=3)
+    wait_for(lambda: not job.active)
+    assert runs == [0.0, 3.0, 6.0] and job.skipped == 4
+
+
+def test_cancelled_jobs_stop(scheduler, clock):
+    runs = []
+    job = scheduler.every(1.0, lambda: runs.append(clock.monotonic()) or (len(runs) == 2 and job.cancel()))
+    wait_for(lambda: job.cancelled and not job.running)
+    assert runs == [0.0, 1.0] and not job.active
+    with pytest.raises(ValueError):
+        scheduler.every(0, print)
+
+
+def test_jobs_run_on_the_worker_pool_with_the_wall_clock():
+    scheduler = Scheduler(workers=2)
+    try:
+        job = scheduler.every(0.01, lambda: None, times=3)
+        wait_for(lambda: job.runs == 3)
+        assert scheduler.submit(sum, [1, 2, 3]).result(5) == 6
+    finally:
+        scheduler.stop()
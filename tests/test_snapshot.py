@@ -0,0 +1,50 @@
+import asyncio
+from app.apiCore import _make_payload
+from app.apiSnapshot import SnapshotReader, open_snapshot, write_snapshot
+from .conftest import subscribe, receive, wait_for, cached_value
+
+
+def test_snapshot_round_trip(tmp_path):
+    path = str(tmp_path / 'cache.snapshot')
+    cache = {'line<:>a': {"id": "1", "timestamp": "t", "value": 1.5}, 'text<:>b': {"id": "2", "timestamp": "t", "value": "é"}}
+    assert write_snapshot(path, cache, ['line<:>a', 'line<:>empty']) == 3
+    reader = SnapshotReader(path)
+    assert sorted(reader.keys()) == ['line<:>a', 'line<:>empty', 'text<:>b']
+    assert reader.get('line<:>a') == cache['line<:>a'] and reader.get('text<:>b') == cache['text<:>b']
+    assert reader.get('line<:>empty') is None and reader.get('line<:>unknown') is None
+    reader.discard('line<:>a')
+    assert reader.get('line<:>a') is None
+    reader.close()
+
+
+def test_unusable_snapshots_are_ignored(tmp_path):
+    assert open_snapshot(str(tmp_path / 'missing.snapshot')) is None
+    (tmp_path / 'empty.snapshot').write_bytes(b'')
+    assert open_snapshot(str(tmp_path / 'empty.snapshot')) is None
+    (tmp_path / 'other.snapshot').write_bytes(b'not a snapshot at all')
+    assert open_snapshot(str(tmp_path / 'other.snapshot')) is None
+
+
+def test_manager_warm_starts_from_its_snapshot(make_manager, tmp_path):
+    path = str(tmp_path / 'cache.snapshot')
+    first = make_manager(snapshot_path=path)
+    first.register_data_stream('line<:>px')
+    first.register_data_stream('line<:>idle')
+    first.push_update_sync('line<:>px', _make_payload(4.2))
+    wait_for(lambda: cached_value(first, 'line<:>px') == 4.2)
+    first.stop_server_thread() # Checkpoints at shutdown
+
+    # Dashboards subscribe before the producers come back
+    second = make_manager(snapshot_path=path)
+
+    async def run():
+        websocket, response = await subscribe(second, 'line', 'px')
+        cached = await receive(websocket)
+        await websocket.close()
+        websocket, idle = await subscribe(second, 'line', 'idle')
+        await websocket.close()
+        return response, cached, idle
+
+    response, cached, idle = asyncio.run(run())
+    assert response['status'] == 'success' and cached['value'] == 4.2
+    assert idle['status'] == 'success'
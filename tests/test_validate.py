@@ -0,0 +1,47 @@
+import pytest
+from app.apiTest import generate_data
+from app.apiValidate import NUMERIC_SCHEMAS, NUMPY_MIN_SIZE, Validator, get_schema, is_numeric_array
+
+
+@pytest.mark.parametrize('size', [4, NUMPY_MIN_SIZE])
+def test_numeric_arrays(size):
+    assert is_numeric_array([1.5] * size, (size,))
+    assert is_numeric_array([[1, 2.5]] * size, (size, 2))
+    assert not is_numeric_array([1.5] * size, (size + 1,))
+    assert not is_numeric_array([1.5] * (size - 1) + ['1.5'], (size,))
+    assert not is_numeric_array([1.5] * (size - 1) + [None], (size,))
+    assert not is_numeric_array([1.5] * (size - 1) + [float('nan')], (size,))
+    assert not is_numeric_array([[1, 2.5]] * (size - 1) + [[1]], (size, 2))
+
+
+@pytest.mark.parametrize('chart_type', NUMERIC_SCHEMAS)
+def test_generated_payloads_pass_their_schema(chart_type):
+    assert get_schema(chart_type).check(generate_data(chart_type))
+
+
+def test_surface_values_must_match_the_announced_grid():
+    labels, shape, rows = generate_data('surface')
+    assert not get_schema('surface').check([labels, [shape[0] + 1, shape[1]], rows])
+    assert not get_schema('surface').check([labels, shape, rows[:-1]])
+    assert not get_schema('surface').check([labels])
+
+
+def test_sampled_mode_checks_the_first_of_every_n_updates():
+    validator = Validator('gauge', 'sampled', sample_every=3)
+    invalid = ['Delta', [-1.0, float('inf')], 0.5]
+    assert [validator(invalid) for _ in range(6)] == [False, True, True, False, True, True]
+    validator.configure('off')
+    assert validator(invalid)
+    validator.configure('full')
+    assert not validator(invalid)
+
+
+def test_chart_types_without_numeric_schema_are_not_checked():
+    assert not get_schema('text') and Validator('text')("anything")
+
+
+def test_invalid_modes_are_rejected():
+    with pytest.raises(ValueError):
+        Validator('line', 'strict')
+    with pytest.raises(ValueError):
+        Validator('line', 'sampled', sample_every=0)